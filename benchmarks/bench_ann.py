@@ -0,0 +1,62 @@
+import argparse, json, time
+import numpy as np
+from src.ann import IVFIndex, top_k
+
+# recall@k and per-query latency of the IVF backend against exact cosine search on synthetic
+# unit vectors. Rows are drawn around a few thousand topic centres (as mention embeddings
+# cluster by restaurant/cuisine); queries are perturbed rows.
+
+def synthetic_vectors(n: int, dim: int, topics: int = 2000, noise: float = 0.6, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype("float32")
+    V = np.empty((n, dim), dtype="float32")
+    for i in range(0, n, 100000):
+        m = min(100000, n - i)
+        V[i:i+m] = centres[rng.integers(0, topics, m)] + noise * rng.standard_normal((m, dim)).astype("float32")
+    V /= np.linalg.norm(V, axis=1, keepdims=True)
+    return V
+
+def percentiles(times):
+    ms = np.array(times) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--dim", type=int, default=128)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--query_noise", type=float, default=1.0, help="query = row + noise (relative to a unit row)")
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    results = []
+    for n in args.sizes:
+        V = synthetic_vectors(n, args.dim)
+        rng = np.random.default_rng(1)
+        Q = V[rng.choice(n, args.queries, replace=False)] + args.query_noise / np.sqrt(args.dim) * rng.standard_normal((args.queries, args.dim)).astype("float32")
+        Q = (Q / np.linalg.norm(Q, axis=1, keepdims=True)).astype("float32")
+
+        exact, truth = [], []
+        for q in Q:
+            t = time.perf_counter(); truth.append(set(top_k(V @ q, args.k).tolist())); exact.append(time.perf_counter() - t)
+        row = {"rows": n, "backend": "exact", "recall": 1.0, **percentiles(exact)}
+        print(json.dumps(row)); results.append(row)
+
+        t = time.perf_counter(); ivf = IVFIndex.build(V); build = time.perf_counter() - t
+        for nprobe in args.nprobe:
+            times, hits = [], 0
+            for q, want in zip(Q, truth):
+                t = time.perf_counter(); ids, _ = ivf.search(V, q[None], args.k, nprobe); times.append(time.perf_counter() - t)
+                hits += len(want & set(ids[0].tolist()))
+            row = {"rows": n, "backend": "ivf", "nlist": len(ivf.centroids), "nprobe": nprobe, "build_s": round(build, 2),
+                   "recall": round(hits / (args.k * len(Q)), 4), **percentiles(times)}
+            print(json.dumps(row)); results.append(row)
+        del V
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
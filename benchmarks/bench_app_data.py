@@ -0,0 +1,81 @@
+import argparse, json, os, random, tempfile, time
+from datetime import datetime, timedelta, timezone
+import numpy as np, pandas as pd
+from .bench_storage import synthetic_stage
+from .synthetic import FOOD, HOODS
+
+# Cost of one Streamlit rerun of the Explore + Trends tabs: the old script (re-read the stage,
+# df.copy(), isin filters, stringify for display, re-parse mentions_raw.jsonl) against the
+# cached MentionData (stat the files, intersect posting lists, slice the display frame).
+
+def write_raw(path: str, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"name": f"Place {i}", "cuisine": rng.choice(FOOD), "neighborhood": rng.choice(HOODS),
+                                "why": "so good", "created_iso": (now - timedelta(days=rng.uniform(0, 90))).isoformat()}) + "\n")
+
+def legacy_rerun(storage, raw_path, f):
+    df = storage.read_stage(["mentions_clustered", "mentions_enhanced", "mentions_clean"])
+    q = df.copy()
+    if f["cuisines"]: q = q[q["cuisine"].isin(f["cuisines"])]
+    if f["hoods"]: q = q[q["neighborhood"].isin(f["hoods"])]
+    q = q[q["score_buzz"] >= f["min_buzz"]]
+    if f["must_try"]: q = q[q["sentiment_label"] == "must-try"]
+    q = q[["name","neighborhood","cuisine","why","score_buzz","score_trend","score_total","source_url"]].astype(object).fillna("")
+    raw = pd.read_json(raw_path, lines=True)
+    raw["week"] = pd.to_datetime(raw["created_iso"], utc=True, errors="coerce", format="mixed").dt.tz_localize(None).dt.to_period("W").astype(str)
+    raw.groupby("week").size()
+    return q
+
+def cached_rerun(app_data, cache, f):
+    stamp = app_data.mentions_stamp()
+    if stamp not in cache:
+        cache.clear(); cache[stamp] = app_data.MentionData.load()
+    raw_stamp = app_data.file_stamp(app_data.RAW_PATH)
+    if raw_stamp not in cache:
+        cache[raw_stamp] = app_data.weekly_timeline(app_data.RAW_PATH)
+    data = cache[stamp]
+    return data.rows(data.select(f["cuisines"], f["hoods"], f["min_buzz"], f["must_try"]))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    import src.storage as storage
+    results = []
+    for n in args.rows:
+        tmp = tempfile.mkdtemp(prefix="bench_app_")
+        storage.DATA_DIR = tmp
+        import src.app_data as app_data
+        app_data.RAW_PATH = os.path.join(tmp, "mentions_raw.jsonl")
+        storage.write_stage(synthetic_stage(n), "mentions_clustered", csv=False)
+        write_raw(app_data.RAW_PATH, n)
+        rng = random.Random(1)
+        filters = [{"cuisines": rng.sample(FOOD, rng.randint(0, 3)), "hoods": rng.sample(HOODS, rng.randint(0, 2)),
+                    "min_buzz": rng.choice([0, 0, 5, 20]), "must_try": rng.random() < 0.3} for _ in range(args.reruns)]
+        cache = {}
+        t = time.perf_counter(); cached_rerun(app_data, cache, filters[0]); build = time.perf_counter() - t
+        modes = {"legacy": lambda f: legacy_rerun(storage, app_data.RAW_PATH, f),
+                 "cached": lambda f: cached_rerun(app_data, cache, f)}
+        same = all(modes["legacy"](f)["name"].tolist() == modes["cached"](f)["name"].tolist() for f in filters[:5])
+        for mode, fn in modes.items():
+            times = []
+            for f in filters:
+                t = time.perf_counter(); fn(f); times.append(time.perf_counter() - t)
+            ms = np.array(times) * 1000
+            row = {"rows": n, "mode": mode, "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                   "max_ms": round(float(ms.max()), 2), "same_rows": same}
+            if mode == "cached":
+                row["build_s"] = round(build, 3)
+            print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
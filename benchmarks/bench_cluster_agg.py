@@ -0,0 +1,71 @@
+import argparse, json, random, time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from .synthetic import FOOD, HOODS
+
+# Per-cluster aggregation in dedupe_and_score: the original groupby with a Python lambda per
+# cluster and column against aggregate_clusters (factorized codes + segment reductions). Also
+# the regression check: both must produce the same frame, including ties, missing values and
+# clusters with no neighborhood / timestamp at all.
+
+def legacy_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    agg = df.groupby("cluster_id").agg({
+        "name_norm": lambda s: s.value_counts().idxmax(),
+        "neighborhood": lambda s: s.dropna().value_counts().index[0] if s.dropna().size else None,
+        "cuisine": lambda s: s.dropna().value_counts().index[0] if s.dropna().size else None,
+        "why": lambda s: s.dropna().iloc[0] if s.dropna().size else None,
+        "source_url": lambda s: s.dropna().iloc[0] if s.dropna().size else None,
+        "sentiment": lambda s: s.dropna().value_counts().idxmax() if s.dropna().size else "positive",
+        "created_iso": ["min","max","count"]
+    })
+    agg.columns = ["name","neighborhood","cuisine","why","source_url","sentiment","first_seen","last_seen","mentions"]
+    return agg
+
+def synthetic_mentions(clusters: int, per_cluster: float = 3.0, seed: int = 0) -> pd.DataFrame:
+    """Mentions already assigned to clusters, shuffled, with spelling variants, ties and ~15% nulls."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    maybe = lambda v, p=0.15: None if rng.random() < p else v
+    rows = []
+    for cid in range(clusters):
+        base = f"Place {cid} {rng.choice(FOOD)}"
+        for _ in range(1 + int(rng.expovariate(1 / (per_cluster - 1)))):
+            rows.append({"cluster_id": cid, "name_norm": rng.choice([base, base.lower(), base + " LA"]),
+                         "neighborhood": maybe(rng.choice(HOODS[:3])), "cuisine": maybe(rng.choice(FOOD[:4])),
+                         "why": maybe(rng.choice(["so good", "long line", "worth it"]), 0.4),
+                         "source_url": maybe(f"https://www.reddit.com/r/FoodLosAngeles/comments/{rng.randrange(10**6)}/"),
+                         "sentiment": maybe(rng.choice(["positive", "neutral", "negative"])),
+                         "created_iso": maybe((now - timedelta(days=rng.uniform(0, 90))).isoformat(), 0.05)})
+    rng.shuffle(rows)
+    return pd.DataFrame(rows)
+
+def same_frame(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a, b)
+        return True
+    except AssertionError as e:
+        print(e)
+        return False
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clusters", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--per_cluster", type=float, default=3.0, help="mean mentions per cluster")
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.dedupe_and_score import aggregate_clusters
+    results = []
+    for n in args.clusters:
+        df = synthetic_mentions(n, args.per_cluster)
+        t = time.perf_counter(); old = legacy_aggregate(df); legacy_s = time.perf_counter() - t
+        t = time.perf_counter(); new = aggregate_clusters(df); vector_s = time.perf_counter() - t
+        row = {"clusters": n, "mentions": len(df), "legacy_s": round(legacy_s, 3), "vectorized_s": round(vector_s, 4),
+               "speedup": round(legacy_s / max(vector_s, 1e-9), 1), "identical": same_frame(old, new)}
+        print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
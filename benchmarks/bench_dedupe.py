@@ -0,0 +1,48 @@
+import argparse, json, time
+from src.dedupe_and_score import ENGINES
+from .synthetic import synthetic_names
+
+def _agreement(a, b, n):
+    """Fraction of names whose cluster has exactly the same members under both engines."""
+    def member_sets(c):
+        out = [None] * n
+        for idxs in c.values():
+            key = frozenset(idxs)
+            for i in idxs: out[i] = key
+        return out
+    ma, mb = member_sets(a), member_sets(b)
+    return sum(x == y for x, y in zip(ma, mb)) / max(n, 1)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--min_similarity", type=int, default=88)
+    ap.add_argument("--greedy_max", type=int, default=10000, help="skip the O(n^2) greedy engine above this size")
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    results = []
+    for n in args.sizes:
+        names = synthetic_names(n)
+        row = {"n": n}
+        out = {}
+        for engine, fn in ENGINES.items():
+            if engine == "greedy" and n > args.greedy_max:
+                row["greedy_s"] = None
+                continue
+            t = time.perf_counter()
+            out[engine] = fn(names, threshold=args.min_similarity)
+            row[f"{engine}_s"] = round(time.perf_counter() - t, 3)
+            row[f"{engine}_clusters"] = len(out[engine])
+        if "greedy" in out:
+            row["identical"] = out["greedy"] == out["blocked"]
+            row["agreement"] = round(_agreement(out["greedy"], out["blocked"], n), 6)
+            row["speedup"] = round(row["greedy_s"] / max(row["blocked_s"], 1e-9), 1)
+        print(json.dumps(row))
+        results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
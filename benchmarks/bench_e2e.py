@@ -0,0 +1,73 @@
+import argparse, json, os, subprocess, sys, tempfile, time
+from . import fake_geocode, fake_openai
+from .synthetic import synthetic_feed, synthetic_mentions, synthetic_threads, write_jsonl
+
+# The whole pipeline through src.pipeline on synthetic data, fully offline: the fake OpenAI
+# server answers extraction, enhancement, digest and embedding calls, the fake Google endpoint
+# geocodes, and sources_external reads a local RSS file. Scraping is skipped (PRAW can't be
+# pointed at a local server; bench_scrape times it against the fake backend) and the run starts
+# from synthetic raw_threads.jsonl, or from mentions_raw.jsonl with --mentions. Each size runs
+# three times in a fresh data dir: cold (empty caches), cached (--force all: every stage reruns
+# against warm LLM / embedding / geocode caches) and unchanged (every stage should be skipped),
+# then times the Streamlit data layer's load of the result.
+
+APP_LOAD = ("import time; from src.app_data import MentionData; t = time.perf_counter(); d = MentionData.load(); "
+            "print(time.perf_counter() - t, len(d.table))")
+
+def run_pipeline(env, stages, force, report):
+    cmd = [sys.executable, "-m", "src.pipeline", "--stages", *stages, "--report", report] + (["--force", "all"] if force else [])
+    with open(report + ".log", "w", encoding="utf-8") as log:
+        subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT, check=False)
+    with open(report, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, nargs="+", default=[50, 200], help="raw_threads.jsonl sizes")
+    ap.add_argument("--mentions", type=int, nargs="+", default=None, help="start from mentions_raw.jsonl of these sizes instead")
+    ap.add_argument("--comments", type=int, default=40)
+    ap.add_argument("--llm_latency", type=float, default=0.05, help="fake OpenAI seconds per request")
+    ap.add_argument("--geo_latency", type=float, default=0.02, help="fake geocoder seconds per request")
+    ap.add_argument("--jobs", type=int, default=4)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.pipeline import STAGES
+    start = "mentions" if args.mentions else "posts"
+    skip = {"scrape_reddit"} | ({"llm_extract"} if args.mentions else set())
+    stages = [s.name for s in STAGES if s.name not in skip]
+    results = []
+    with fake_openai.serve(latency=args.llm_latency) as (llm_url, llm_counts), \
+         fake_geocode.serve(latency=args.geo_latency) as (geo_url, geo_counts):
+        for n in args.mentions or args.posts:
+            tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+            data, out = os.path.join(tmp, "data"), os.path.join(tmp, "outputs")
+            os.makedirs(data); os.makedirs(out)
+            if args.mentions:
+                write_jsonl(os.path.join(data, "mentions_raw.jsonl"), synthetic_mentions(n))
+            else:
+                write_jsonl(os.path.join(data, "raw_threads.jsonl"), synthetic_threads(n, args.comments))
+            with open(os.path.join(tmp, "feed.xml"), "w", encoding="utf-8") as f:
+                f.write(synthetic_feed())
+            env = {k: v for k, v in os.environ.items() if k not in ("YELP_API_KEY", "GOOGLE_PLACES_API_KEY", "WAREHOUSE_URL")}
+            env.update(DATA_DIR=data, OUT_DIR=out, OPENAI_BASE_URL=llm_url, OPENAI_API_KEY="sk-fake", GEOCODER="google",
+                       GOOGLE_GEOCODE_URL=geo_url, GOOGLE_MAPS_API_KEY="fake", EATER_FEED_URL=os.path.join(tmp, "feed.xml"))
+            for run in ("cold", "cached", "unchanged"):
+                before = (llm_counts["requests"], geo_counts["requests"])
+                report = run_pipeline(env, stages, run == "cached", os.path.join(tmp, f"report_{run}.json"))
+                load_s, rows = subprocess.run([sys.executable, "-c", APP_LOAD], env=env, capture_output=True, text=True).stdout.split()
+                by_stage = {r["stage"]: r for r in report}
+                row = {start: n, "run": run, "total_s": by_stage["total"]["wall_s"], "cpu_s": by_stage["total"]["cpu_s"],
+                       **{f"{s}_s": by_stage[s].get("wall_s") for s in stages},
+                       "ran": sum(by_stage[s]["status"] == "ran" for s in stages),
+                       "skipped": sum(by_stage[s]["status"] == "skipped" for s in stages),
+                       "failed": [s for s in stages if by_stage[s]["status"] in ("failed", "blocked")],
+                       "openai_requests": llm_counts["requests"] - before[0], "geocode_requests": geo_counts["requests"] - before[1],
+                       "restaurants": int(rows), "app_load_s": round(float(load_s), 3)}
+                print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
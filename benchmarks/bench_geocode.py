@@ -0,0 +1,46 @@
+import argparse, json, os, random, tempfile, time
+import pandas as pd
+from .fake_geocode import serve
+from .synthetic import HOODS, synthetic_names
+
+# geocode_and_map.geocode_table with the Google provider against the local fake endpoint:
+# a cold run (empty cache) at several concurrency levels, then a warm run that should send
+# (almost) nothing. Rows repeat places the way a weekly table does, so query dedupe shows too.
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.05, help="fake seconds per request")
+    ap.add_argument("--fail_rate", type=float, default=0.02)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    names = synthetic_names(args.rows)
+    df = pd.DataFrame({"name": names, "neighborhood": [rng.choice(HOODS + [None]) for _ in names]})
+    results = []
+    with serve(latency=args.latency, fail_rate=args.fail_rate) as (url, counts):
+        os.environ["GOOGLE_GEOCODE_URL"] = url
+        os.environ.setdefault("GOOGLE_MAPS_API_KEY", "fake")
+        from src.geocode_and_map import geocode_table
+        from src.geocode_cache import GeocodeCache
+
+        for c in args.concurrency:
+            path = os.path.join(tempfile.mkdtemp(prefix="bench_geocode_"), "cache.sqlite")
+            for run in ("cold", "warm"):
+                cache = GeocodeCache(path)
+                before = counts["requests"]
+                t = time.perf_counter()
+                out = geocode_table(df, "google", cache, c)
+                row = {"concurrency": c, "run": run, "rows": len(df), "requests": counts["requests"] - before,
+                       "wall_s": round(time.perf_counter() - t, 2), "located": int(out["lat"].notna().sum()),
+                       "hit_rate": round(cache.hits / max(cache.hits + cache.misses, 1), 3)}
+                cache.close()
+                print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
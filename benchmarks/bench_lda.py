@@ -0,0 +1,80 @@
+import argparse, json, os, subprocess, sys, tempfile
+
+# ml.topic_modeling on synthetic mention histories: the original batch LDA (whole table in one
+# TF-IDF matrix, fit in one go) against the streaming online LDA (chunked partial_fit), then a
+# weekly update that feeds only a new week of mentions into the saved model. Each step runs in
+# its own process, the synthetic data too: ru_maxrss survives fork + exec, so a parent holding
+# the generated mentions would inflate every step's peak. The streaming fit should stay flat as
+# the history grows.
+
+WRITE = """
+import json
+from datetime import datetime, timedelta, timezone
+from benchmarks.synthetic import synthetic_mentions, write_jsonl
+if {week}:
+    now, week = datetime.now(timezone.utc), synthetic_mentions({n}, seed=1)
+    for i, m in enumerate(week):
+        m['created_iso'] = (now + timedelta(days=1 + 6 * i / len(week))).isoformat()
+    with open({path!r}, 'a', encoding='utf-8') as f:
+        f.writelines(json.dumps(m) + '\\n' for m in week)
+else:
+    write_jsonl({path!r}, synthetic_mentions({n}))
+print(0, 0)
+"""
+
+LEGACY = """
+import resource, time, pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import LatentDirichletAllocation as LDA
+t = time.perf_counter()
+df = pd.read_json({path!r}, lines=True)
+texts = (df['name'].fillna('') + ' ' + df['why'].fillna('')).tolist()
+X = TfidfVectorizer(max_features=5000, stop_words='english').fit_transform(texts)
+LDA(n_components={k}, random_state=42).fit(X)
+print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+STREAM = """
+import resource, time
+from ml.topic_modeling import TopicModel
+t = time.perf_counter()
+m = {call}
+m.save()
+print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def step(code, env):
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout.split()
+    return round(float(out[-2]), 2), round(int(out[-1]) / 1024)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentions", type=int, nargs="+", default=[50000, 200000, 800000])
+    ap.add_argument("--week", type=int, default=10000, help="new mentions in the weekly update")
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--legacy_max", type=int, default=200000, help="skip the batch fit above this many mentions")
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    results = []
+    for n in args.mentions:
+        tmp = tempfile.mkdtemp(prefix="bench_lda_")
+        path = os.path.join(tmp, "mentions_raw.jsonl")
+        step(WRITE.format(path=path, n=n, week=False), os.environ)
+        env = dict(os.environ, DATA_DIR=tmp)
+        legacy_s, legacy_mb = step(LEGACY.format(path=path, k=args.k), env) if n <= args.legacy_max else (None, None)
+        fit_s, fit_mb = step(STREAM.format(call=f"TopicModel({args.k}).fit({path!r})"), env)
+        step(WRITE.format(path=path, n=args.week, week=True), os.environ)
+        update_s, update_mb = step(STREAM.format(call=f"TopicModel.load(); fed = m.update({path!r}); assert fed == {args.week}, fed"), env)
+        row = {"mentions": n, "legacy_fit_s": legacy_s, "legacy_peak_mb": legacy_mb, "stream_fit_s": fit_s,
+               "stream_peak_mb": fit_mb, "week": args.week, "update_s": update_s, "update_peak_mb": update_mb}
+        print(json.dumps(row)); results.append(row)
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse, json, os, random, tempfile
+import pandas as pd
+from .fake_openai import serve
+from .synthetic import FOOD, HOODS, TEMPLATES, synthetic_names
+
+# llm_enhance.enhance against the local fake server: one request per row (batch_size 1)
+# versus batched prompts. Reports API calls, wall time and how many rows match the
+# per-row answers. Then, with the response cache warm, one new restaurant is inserted at the
+# top of the table: only its own batch should go back to the API.
+
+def synthetic_mentions(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    names = synthetic_names(n, seed=seed)
+    whys = [rng.choice(TEMPLATES).format(name=nm, hood=rng.choice(HOODS), food=rng.choice(FOOD).lower()) for nm in names]
+    return pd.DataFrame({"name": names, "why": whys})
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.25, help="fake server seconds per request")
+    ap.add_argument("--fail_rate", type=float, default=0.02)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 10, 20, 40])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    df = synthetic_mentions(args.rows)
+    with serve(latency=args.latency, fail_rate=args.fail_rate) as (base_url, counts):
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from src.llm_enhance import enhance
+        from src.llm_cache import LLMCache
+
+        results, baseline = [], None
+        for b in args.batch_sizes:
+            out, stats = enhance(df, batch_size=b, concurrency=args.concurrency, rpm=None, tpm=None)
+            cols = out[["signature_dishes", "sentiment_label"]]
+            baseline = cols if baseline is None else baseline
+            row = {"batch_size": b, "rows": stats["rows"], "calls": stats["calls"], "wall_s": stats["wall_s"],
+                   "retried_rows": stats["retried_rows"], "failed": stats["failed"], "retries": stats["retries"],
+                   "agreement": round(float((cols == baseline).all(axis=1).mean()), 4)}
+            print(json.dumps(row))
+            results.append(row)
+
+        b = max(args.batch_sizes)
+        grown = pd.concat([synthetic_mentions(1, seed=1), df], ignore_index=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LLMCache(os.path.join(tmp, "llm_cache.sqlite"))
+            _, cold = enhance(df, batch_size=b, concurrency=args.concurrency, rpm=None, tpm=None, cache=cache)
+            _, warm = enhance(grown, batch_size=b, concurrency=args.concurrency, rpm=None, tpm=None, cache=cache)
+            cache.close()
+        row = {"batch_size": b, "rows": len(grown), "cold_calls": cold["calls"], "calls_after_insert": warm["calls"]}
+        print(json.dumps(row))
+        results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse, json, os, tempfile, time
+from .fake_openai import serve
+from .synthetic import synthetic_threads, write_jsonl
+
+# Throughput of llm_pipeline.run_llm against the local fake server at several concurrency
+# levels. Every level must write byte-identical mentions_raw.jsonl.
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=150)
+    ap.add_argument("--comments", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.25, help="fake server seconds per request")
+    ap.add_argument("--fail_rate", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_llm_")
+    raw_path = os.path.join(tmp, "raw_threads.jsonl")
+    write_jsonl(raw_path, synthetic_threads(args.posts, args.comments))
+
+    with serve(latency=args.latency, fail_rate=args.fail_rate) as (base_url, counts):
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from src.llm_pipeline import run_llm
+
+        results, baseline = [], None
+        for c in args.concurrency:
+            out_path = os.path.join(tmp, f"mentions_c{c}.jsonl")
+            t = time.perf_counter()
+            stats = run_llm("gpt-4o-mini", concurrency=c, rpm=None, tpm=None, raw_path=raw_path, out_path=out_path)
+            wall = time.perf_counter() - t
+            with open(out_path, "rb") as f:
+                data = f.read()
+            baseline = data if baseline is None else baseline
+            row = {"concurrency": c, "requests": stats["requests"], "wall_s": round(wall, 2),
+                   "req_per_s": round(stats["requests"] / wall, 1), "retries": stats["retries"],
+                   "failed": stats["failed"], "same_output": data == baseline}
+            print(json.dumps(row))
+            results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
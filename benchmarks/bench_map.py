@@ -0,0 +1,45 @@
+import argparse, json, time
+import numpy as np
+from .bench_storage import synthetic_stage
+
+# HTML size and generation time of the restaurant map and the density heatmap: the old
+# one-Marker-per-row map and raw-point HeatMap against clustered markers and binned heat cells.
+
+def with_coords(n: int, seed: int = 0):
+    df = synthetic_stage(n, seed)
+    rng = np.random.default_rng(seed)
+    hubs = rng.normal([34.05, -118.30], [0.12, 0.15], size=(40, 2))  # neighbourhood-like clumps
+    pick = rng.integers(0, len(hubs), n)
+    df["lat"] = hubs[pick, 0] + rng.normal(0, 0.01, n)
+    df["lng"] = hubs[pick, 1] + rng.normal(0, 0.01, n)
+    return df
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--legacy_max", type=int, default=100000, help="skip the per-row Marker map above this many rows")
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.map_render import build_map, heat_map, map_html
+    results = []
+    for n in args.rows:
+        df = with_coords(n)
+        lat, lng = df["lat"].to_numpy(), df["lng"].to_numpy()
+        cases = [("map_markers", lambda: build_map(df, "markers").get_root().render()),
+                 ("map_cluster", lambda: build_map(df, "cluster").get_root().render()),
+                 ("map_binned", lambda: build_map(df, "binned").get_root().render()),
+                 ("heat_raw_points", lambda: map_html(heat_map(lat, lng, cell_deg=None))),
+                 ("heat_cells", lambda: map_html(heat_map(lat, lng)))]
+        for mode, fn in cases:
+            if mode == "map_markers" and n > args.legacy_max:
+                continue
+            t = time.perf_counter(); page = fn(); secs = time.perf_counter() - t
+            row = {"rows": n, "mode": mode, "gen_s": round(secs, 3), "html_kb": round(len(page.encode()) / 1024, 1)}
+            print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse, json, time
+import pandas as pd
+from .fake_openai import fake_extraction
+from .synthetic import synthetic_threads
+
+# The llm_pipeline comment pre-filter on synthetic scrapes. The fake server's extractor stands in
+# for the LLM: it "extracts" one scrape (the training history: labels and the gazetteer), the
+# prefilter is fit at each --recall target, then a second scrape is packed with and without it.
+# Reports the share of requests and prompt tokens removed and the recall of the names the full
+# extraction finds in the new scrape.
+
+def extract(jobs):
+    """mentions_raw-like rows for packed jobs, attributed to threads as llm_pipeline does."""
+    from src.llm_pipeline import attribute
+    rows = []
+    for posts, user in jobs:
+        for m in fake_extraction(user)["mentions"]:
+            rows.append({"name": m["name"], "post_id": attribute(m, posts)})
+    return pd.DataFrame(rows, columns=["name", "post_id"])
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=400)
+    ap.add_argument("--comments", type=int, default=40)
+    ap.add_argument("--recall", type=float, nargs="+", default=[0.9, 0.95, 0.99])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.llm_async import count_tokens
+    from src.llm_pipeline import SYSTEM, pack_jobs
+    from src.prefilter import Prefilter, filter_posts, label_comments
+    history, scrape = synthetic_threads(args.posts, args.comments, seed=0), synthetic_threads(args.posts, args.comments, seed=1)
+    past = extract(pack_jobs(history))
+    labelled = label_comments(history, past)
+    full_jobs = pack_jobs(scrape)
+    full_names = set(extract(full_jobs)["name"])
+    cost = lambda jobs: sum(count_tokens(SYSTEM) + count_tokens(u) for _, u in jobs)
+    full_tokens = cost(full_jobs)
+    results = []
+    for recall in args.recall:
+        t = time.perf_counter()
+        pf, held_out = Prefilter.fit(labelled["body"], labelled["label"].to_numpy(), past["name"], recall)
+        fit_s = time.perf_counter() - t
+        t = time.perf_counter()
+        kept = filter_posts(scrape, pf)
+        filter_s = time.perf_counter() - t
+        jobs = pack_jobs(kept)
+        names = set(extract(jobs)["name"])
+        n_comments = sum(len(p["comments"]) for p in scrape)
+        row = {"posts": args.posts, "comments": n_comments, "recall_target": recall, "threshold": held_out["threshold"],
+               "held_out_recall": held_out["recall"],
+               "comments_removed": round(1 - sum(len(p["comments"]) for p in kept) / n_comments, 4),
+               "requests": len(jobs), "requests_full": len(full_jobs), "requests_removed": round(1 - len(jobs) / len(full_jobs), 4),
+               "tokens_removed": round(1 - cost(jobs) / full_tokens, 4),
+               "name_recall": round(len(names & full_names) / max(len(full_names), 1), 4),
+               "fit_s": round(fit_s, 2), "comments_per_s": round(n_comments / filter_s)}
+        print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
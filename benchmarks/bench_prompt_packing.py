@@ -0,0 +1,89 @@
+import argparse, copy, json, random, time
+from .fake_openai import fake_extraction
+from .synthetic import CHATTER, synthetic_threads
+
+# llm_pipeline request building: the old fixed chunks (batch_size*4 comments per request, JSON
+# cut at 12000 characters) against pack_jobs filling a token budget across threads. Counts
+# requests, prompt tokens (system prompt included, as billed) and comments whose text didn't
+# make it into any prompt. The fake server's extractor runs over the prompts and over every
+# whole comment; names it finds in the comments but in no prompt were lost to chunking (cut
+# names like "Boyle Height" don't count as found). A fraction of comments is made long, like
+# real write-ups. changed_requests: prompts that differ (so miss the LLM cache) after one
+# thread in the middle gains a comment, as an incremental scrape does.
+
+USER_TMPL = """POST_TITLE: {title}
+POST_BODY: {selftext}
+PERMALINK: {permalink}
+TOP_COMMENTS_JSON: {comments_json}
+"""
+
+def legacy_jobs(posts, batch_size=12):
+    jobs = []
+    for post in posts:
+        comments = post.get("comments", [])
+        for i in range(0, len(comments), batch_size * 4):
+            jobs.append(USER_TMPL.format(title=post.get("title", ""), selftext=post.get("selftext", ""),
+                                         permalink=post.get("permalink", ""),
+                                         comments_json=json.dumps(comments[i:i + batch_size * 4])[:12000]))
+    return jobs
+
+def lengthen(posts, rate, seed=0):
+    rng = random.Random(seed)
+    for p in posts:
+        for c in p["comments"]:
+            if rng.random() < rate:
+                c["body"] = " ".join(rng.choice(CHATTER) for _ in range(150)) + " " + c["body"]
+    return posts
+
+def measure(prompts, posts, system, count_tokens):
+    text = "\n".join(prompts)
+    lost = sum(json.dumps(c["body"], ensure_ascii=False)[1:-1] not in text for p in posts for c in p["comments"])
+    found = set()
+    for u in prompts:
+        found.update(m["name"] for m in fake_extraction(u)["mentions"])
+    truth = {m["name"] for p in posts for c in p["comments"] for m in fake_extraction(c["body"])["mentions"]}
+    sys_tokens = count_tokens(system)
+    return {"requests": len(prompts), "prompt_tokens": sum(sys_tokens + count_tokens(u) for u in prompts),
+            "lost_comments": lost, "missed_names": len(truth - found)}
+
+def grow_one(posts):
+    posts = copy.deepcopy(posts)
+    p = posts[len(posts) // 2]
+    p["comments"].append(dict(p["comments"][0], body="Went back last night, still great."))
+    return posts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=300)
+    ap.add_argument("--comments", type=int, nargs="+", default=[5, 40, 200], help="mean comments per thread")
+    ap.add_argument("--long_rate", type=float, default=0.03, help="fraction of comments made ~1k tokens long")
+    ap.add_argument("--max_tokens", type=int, default=4000)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.llm_async import count_tokens
+    from src.llm_pipeline import SYSTEM, pack_jobs
+    legacy_system = SYSTEM.replace("The input holds one or more threads, each starting with POST_ID; comments are ordered by score.\n", "")
+    results = []
+    for n in args.comments:
+        posts = lengthen(synthetic_threads(args.posts, n), args.long_rate)
+        t = time.perf_counter()
+        old = legacy_jobs(posts)
+        old_s = time.perf_counter() - t
+        t = time.perf_counter()
+        new = [u for _, u in pack_jobs(posts, args.max_tokens)]
+        new_s = time.perf_counter() - t
+        o, p = measure(old, posts, legacy_system, count_tokens), measure(new, posts, SYSTEM, count_tokens)
+        o["changed_requests"] = len(set(legacy_jobs(grow_one(posts))) - set(old))
+        p["changed_requests"] = len({u for _, u in pack_jobs(grow_one(posts), args.max_tokens)} - set(new))
+        row = {"posts": args.posts, "comments": n, "max_tokens": args.max_tokens,
+               **{f"legacy_{k}": v for k, v in o.items()}, **{f"packed_{k}": v for k, v in p.items()},
+               "request_ratio": round(o["requests"] / max(p["requests"], 1), 2),
+               "legacy_build_s": round(old_s, 3), "packed_build_s": round(new_s, 3)}
+        print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse, json, os, tempfile, time
+import numpy as np, pandas as pd
+from .fake_openai import EMBED_DIM, serve
+from .synthetic import synthetic_names
+
+# Per-query latency of the Q&A search path: the old reload-everything search() against the
+# long-lived Searcher, for new queries (one embedding call each) and repeated ones (LRU hit).
+
+def legacy_search(client, npz_path, csv_path, query, top_k):
+    """The pre-Searcher search(): reload, re-normalise and full argsort on every call."""
+    q = client.embeddings.create(model="text-embedding-3-small", input=[query]).data[0].embedding
+    data = np.load(npz_path)
+    V = data["vectors"]; ids = data["ids"]
+    vq = np.array(q, dtype="float32")
+    Vn = V / (np.linalg.norm(V, axis=1, keepdims=True) + 1e-9)
+    vqn = vq / (np.linalg.norm(vq) + 1e-9)
+    sims = (Vn @ vqn)
+    top = sims.argsort()[-top_k:][::-1]
+    return pd.read_csv(csv_path).iloc[ids[top]].assign(similarity=sims[top])
+
+def percentiles(times):
+    ms = np.array(times) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 2), "p99_ms": round(float(np.percentile(ms, 99)), 2)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top_k", type=int, default=10)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    results = []
+    with serve() as (base_url, counts):
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from openai import OpenAI
+        from src.embeddings_and_qna import Searcher, _normalize
+        client = OpenAI()
+        for n in args.rows:
+            tmp = tempfile.mkdtemp(prefix="bench_qna_")
+            names = synthetic_names(n)
+            V = np.random.default_rng(0).standard_normal((n, EMBED_DIM)).astype("float32")
+            rows_path, csv_path, npz_path, npy_path = (os.path.join(tmp, f) for f in ("rows.parquet", "rows.csv", "index.npz", "index.npy"))
+            rows = pd.DataFrame({"name": names, "why": [f"Recommended: {x}" for x in names]})
+            rows.to_parquet(rows_path, index=False)
+            rows.to_csv(csv_path, index=False)
+            np.savez(npz_path, vectors=V, ids=np.arange(n))
+            np.save(npy_path, _normalize(V))
+            queries = [f"where to get {names[i]} near me" for i in range(args.queries)]
+
+            def timed(fn):
+                out = []
+                for q in queries:
+                    t = time.perf_counter(); fn(q); out.append(time.perf_counter() - t)
+                return out
+
+            legacy = timed(lambda q: legacy_search(client, npz_path, csv_path, q, args.top_k))
+            s = Searcher(npy_path, rows_path, client=client)
+            t = time.perf_counter(); s.refresh(); load = time.perf_counter() - t
+            cold = timed(lambda q: s.search(q, args.top_k))
+            warm = timed(lambda q: s.search(q, args.top_k))
+            same = all(legacy_search(client, npz_path, csv_path, q, args.top_k)["name"].tolist() == s.search(q, args.top_k)["name"].tolist()
+                       for q in queries[:20])
+            t = time.perf_counter(); s.search_many(queries, args.top_k); batch = time.perf_counter() - t
+            for mode, times in (("legacy", legacy), ("searcher_new_query", cold), ("searcher_cached_query", warm)):
+                row = {"rows": n, "mode": mode, **percentiles(times)}
+                print(json.dumps(row)); results.append(row)
+            row = {"rows": n, "mode": "search_many_cached", "per_query_ms": round(1000 * batch / len(queries), 3),
+                   "load_s": round(load, 3), "same_top_k": same}
+            print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
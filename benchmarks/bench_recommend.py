@@ -0,0 +1,70 @@
+import argparse, json, os, random, tempfile, time
+import numpy as np
+from .bench_storage import synthetic_stage
+from .synthetic import FOOD, HOODS
+
+# ml.recommend: the original recommend() refit TfidfVectorizer over the whole table for every
+# query; the Recommender fits once, saves the vocabulary/idf and CSR matrix, and answers batches
+# of queries with one sparse product + argpartition. Times the legacy per-query cost, fit + save,
+# a cold load of the saved model (digest check included), single and batched queries, and checks
+# the top-k scores against the legacy ranking.
+
+def legacy_recommend(df, query, top_k):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    from ml.recommend import documents
+    vec = TfidfVectorizer(max_features=8000, stop_words='english')
+    X = vec.fit_transform(documents(df)); qv = vec.transform([query])
+    sims = cosine_similarity(qv, X).ravel(); top = sims.argsort()[-top_k:][::-1]
+    return sims[top]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--top_k", type=int, default=10)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_recommend_")
+    os.environ["DATA_DIR"] = tmp  # before src.config is imported
+    from ml.recommend import Recommender
+    from src.storage import read_stage, write_stage
+    rng = random.Random(0)
+    queries = [f"{rng.choice(['casual', 'cheap', 'best', 'late night'])} {rng.choice(FOOD).lower()} in {rng.choice(HOODS)}"
+               for _ in range(args.queries)]
+    results = []
+    for n in args.rows:
+        write_stage(synthetic_stage(n), "mentions_enhanced")
+        df = read_stage("mentions_enhanced")
+        legacy_n = min(5, len(queries))
+        t = time.perf_counter()
+        legacy = [legacy_recommend(df, q, args.top_k) for q in queries[:legacy_n]]
+        legacy_s = (time.perf_counter() - t) / legacy_n
+
+        t = time.perf_counter()
+        Recommender().refresh(force=True)
+        fit_s = time.perf_counter() - t
+        t = time.perf_counter()
+        rec = Recommender()
+        refit = rec.refresh()
+        load_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        single = [rec.recommend(q, args.top_k) for q in queries[:100]]
+        single_s = (time.perf_counter() - t) / len(single)
+        t = time.perf_counter()
+        batch = rec.recommend_many(queries, args.top_k)
+        batch_s = time.perf_counter() - t
+        same = all(np.allclose(r["score"].to_numpy(), l[l > 0], atol=1e-5) for r, l in zip(batch, legacy))
+        row = {"rows": n, "legacy_query_s": round(legacy_s, 3), "fit_save_s": round(fit_s, 3), "load_s": round(load_s, 3),
+               "refit_on_load": refit, "query_ms": round(1000 * single_s, 2), "batch_queries": len(queries),
+               "batch_qps": round(len(queries) / batch_s), "speedup_single": round(legacy_s / single_s),
+               "same_scores": bool(same)}
+        print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse, json, random, time
+from datetime import datetime, timedelta, timezone
+import numpy as np, pandas as pd
+
+# Cost of bringing scores up to date after a scrape adds a batch of mentions: folding just the
+# batch into per-restaurant decayed counters (scoring.fold) against recomputing every
+# restaurant's decayed sum from all mentions, plus a point-in-time read over the whole state.
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentions", type=int, nargs="+", default=[100000, 1000000])
+    ap.add_argument("--restaurants", type=int, default=20000)
+    ap.add_argument("--batch", type=int, default=1000, help="new mentions per scrape")
+    ap.add_argument("--half_life_days", type=float, default=30)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.scoring import as_of_frame, decayed, fold, group_log_fwd
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    results = []
+    for n in args.mentions:
+        keys = [rng.randrange(args.restaurants) for _ in range(n + args.batch)]
+        ts = [(now - timedelta(days=rng.uniform(0, 180))).isoformat() for _ in range(n + args.batch)]
+        state = {"half_life_days": args.half_life_days, "clusters": [{} for _ in range(args.restaurants)]}
+        for k, t in zip(keys[:n], ts[:n]):
+            fold(state["clusters"][k], t, args.half_life_days)
+
+        t0 = time.perf_counter()
+        for k, t in zip(keys[n:], ts[n:]):
+            fold(state["clusters"][k], t, args.half_life_days)
+        inc = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        full = group_log_fwd(keys, ts, args.half_life_days)
+        recompute = time.perf_counter() - t0
+
+        inc_log = pd.Series([c.get("log_fwd") for c in state["clusters"]], dtype="float64")
+        same = np.allclose(decayed(inc_log, now, args.half_life_days),
+                           decayed(full.reindex(range(args.restaurants)), now, args.half_life_days))
+        t0 = time.perf_counter()
+        as_of_frame(state, (now - timedelta(days=30)).date())
+        point = time.perf_counter() - t0
+        row = {"mentions": n, "batch": args.batch, "incremental_s": round(inc, 4),
+               "us_per_mention": round(1e6 * inc / args.batch, 1), "full_recompute_s": round(recompute, 3),
+               "as_of_query_s": round(point, 3), "same_scores": bool(same)}
+        print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
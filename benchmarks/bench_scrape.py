@@ -0,0 +1,77 @@
+import argparse, json, os, tempfile, time
+from .fake_reddit import FakeCrash, FakeReddit, FakeWorld
+from .synthetic import synthetic_threads
+
+# scrape_reddit against the in-process fake PRAW backend: full-scrape wall time by worker
+# count, then the incremental path through a crash + resume, an update pass and a no-op pass.
+# Every incremental state must reproduce the full scrape (last copy of each thread wins).
+
+def last_copies(path):
+    rows = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            rows[r["id"]] = r
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05, help="fake seconds per comment-tree fetch")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+    from src.scrape_reddit import scrape, scrape_incremental
+
+    threads = synthetic_threads(args.posts, comments_per_post=10)
+    for i, t in enumerate(threads):
+        t["subreddit"] = ("r/FoodLosAngeles", "r/LosAngeles")[i % 2]
+        t["permalink"] = t["permalink"].replace("https://www.reddit.com", "")
+    subs = ["r/FoodLosAngeles", "r/LosAngeles"]
+    world = FakeWorld(threads, latency=args.latency)
+    factory = lambda: FakeReddit(world)
+    results = []
+
+    full = None
+    for w in args.workers:
+        t = time.perf_counter()
+        data = scrape(subs, 60, 10**9, "", factory, workers=w, rpm=None)
+        row = {"mode": "full", "workers": w, "threads": len(data), "wall_s": round(time.perf_counter() - t, 2),
+               "same_output": full is None or data == full}
+        full = full or data
+        print(json.dumps(row)); results.append(row)
+
+    tmp = tempfile.mkdtemp(prefix="bench_scrape_")
+    out, state = os.path.join(tmp, "raw_threads.jsonl"), os.path.join(tmp, "scrape_state.json")
+    inc = lambda: scrape_incremental(subs, 60, 10**9, "", out, state, reddit_factory=factory, workers=max(args.workers), rpm=None)
+
+    world.fail_after, world.fetches = args.posts // 2, 0
+    try:
+        inc()
+    except FakeCrash:
+        pass
+    world.fail_after = None
+    crashed = len(last_copies(out))
+    t = time.perf_counter(); stats = inc()
+    row = {"mode": "resume", "written_before_crash": crashed, **stats, "wall_s": round(time.perf_counter() - t, 2),
+           "matches_full": last_copies(out) == {r["id"]: r for r in full}}
+    print(json.dumps(row)); results.append(row)
+
+    newest = sorted(threads, key=lambda t: -t["created_utc"])[:5]
+    for t in newest:
+        world.add_comments(t["id"], [{"id": f"{t['id']}_new", "parent_id": f"t3_{t['id']}", "body": "still great",
+                                      "score": 1, "created_utc": t["created_utc"] + 3600}])
+    t = time.perf_counter(); stats = inc()
+    row = {"mode": "update", **stats, "wall_s": round(time.perf_counter() - t, 2),
+           "matches_full": last_copies(out) == {r["id"]: r for r in scrape(subs, 60, 10**9, "", factory, rpm=None)}}
+    print(json.dumps(row)); results.append(row)
+
+    t = time.perf_counter(); stats = inc()
+    row = {"mode": "noop", **stats, "wall_s": round(time.perf_counter() - t, 2)}
+    print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
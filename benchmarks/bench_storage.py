@@ -0,0 +1,69 @@
+import argparse, json, os, random, tempfile, time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from .synthetic import FOOD, HOODS, synthetic_names
+
+# Load time and in-memory size of a mentions_enhanced-shaped stage: the old pd.read_csv of
+# every column against storage.read_stage of the whole file and of a typical column subset.
+
+def synthetic_stage(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    first = [now - timedelta(days=rng.uniform(0, 60)) for _ in range(n)]
+    names = synthetic_names(n, seed=seed, dup_rate=0)
+    return pd.DataFrame({
+        "name": names,
+        "neighborhood": [rng.choice(HOODS) if rng.random() < 0.8 else None for _ in range(n)],
+        "cuisine": [rng.choice(FOOD) if rng.random() < 0.7 else None for _ in range(n)],
+        "why": [f"You have to try {x}, the {rng.choice(FOOD).lower()} is unreal." for x in names],
+        "source_url": [f"https://www.reddit.com/r/FoodLosAngeles/comments/p{i}/" for i in range(n)],
+        "sentiment": [rng.choice(["positive", "neutral", "negative"]) for _ in range(n)],
+        "first_seen": [f.isoformat() for f in first],
+        "last_seen": [(f + timedelta(days=rng.uniform(0, 5))).isoformat() for f in first],
+        "mentions": [rng.randint(1, 40) for _ in range(n)],
+        "score_buzz": [float(rng.randint(1, 40)) for _ in range(n)],
+        "score_trend": [rng.random() for _ in range(n)],
+        "score_total": [rng.random() * 80 for _ in range(n)],
+        "signature_dishes": [", ".join(rng.sample(FOOD, 2)).lower() for _ in range(n)],
+        "sentiment_label": [rng.choice(["must-try", "good", "mixed"]) for _ in range(n)],
+    })
+
+def timed(fn, repeat: int = 3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter(); out = fn(); best = min(best, time.perf_counter() - t)
+    return best, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--columns", nargs="+", default=["name", "neighborhood", "cuisine", "score_total"])
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    import src.storage as storage
+    results = []
+    for n in args.rows:
+        tmp = tempfile.mkdtemp(prefix="bench_storage_")
+        storage.DATA_DIR = tmp  # stage_path resolves under DATA_DIR at call time
+        df = synthetic_stage(n)
+        csv = storage.stage_path("mentions_enhanced", "csv")
+        df.to_csv(csv, index=False)
+        storage.write_stage(df, "mentions_enhanced", csv=False)
+        sizes = {"csv_mb": round(os.path.getsize(csv) / 2**20, 1),
+                 "parquet_mb": round(os.path.getsize(storage.stage_path("mentions_enhanced")) / 2**20, 1)}
+        cases = [("read_csv", lambda: pd.read_csv(csv)),
+                 ("read_stage", lambda: storage.read_stage("mentions_enhanced")),
+                 ("read_csv_usecols", lambda: pd.read_csv(csv, usecols=args.columns)),
+                 ("read_stage_columns", lambda: storage.read_stage("mentions_enhanced", args.columns))]
+        for mode, fn in cases:
+            secs, frame = timed(fn)
+            row = {"rows": n, "mode": mode, "load_s": round(secs, 3),
+                   "frame_mb": round(frame.memory_usage(deep=True).sum() / 2**20, 1), **sizes}
+            print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse, json, time
+import numpy as np
+
+# cluster_topics on synthetic embeddings: a mixture of --true_k unit-norm Gaussian blobs, a
+# history of --rows vectors and then --weeks weekly batches of --new_frac new ones. Each week is
+# clustered the old way (KMeans n_init=10 over everything, ids as sklearn numbers them) and
+# incrementally (online update of the saved centroids with just the new vectors). Reports fit
+# time, how many of last week's rows keep their topic_cluster (also for a --mode full refit whose
+# centroids are matched onto the saved ids), and the incremental labels' adjusted Rand index
+# and within-cluster sum of squares against the full refit's. The first week also times choose_k.
+
+def blobs(n, centers, spread, rng):
+    labels = rng.integers(len(centers), size=n)
+    X = centers[labels] + spread * rng.standard_normal((n, centers.shape[1]))
+    return (X / np.linalg.norm(X, axis=1, keepdims=True)).astype(np.float32)
+
+def wcss(X, labels):
+    """Within-cluster sum of squares of a labelling, around each cluster's own mean."""
+    _, codes = np.unique(labels, return_inverse=True)
+    sums = np.zeros((codes.max() + 1, X.shape[1])); np.add.at(sums, codes, X)
+    n = np.bincount(codes)
+    return float((X.astype(np.float64) ** 2).sum() - ((sums ** 2).sum(1) / n).sum())
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--true_k", type=int, default=8)
+    ap.add_argument("--weeks", type=int, default=3)
+    ap.add_argument("--spread", type=float, default=0.3, help="per-dimension noise around the blob centres")
+    ap.add_argument("--new_frac", type=float, default=0.05, help="new vectors per week, as a share of the history")
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score
+    from src.cluster_topics import choose_k, fit_topics
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.true_k, args.dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    results = []
+    for n in args.rows:
+        X = blobs(n, centers, args.spread, rng)
+        keys = np.array([i.to_bytes(20, "big") for i in range(n)], dtype="S20")
+        t = time.perf_counter()
+        k, _ = choose_k(X, range(4, 13))
+        choose_s = time.perf_counter() - t
+        labels, state, _ = fit_topics(X, keys, None, "incremental", k)
+        full_prev = KMeans(n_clusters=k, n_init=10, random_state=42).fit_predict(X)
+        for week in range(1, args.weeks + 1):
+            m = int(n * args.new_frac)
+            X = np.vstack([X, blobs(m, centers, args.spread, rng)])
+            keys = np.concatenate([keys, np.array([(len(keys) + i).to_bytes(20, "big") for i in range(m)], dtype="S20")])
+            t = time.perf_counter()
+            full = KMeans(n_clusters=k, n_init=10, random_state=week).fit_predict(X)
+            full_s = time.perf_counter() - t
+            refit, _, _ = fit_topics(X, keys, state, "full", k)
+            t = time.perf_counter()
+            inc, state, info = fit_topics(X, keys, state, "incremental", k)
+            inc_s = time.perf_counter() - t
+            old = len(labels)
+            row = {"rows": len(X), "week": week, "new_rows": info["new_rows"], "mode": info["mode"],
+                   "chosen_k": k, "choose_k_s": round(choose_s, 2) if week == 1 else None,
+                   "full_kmeans_s": round(full_s, 3), "incremental_s": round(inc_s, 3),
+                   "speedup": round(full_s / inc_s, 1),
+                   "full_ids_kept": round(float((full[:old] == full_prev).mean()), 4),
+                   "refit_matched_ids_kept": round(float((refit[:old] == labels).mean()), 4),
+                   "incremental_ids_kept": round(float((inc[:old] == labels).mean()), 4),
+                   "ari_vs_full": round(adjusted_rand_score(full, inc), 4),
+                   "wcss_vs_full": round(wcss(X, inc) / wcss(X, full), 4)}
+            print(json.dumps(row)); results.append(row)
+            labels, full_prev = inc, full
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse, json, os, tempfile, time
+import numpy as np, pandas as pd
+from .bench_storage import synthetic_stage
+
+# Disk use and movers time for N restaurants snapshotted over W weeks: the old full-copy CSV
+# per week (movers = two read_csv + name merge; a W-week view = W read_csvs) against the
+# week-partitioned history store (load_history + trend_table over every week at once).
+
+def dir_mb(path: str) -> float:
+    return round(sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20, 1)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--weeks", type=int, default=26)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    import src.trends as trends
+    results = []
+    for n in args.rows:
+        base = synthetic_stage(n)
+        rng = np.random.default_rng(0)
+        legacy_dir, store_dir = tempfile.mkdtemp(prefix="bench_hist_csv_"), tempfile.mkdtemp(prefix="bench_hist_pq_")
+        t_csv = t_pq = 0.0
+        for k in range(args.weeks):
+            week = trends.week_start(2025, 1 + k)
+            snap = base.assign(score_total=base["score_total"] * rng.uniform(0.5, 1.5, n))
+            t = time.perf_counter(); snap.to_csv(os.path.join(legacy_dir, f"mentions_2025W{1 + k:02d}.csv"), index=False); t_csv += time.perf_counter() - t
+            t = time.perf_counter(); trends.write_week(snap, week, store_dir); t_pq += time.perf_counter() - t
+
+        files = sorted(os.listdir(legacy_dir))
+        def legacy_movers():
+            last, prev = (pd.read_csv(os.path.join(legacy_dir, f)) for f in files[-2:][::-1])
+            m = last[["name","score_total"]].merge(prev[["name","score_total"]], on="name", how="left", suffixes=("_new","_old"))
+            return m.assign(delta=m["score_total_new"] - m["score_total_old"].fillna(0))
+        def legacy_all_weeks():
+            return pd.concat([pd.read_csv(os.path.join(legacy_dir, f), usecols=["name","score_total"]).assign(week=f) for f in files])
+        def store_all_weeks():
+            return trends.trend_table(trends.load_history(None, ["name","score_total"], store_dir))
+
+        for mode, fn, write_s, mb in (("legacy_movers_2wk", legacy_movers, t_csv, dir_mb(legacy_dir)),
+                                      ("legacy_read_all_weeks", legacy_all_weeks, t_csv, dir_mb(legacy_dir)),
+                                      ("store_trend_all_weeks", store_all_weeks, t_pq, dir_mb(store_dir))):
+            t = time.perf_counter(); fn(); secs = time.perf_counter() - t
+            row = {"rows": n, "weeks": args.weeks, "mode": mode, "query_s": round(secs, 3),
+                   "snapshot_s_per_week": round(write_s / args.weeks, 3), "history_mb": mb}
+            print(json.dumps(row)); results.append(row)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
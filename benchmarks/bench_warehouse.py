@@ -0,0 +1,84 @@
+import argparse, json, os, random, tempfile, time
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from .bench_storage import synthetic_stage
+
+# Rows/sec loading mentions into the star schema: Warehouse.load (staged bulk load + set-based
+# upsert) against a naive loader that looks up / inserts the dimension rows and inserts each
+# fact with its own statements (one transaction, so it isn't measuring fsyncs). Runs on SQLite
+# and DuckDB; pass --pg_url to include Postgres.
+
+def synthetic_mentions(n: int, scored: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    names = scored["name"].tolist()
+    return pd.DataFrame({
+        "name": [rng.choice(names) for _ in range(n)],
+        "created_iso": [(now - timedelta(days=rng.uniform(0, 90))).isoformat() for _ in range(n)],
+        "source_url": [f"https://www.reddit.com/r/FoodLosAngeles/comments/p{i // 8}/c{i}/" for i in range(n)],
+        "why": ["Best bite I've had all month." for _ in range(n)],
+        "sentiment": [rng.choice(["positive", "neutral", "negative"]) for _ in range(n)],
+    })
+
+def naive_load(wh, dims: pd.DataFrame, facts: pd.DataFrame):
+    ph = "%s" if wh.dialect == "postgres" else "?"
+    by_norm = dims.set_index("name_norm")
+    for r in facts.itertuples(index=False):
+        rid = wh.execute(f"SELECT restaurant_id FROM restaurants_dim WHERE name_norm = {ph}", (r.name_norm,)).fetchone()
+        if rid is None:
+            d = by_norm.loc[r.name_norm]
+            wh.execute(f"INSERT INTO restaurants_dim (name, name_norm, neighborhood, cuisine) VALUES ({ph}, {ph}, {ph}, {ph})",
+                       (d["name"], r.name_norm, d["neighborhood"], d["cuisine"]))
+            rid = wh.execute(f"SELECT restaurant_id FROM restaurants_dim WHERE name_norm = {ph}", (r.name_norm,)).fetchone()
+        sid = wh.execute(f"SELECT source_id FROM sources_dim WHERE source_name = {ph}", (r.source,)).fetchone()
+        if sid is None:
+            wh.execute(f"INSERT INTO sources_dim (source_name) VALUES ({ph})", (r.source,))
+            sid = wh.execute(f"SELECT source_id FROM sources_dim WHERE source_name = {ph}", (r.source,)).fetchone()
+        wh.execute(f"INSERT INTO mentions_fact (restaurant_id, source_id, created_at, sentiment_label, why, url, mention_key) "
+                   f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})",
+                   (rid[0], sid[0], r.created_at.strftime("%Y-%m-%d %H:%M:%S"), r.sentiment_label, r.why, r.url, r.mention_key))
+    wh.con.commit()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentions", type=int, default=1000000)
+    ap.add_argument("--restaurants", type=int, default=50000)
+    ap.add_argument("--naive_rows", type=int, default=20000, help="naive loader is timed on this many mentions")
+    ap.add_argument("--pg_url", type=str, default=None)
+    ap.add_argument("--out", type=str, default=None)
+    args = ap.parse_args()
+
+    from src.load_warehouse import Warehouse, mention_rows, restaurant_rows
+    scored = synthetic_stage(args.restaurants)
+    dims = restaurant_rows(scored).drop_duplicates("name_norm")
+    facts = mention_rows(synthetic_mentions(args.mentions, scored))
+    tmp = tempfile.mkdtemp(prefix="bench_wh_")
+    urls = {"sqlite": f"sqlite:///{tmp}/{{}}.sqlite", "duckdb": f"duckdb:///{tmp}/{{}}.duckdb"}
+    if args.pg_url:
+        urls["postgres"] = args.pg_url
+    results = []
+    for backend, url in urls.items():
+        for mode in ("naive", "bulk", "bulk_rerun"):
+            wh = Warehouse(url.format(mode.split("_")[0]))
+            if backend == "postgres" and mode != "bulk_rerun":
+                for t in ("vw_trending_restaurants", "vw_new_openings"):
+                    wh.execute(f"DROP MATERIALIZED VIEW IF EXISTS {t}")
+                wh.execute("DROP TABLE IF EXISTS mentions_fact, restaurants_dim, sources_dim CASCADE"); wh.con.commit()
+            wh.ensure_schema()
+            n = args.naive_rows if mode == "naive" else len(facts)
+            t = time.perf_counter()
+            if mode == "naive":
+                naive_load(wh, dims, facts.head(n))
+            else:
+                wh.load(dims, facts)
+            secs = time.perf_counter() - t
+            row = {"backend": backend, "mode": mode, "mentions": n, "load_s": round(secs, 2),
+                   "rows_per_s": round(n / secs), "facts_in_table": wh.count("mentions_fact")}
+            print(json.dumps(row)); results.append(row)
+            wh.close()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import hashlib, json, random, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the Google Geocoding endpoint. Point geocode_and_map at it with
+# GOOGLE_GEOCODE_URL=http://127.0.0.1:<port>/maps/api/geocode/json and any GOOGLE_MAPS_API_KEY.
+# Answers are deterministic in the address: miss_rate of addresses get ZERO_RESULTS, the rest
+# a point inside the LA basin. fail_rate answers with 503 to exercise the retry path.
+
+def fake_location(address: str, miss_rate: float = 0.1):
+    h = int(hashlib.md5(address.encode()).hexdigest()[:12], 16)
+    if h % 1000 < miss_rate * 1000:
+        return None
+    return {"lat": 33.7 + (h % 6000) / 10000, "lng": -118.7 + (h // 6000 % 8000) / 10000}
+
+class FakeGeocodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_rate = 0.0
+    rng = random.Random(0)
+    lock = threading.Lock()
+    counts = {"requests": 0, "failures": 0}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        with self.lock:
+            self.counts["requests"] += 1
+            fail = self.rng.random() < self.fail_rate
+            if fail:
+                self.counts["failures"] += 1
+        time.sleep(self.latency)
+        if fail:
+            return self._send(503, {"status": "UNKNOWN_ERROR"})
+        address = parse_qs(urlparse(self.path).query).get("address", [""])[0]
+        loc = fake_location(address)
+        if loc is None:
+            return self._send(200, {"status": "ZERO_RESULTS", "results": []})
+        self._send(200, {"status": "OK", "results": [{"formatted_address": address, "geometry": {"location": loc}}]})
+
+@contextmanager
+def serve(latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+    """Run the fake server on a free local port; yields (geocode_url, counts)."""
+    handler = type("Handler", (FakeGeocodeHandler,), {"latency": latency, "fail_rate": fail_rate, "rng": random.Random(seed),
+                                                      "lock": threading.Lock(), "counts": {"requests": 0, "failures": 0}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/maps/api/geocode/json", handler.counts
+    finally:
+        server.shutdown()
+        server.server_close()
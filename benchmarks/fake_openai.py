@@ -0,0 +1,123 @@
+import hashlib, json, random, re, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Local stand-in for the OpenAI chat-completions endpoint. Point a stage at it with
+# OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY.
+#
+# Replies are deterministic in the prompt: every capitalised "Xxx Yyy" run in the last user
+# message whose hash lands under hit_rate comes back as a mention, so outputs can be diffed
+# across runs. latency adds a fixed delay per request; fail_rate answers that fraction of
+# requests with 429 (Retry-After: 0) or 503 to exercise the retry path. Requests carrying the
+# llm_enhance system prompt get fake_enhancement replies instead; /embeddings returns
+# fake_embedding vectors.
+
+EMBED_DIM = 256
+NAME_RE = re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)*")
+
+def fake_extraction(prompt: str, hit_rate: float = 0.5) -> dict:
+    mentions = []
+    for name in dict.fromkeys(NAME_RE.findall(prompt)):
+        h = int(hashlib.md5(name.encode()).hexdigest()[:8], 16)
+        if h % 1000 < hit_rate * 1000:
+            mentions.append({"name": name, "neighborhood": None, "cuisine": None, "why": f"Recommended: {name}",
+                             "sentiment": "positive", "source_url": "", "created_iso": "2025-01-01T00:00:00Z"})
+    return {"mentions": mentions}
+
+def _enhance_one(name: str, why: str) -> dict:
+    h = int(hashlib.md5(f"{name}\n{why}".encode()).hexdigest()[:8], 16)
+    dishes = [w.lower() for w in re.findall(r"[A-Za-z]{5,}", why)][:h % 4]
+    return {"signature_dishes": dishes, "sentiment_label": ("must-try", "good", "mixed")[h % 3]}
+
+def fake_enhancement(prompt: str, drop_rate: float = 0.05) -> dict:
+    """llm_enhance replies: a JSON list of {id, name, why} gets {"results": [...]} back with
+    about drop_rate of the ids left out, to exercise the per-row fallback; the single-row
+    "NAME: ... WHY: ..." prompt gets one object. The answer for a row is the same either way."""
+    try:
+        items = json.loads(prompt)
+    except ValueError:
+        name = re.search(r"^NAME: (.*)$", prompt, re.M)
+        why = re.search(r"^WHY: (.*)$", prompt, re.M)
+        return _enhance_one(name.group(1) if name else "", why.group(1) if why else "")
+    results = []
+    for it in items:
+        if int(hashlib.md5(f"drop{it['id']}{it['name']}".encode()).hexdigest()[:8], 16) % 1000 < drop_rate * 1000:
+            continue
+        results.append({"id": it["id"], **_enhance_one(it["name"], it["why"])})
+    return {"results": results}
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list:
+    """Unit vector seeded by the text, so equal texts embed identically across runs."""
+    rng = np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:16], 16))
+    v = rng.standard_normal(dim)
+    return (v / np.linalg.norm(v)).round(6).tolist()
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_rate = 0.0
+    rng = random.Random(0)
+    lock = threading.Lock()
+    counts = {"requests": 0, "failures": 0}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.lock:
+            self.counts["requests"] += 1
+            fail = self.rng.random() < self.fail_rate
+            if fail:
+                self.counts["failures"] += 1
+        time.sleep(self.latency)
+        if fail:
+            status = self.rng.choice([429, 503])
+            return self._send(status, {"error": {"message": "fake failure", "type": "rate_limit" if status == 429 else "server"}},
+                              {"Retry-After": "0"} if status == 429 else None)
+        if self.path.endswith("/chat/completions"):
+            return self._send(200, self.chat(body))
+        if self.path.endswith("/embeddings"):
+            return self._send(200, self.embeddings(body))
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def chat(self, body: dict) -> dict:
+        prompt = body["messages"][-1]["content"]
+        system = body["messages"][0]["content"] if len(body["messages"]) > 1 else ""
+        content = json.dumps(fake_enhancement(prompt) if "signature_dishes" in system else fake_extraction(prompt))
+        return {"id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4}}
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = [{"object": "embedding", "index": i, "embedding": fake_embedding(t)} for i, t in enumerate(inputs)]
+        tokens = sum(len(t) // 4 for t in inputs)
+        return {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+@contextmanager
+def serve(latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+    """Run the fake server on a free local port; yields (base_url, counts)."""
+    handler = type("Handler", (FakeOpenAIHandler,), {"latency": latency, "fail_rate": fail_rate, "rng": random.Random(seed),
+                                                     "lock": threading.Lock(), "counts": {"requests": 0, "failures": 0}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1", handler.counts
+    finally:
+        server.shutdown()
+        server.server_close()
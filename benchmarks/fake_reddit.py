@@ -0,0 +1,57 @@
+import threading, time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# In-process stand-in for the slice of PRAW that scrape_reddit uses: subreddit(name).search()
+# listings (newest first) and submission(id=...).comments. Pass `lambda: FakeReddit(world)` as
+# reddit_factory. latency is the sleep per comment-tree fetch; fail_after raises once that many
+# trees have been fetched across all instances, to simulate a crash mid-run.
+
+class FakeCrash(RuntimeError):
+    pass
+
+class FakeWorld:
+    """Threads keyed by subreddit, in raw_threads.jsonl shape (permalink without the host)."""
+
+    def __init__(self, threads: List[Dict[str, Any]], latency: float = 0.0, fail_after: Optional[int] = None):
+        self.threads = {t["id"]: t for t in threads}
+        self.latency, self.fail_after = latency, fail_after
+        self.fetches = 0
+        self.lock = threading.Lock()
+
+    def add_comments(self, post_id: str, comments: List[Dict[str, Any]]):
+        t = self.threads[post_id]
+        t["comments"] = t["comments"] + comments
+        t["num_comments"] = len(t["comments"])
+
+class _Forest:
+    def __init__(self, comments):
+        self._comments = comments
+
+    def replace_more(self, limit=None):
+        return []
+
+    def list(self):
+        return [SimpleNamespace(**c) for c in self._comments]
+
+class FakeReddit:
+    def __init__(self, world: FakeWorld):
+        self.world = world
+
+    def subreddit(self, name: str):
+        world = self.world
+
+        class _Sub:
+            def search(self, query=None, sort="new", time_filter="month"):
+                rows = [t for t in world.threads.values() if t["subreddit"].strip("r/") == name]
+                for t in sorted(rows, key=lambda t: -t["created_utc"]):
+                    yield SimpleNamespace(**{k: v for k, v in t.items() if k not in ("comments", "subreddit")})
+        return _Sub()
+
+    def submission(self, id: str):
+        with self.world.lock:
+            if self.world.fail_after is not None and self.world.fetches >= self.world.fail_after:
+                raise FakeCrash(f"fake crash after {self.world.fetches} fetches")
+            self.world.fetches += 1
+        time.sleep(self.world.latency)
+        return SimpleNamespace(comments=_Forest([dict(c) for c in self.world.threads[id]["comments"]]))
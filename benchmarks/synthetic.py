@@ -0,0 +1,124 @@
+import argparse, json, os, random, time
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+from typing import Any, Dict, List
+
+# Synthetic inputs for the benchmarks: restaurant-like names with near-duplicates, Reddit
+# threads whose comments mention them, extracted mentions, and an Eater-style RSS feed, so
+# stages can be timed without API keys. `python -m benchmarks.synthetic --posts 200
+# --mentions 50000 --out_dir /tmp/la` writes raw_threads.jsonl, mentions_raw.jsonl and feed.xml.
+
+FOOD = ["Tacos","Pho","Sushi","Ramen","Pizza","BBQ","Noodle","Burger","Bakery","Cafe","Grill","Kitchen","Bar","Deli","Mariscos","Thai","Dumpling","Taqueria","Bistro","House"]
+HOODS = ["Koreatown","Silver Lake","Echo Park","Highland Park","Venice","Hollywood","Downtown","Sawtelle","Boyle Heights","Culver City"]
+
+ONSETS = ["b","c","d","f","g","h","j","k","l","m","n","p","r","s","t","v","w","y","z","ch","sh","th","br","gr","st","tr","kw","ph","bl","cr"]
+NUCLEI = ["a","e","i","o","u","ai","ou","ee","oo","ia","y"]
+CODAS = ["","","","n","r","s","l","t","k","m","ng","x"]
+
+def _word(rng):
+    return "".join(rng.choice(ONSETS) + rng.choice(NUCLEI) + rng.choice(CODAS) for _ in range(rng.randint(1, 3))).capitalize()
+
+def _typo(rng, s):
+    i = rng.randrange(len(s))
+    op = rng.random()
+    if op < 0.4: return s[:i] + s[i+1:] if len(s) > 3 else s
+    if op < 0.7: return s[:i] + rng.choice("aeiou") + s[i:]
+    return s[:i] + s[i+1:i+2] + s[i:i+1] + s[i+2:]
+
+def synthetic_names(n: int, seed: int = 0, dup_rate: float = 0.6):
+    """Restaurant-like names where ~dup_rate of rows are near-duplicates (typos, case, extra tokens)."""
+    rng = random.Random(seed)
+    bases = []
+    names = []
+    for _ in range(n):
+        if bases and rng.random() < dup_rate:
+            b = rng.choice(bases)
+            r = rng.random()
+            if r < 0.4: names.append(_typo(rng, b))
+            elif r < 0.6: names.append(b.lower())
+            elif r < 0.8: names.append(f"{b} {rng.choice(HOODS)}")
+            else: names.append(b)
+        else:
+            b = " ".join([_word(rng)] + ([_word(rng)] if rng.random() < 0.4 else []) + ([rng.choice(FOOD)] if rng.random() < 0.6 else []))
+            bases.append(b); names.append(b)
+    return names
+
+CHATTER = ["thanks!", "+1", "this", "Following", "lol same", "Great thread", "Saving this for later", "Agreed, thanks for the recs"]
+TEMPLATES = ["You have to try {name} in {hood}, the {food} is unreal.",
+             "{name} is overrated imo, went last week and it was mid.",
+             "Seconding {name}. Get there early, the line gets long.",
+             "If you're near {hood}, {name} just opened and it's great for {food}."]
+
+def synthetic_threads(n_posts: int, comments_per_post: int = 40, seed: int = 0, signal_rate: float = 0.35) -> List[Dict[str, Any]]:
+    """raw_threads.jsonl-shaped posts; about signal_rate of comments mention a restaurant."""
+    rng = random.Random(seed)
+    names = synthetic_names(max(n_posts * 4, 50), seed=seed)
+    now = time.time()
+    posts = []
+    for p in range(n_posts):
+        created = now - rng.uniform(0, 45 * 86400)
+        comments = []
+        for c in range(rng.randint(comments_per_post // 2, comments_per_post * 3 // 2)):
+            if rng.random() < signal_rate:
+                body = rng.choice(TEMPLATES).format(name=rng.choice(names), hood=rng.choice(HOODS), food=rng.choice(FOOD).lower())
+            else:
+                body = rng.choice(CHATTER)
+            comments.append({"id": f"c{p}_{c}", "parent_id": f"t3_p{p}", "body": body,
+                             "score": int(rng.paretovariate(1.2)), "created_utc": created + rng.uniform(0, 86400)})
+        posts.append({"id": f"p{p}", "title": f"Best spots in {rng.choice(HOODS)}?", "selftext": "Looking for recs.",
+                      "permalink": f"https://www.reddit.com/r/FoodLosAngeles/comments/p{p}/", "url": "",
+                      "score": rng.randint(0, 500), "num_comments": len(comments), "created_utc": created,
+                      "subreddit": "r/FoodLosAngeles", "comments": comments})
+    return posts
+
+def write_jsonl(path: str, rows: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r) + "\n")
+
+SENTIMENTS = ["positive", "positive", "positive", "neutral", "negative"]
+
+def synthetic_mentions(n: int, seed: int = 0, days_back: float = 90) -> List[Dict[str, Any]]:
+    """mentions_raw.jsonl-shaped rows over synthetic_names, so dedupe sees the near-duplicates;
+    each restaurant keeps one neighborhood and cuisine, with some left blank as the LLM does."""
+    rng = random.Random(seed)
+    names = synthetic_names(max(n // 3, 1), seed=seed)
+    place = {nm: (rng.choice(HOODS), rng.choice(FOOD)) for nm in names}
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(n):
+        name = rng.choice(names)
+        hood, food = place[name]
+        rows.append({"name": name, "neighborhood": hood if rng.random() < 0.7 else None,
+                     "cuisine": food if rng.random() < 0.8 else None,
+                     "why": rng.choice(TEMPLATES).format(name=name, hood=hood, food=food.lower()),
+                     "sentiment": rng.choice(SENTIMENTS),
+                     "source_url": f"https://www.reddit.com/r/FoodLosAngeles/comments/p{i // 20}/c{i}/",
+                     "created_iso": (now - timedelta(days=rng.uniform(0, days_back))).isoformat()})
+    return rows
+
+def synthetic_feed(n: int = 40, seed: int = 0) -> str:
+    """An RSS document shaped like the Eater LA feed sources_external reads."""
+    rng = random.Random(seed)
+    items = "".join(f"<item><title>{escape(nm)}</title><link>https://la.eater.com/{i}</link>"
+                    f"<description>{escape(nm)} opens in {rng.choice(HOODS)}.</description></item>"
+                    for i, nm in enumerate(synthetic_names(n, seed=seed + 1, dup_rate=0)))
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Eater LA</title>{items}</channel></rss>'
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=200, help="raw_threads.jsonl posts")
+    ap.add_argument("--comments", type=int, default=40, help="mean comments per post")
+    ap.add_argument("--mentions", type=int, default=10000, help="mentions_raw.jsonl rows")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out_dir", type=str, required=True)
+    args = ap.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    write_jsonl(os.path.join(args.out_dir, "raw_threads.jsonl"), synthetic_threads(args.posts, args.comments, args.seed))
+    write_jsonl(os.path.join(args.out_dir, "mentions_raw.jsonl"), synthetic_mentions(args.mentions, args.seed))
+    with open(os.path.join(args.out_dir, "feed.xml"), "w", encoding="utf-8") as f:
+        f.write(synthetic_feed(seed=args.seed))
+    print(f"Wrote raw_threads.jsonl, mentions_raw.jsonl and feed.xml to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
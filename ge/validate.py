@@ -1,6 +1,6 @@
 import os, pandas as pd
 def validate(path: str) -> int:
-    df = pd.read_csv(path)
+    df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
     problems = []
     req = ['name','neighborhood','cuisine','why','sentiment_label','score_buzz','score_trend','score_total']
     missing = [c for c in req if c not in df.columns]
@@ -13,5 +13,5 @@ def validate(path: str) -> int:
         print('DATA QUALITY FAILED:\n- ' + '\n- '.join(problems)); return 1
     print('Data quality checks passed.'); return 0
 if __name__ == '__main__':
-    import sys; path = sys.argv[1] if len(sys.argv)>1 else 'data/mentions_enhanced.csv'
+    import sys; path = sys.argv[1] if len(sys.argv)>1 else 'data/mentions_enhanced.parquet'
     raise SystemExit(validate(path))
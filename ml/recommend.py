@@ -1,14 +1,125 @@
-import os, pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+import argparse, os, threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np, pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
+from src.ann import top_k as top_k_ids
 from src.config import DATA_DIR
+from src.storage import file_digest, read_stage, stage_file
+
+# Keyword recommender: TF-IDF over name | cuisine | why | dishes, fitted once and saved as the
+# vocabulary + idf weights and the L2-normalised CSR matrix (data/recommend_tfidf.npz) next to
+# the rows (data/recommend_rows.parquet). Rows are unit length, so cosine similarity is one
+# sparse product per batch of queries, then argpartition over each query's nonzero scores. The source file's
+# digest is saved with the model: queries refit only when mentions_clean/enhanced changed.
+
+STAGES = ['mentions_enhanced', 'mentions_clean']
+COLUMNS = ['name', 'neighborhood', 'cuisine', 'why', 'signature_dishes', 'source_url']
+MODEL_PATH = os.path.join(DATA_DIR, 'recommend_tfidf.npz')
+ROWS_PATH = os.path.join(DATA_DIR, 'recommend_rows.parquet')
+PARAMS = dict(max_features=8000, stop_words='english')
+QUERY_BATCH = 256  # queries per sparse product
+
+def documents(df: pd.DataFrame) -> List[str]:
+    col = lambda c: df[c].astype(object).fillna('').astype(str) if c in df else pd.Series('', index=df.index)
+    return (col('name') + ' | ' + col('cuisine') + ' | ' + col('why') + ' | ' + col('signature_dishes')).tolist()
+
+class Recommender:
+    def __init__(self, model_path: str = MODEL_PATH, rows_path: str = ROWS_PATH):
+        self.model_path, self.rows_path = model_path, rows_path
+        self.vec: Optional[TfidfVectorizer] = None
+        self.X: Optional[sparse.csr_matrix] = None
+        self.rows: Optional[pd.DataFrame] = None
+        self.source: Optional[str] = None  # digest of the file the model was fit on
+        self.memo: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def fit(self, df: pd.DataFrame, source: Optional[str] = None) -> 'Recommender':
+        self.vec = TfidfVectorizer(**PARAMS)
+        self.X = self.vec.fit_transform(documents(df)).astype(np.float32).tocsr()  # rows already L2-normalised
+        self.rows, self.source = df.reset_index(drop=True), source
+        return self
+
+    def save(self):
+        # rows first, model last: load() only accepts the pair when the row counts agree
+        self.rows.to_parquet(self.rows_path + '.tmp', index=False)
+        os.replace(self.rows_path + '.tmp', self.rows_path)
+        with open(self.model_path + '.tmp', 'wb') as f:
+            np.savez(f, terms=self.vec.get_feature_names_out().astype(str), idf=self.vec.idf_, data=self.X.data,
+                     indices=self.X.indices, indptr=self.X.indptr, shape=np.array(self.X.shape), source=str(self.source or ''))
+        os.replace(self.model_path + '.tmp', self.model_path)
+
+    def load(self) -> bool:
+        if not (os.path.exists(self.model_path) and os.path.exists(self.rows_path)):
+            return False
+        m = np.load(self.model_path)
+        rows = pd.read_parquet(self.rows_path)
+        if int(m['shape'][0]) != len(rows):
+            return False
+        vec = TfidfVectorizer(vocabulary=list(m['terms']), **{k: v for k, v in PARAMS.items() if k != 'max_features'})
+        vec.idf_ = m['idf']
+        self.vec, self.rows, self.source = vec, rows, str(m['source']) or None
+        self.X = sparse.csr_matrix((m['data'], m['indices'], m['indptr']), shape=tuple(m['shape']))
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """Make the model current: load the saved one, and refit (and save) if the source file's
+        digest differs from the one it was fit on. Returns True if it refit."""
+        path = stage_file(STAGES)
+        digest = file_digest(path, self.memo)
+        if not force and self.X is not None and digest == self.source:
+            return False
+        with self._lock:
+            if not force and (self.X is not None or self.load()) and digest == self.source:
+                return False
+            self.fit(read_stage(STAGES, COLUMNS), digest).save()
+            return True
+
+    def recommend_many(self, queries: Sequence[str], top_k: int = 10) -> List[pd.DataFrame]:
+        """Best top_k rows per query by cosine similarity; rows sharing no term are left out."""
+        self.refresh()
+        ids, scores = [], []
+        for i in range(0, len(queries), QUERY_BATCH):
+            S = (self.vec.transform(list(queries[i:i + QUERY_BATCH])) @ self.X.T).tocsr()
+            for a, b in zip(S.indptr[:-1], S.indptr[1:]):
+                # only rows sharing a term are stored: top k among those, never a dense row
+                sims, cols = S.data[a:b], S.indices[a:b]
+                top = top_k_ids(sims, top_k)
+                ids.append(cols[top]); scores.append(sims[top])
+        # one take for every query's rows, then cheap positional slices
+        hits = self.rows.iloc[np.concatenate(ids) if ids else []][['name', 'neighborhood', 'cuisine', 'why']]
+        hits = hits.assign(score=np.concatenate(scores) if scores else [])
+        ends = np.cumsum([len(x) for x in ids])
+        return [hits.iloc[e - len(x):e] for x, e in zip(ids, ends)]
+
+    def recommend(self, query: str, top_k: int = 10) -> pd.DataFrame:
+        return self.recommend_many([query], top_k)[0]
+
+_recommender: Optional[Recommender] = None
+
+def get_recommender() -> Recommender:
+    global _recommender
+    if _recommender is None:
+        _recommender = Recommender()
+    return _recommender
+
 def recommend(query: str, top_k=10):
-    p = os.path.join(DATA_DIR,'mentions_enhanced.csv')
-    df = pd.read_csv(p) if os.path.exists(p) else pd.read_csv(os.path.join(DATA_DIR,'mentions_clean.csv'))
-    docs = (df['name'].fillna('') + ' | ' + df['cuisine'].fillna('') + ' | ' + df['why'].fillna('') + ' | ' + df.get('signature_dishes','').fillna('')).tolist()
-    vec = TfidfVectorizer(max_features=8000, stop_words='english')
-    X = vec.fit_transform(docs); qv = vec.transform([query])
-    sims = cosine_similarity(qv, X).ravel(); top = sims.argsort()[-top_k:][::-1]
-    return df.iloc[top][['name','neighborhood','cuisine','why']].assign(score=sims[top])
+    return get_recommender().recommend(query, top_k)
+
+def recommend_many(queries: Sequence[str], top_k=10):
+    return get_recommender().recommend_many(queries, top_k)
+
+def main():
+    ap = argparse.ArgumentParser(description='TF-IDF keyword recommendations over the restaurant table.')
+    ap.add_argument('queries', nargs='*', default=['casual Thai in Hollywood'])
+    ap.add_argument('--top_k', type=int, default=5)
+    ap.add_argument('--refit', action='store_true', help='refit even if the source data is unchanged')
+    args = ap.parse_args()
+    rec = get_recommender()
+    if rec.refresh(force=args.refit):
+        print(f'Fitted on {len(rec.rows)} rows -> {rec.model_path}')
+    for q, res in zip(args.queries, rec.recommend_many(args.queries, args.top_k)):
+        print(f'\n{q}\n' + res.to_string(index=False))
+
 if __name__ == '__main__':
-    print(recommend('casual Thai in Hollywood', 5).to_string(index=False))
+    main()
@@ -1,19 +1,163 @@
-import os, pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+import argparse, os
+from typing import Iterator, Optional
+import joblib, numpy as np, pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation as LDA
+from src import metrics
 from src.config import DATA_DIR
-def main(k=6):
-    p = os.path.join(DATA_DIR,'mentions_enhanced.csv')
-    df = pd.read_csv(p) if os.path.exists(p) else pd.read_csv(os.path.join(DATA_DIR,'mentions_clean.csv'))
-    texts = (df['name'].fillna('') + ' ' + df['why'].fillna('') + ' ' + df.get('signature_dishes','').fillna('')).tolist()
-    vec = TfidfVectorizer(max_features=5000, stop_words='english')
-    X = vec.fit_transform(texts)
-    lda = LDA(n_components=k, random_state=42)
-    lda.fit(X)
-    comps = lda.components_; terms = vec.get_feature_names_out()
+from src.dedupe_state import mention_keys
+from src.trends import restaurant_id
+
+# Online LDA over the whole mention history (data/mentions_raw.jsonl), read CHUNK rows at a
+# time, so memory is bounded by the chunk, the vocabulary, the restaurant count and a few bytes
+# per mention key, never by the documents of past weeks. A full fit (--full, or no saved model)
+# fixes the vocabulary from the first --vocab_docs documents and streams every chunk through
+# partial_fit; later runs load the model and partial_fit only mentions whose key isn't among the
+# saved ones, so each week's documents update it in place. Keys are dedupe_state.mention_keys
+# (thread, name, occurrence) kept as uint64, so a mention with no or an old timestamp is still
+# fed exactly once; the occurrence counts per (thread, name) pair live only for the run. The
+# E-step runs on --n_jobs cores. Topic mixtures are summed per restaurant as chunks go by and
+# saved with the model, so an update adds the new mentions' mixtures to the running sums (older
+# ones keep the topics they were scored with until the next --full). data/topic_mixtures.parquet
+# has the normalised mixture per restaurant, its dominant topic and that topic's top terms; the
+# app's Trends tab reads it (src/app_data.topic_mixtures).
+
+MODEL_PATH = os.path.join(DATA_DIR, 'topic_model.joblib')
+MIXTURES_PATH = os.path.join(DATA_DIR, 'topic_mixtures.parquet')
+RAW_PATH = os.path.join(DATA_DIR, 'mentions_raw.jsonl')
+CHUNK = 20000
+KEYS = 2  # bumped when mention keys change: a model keyed differently is refitted
+STATE = ['k', 'max_features', 'n_jobs', 'seed', 'vec', 'lda', 'keys', 'seen', 'docs', 'mix']
+
+def chunks(path: str = RAW_PATH, size: int = CHUNK) -> Iterator[pd.DataFrame]:
+    counts = {}
+    for df in pd.read_json(path, lines=True, chunksize=size, dtype=False):
+        df = df.reindex(columns=['name', 'cuisine', 'why', 'post_id', 'source_url'])
+        rows = df[['post_id', 'source_url', 'name']].astype(object)
+        keys = mention_keys(rows.where(rows.notna(), None).to_dict('records'), counts)
+        df['key'] = np.array([int(k, 16) for k in keys], dtype=np.uint64)
+        df = df[df['name'].notna() & (df['name'].astype(str).str.strip() != '')]
+        df['text'] = df['cuisine'].astype(object).fillna('').astype(str) + ' ' + df['why'].astype(object).fillna('').astype(str)
+        yield df
+
+class TopicModel:
+    def __init__(self, k: int = 8, max_features: int = 5000, n_jobs: int = -1, seed: int = 42):
+        self.k, self.max_features, self.n_jobs, self.seed = k, max_features, n_jobs, seed
+        self.vec: Optional[CountVectorizer] = None
+        self.lda: Optional[LDA] = None
+        self.keys = KEYS
+        self.seen = np.array([], dtype=np.uint64)  # sorted keys of the mentions fed in
+        self.docs = 0
+        self.mix = pd.DataFrame()  # restaurant_id -> name, docs, summed doc-topic rows
+
+    def _vocab(self, path: str, vocab_docs: int):
+        sample, n = [], 0
+        for df in chunks(path):
+            sample.append(df['text']); n += len(df)
+            if n >= vocab_docs:
+                break
+        self.vec = CountVectorizer(max_features=self.max_features, stop_words='english', min_df=2 if n > 1000 else 1)
+        self.vec.fit(pd.concat(sample).head(vocab_docs) if sample else pd.Series(['']))
+
+    def _feed(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        X = self.vec.transform(df['text'])
+        self.lda.partial_fit(X)
+        theta = self.lda.transform(X)
+        part = pd.DataFrame(theta, columns=[f'topic_{i}' for i in range(self.k)])
+        part['restaurant_id'] = restaurant_id(df['name'].astype(str))
+        part['name'] = df['name'].astype(str).to_numpy()
+        part['docs'] = 1
+        agg = part.groupby('restaurant_id').agg({'name': 'last', 'docs': 'sum', **{c: 'sum' for c in part.columns if c.startswith('topic_')}})
+        if self.mix.empty:
+            self.mix = agg
+        else:
+            both = self.mix.index.union(agg.index)
+            names = agg['name'].combine_first(self.mix['name']).reindex(both)
+            self.mix = self.mix.drop(columns='name').reindex(both, fill_value=0).add(agg.drop(columns='name').reindex(both, fill_value=0))
+            self.mix.insert(0, 'name', names)
+        self.docs += len(df)
+
+    def fit(self, path: str = RAW_PATH, vocab_docs: int = 200000) -> 'TopicModel':
+        self._vocab(path, vocab_docs)
+        self.lda = LDA(n_components=self.k, learning_method='online', batch_size=1024, n_jobs=self.n_jobs,
+                       random_state=self.seed, total_samples=1e6)
+        self.docs, self.mix, fed = 0, pd.DataFrame(), []
+        for df in chunks(path):
+            self._feed(df); fed.append(df['key'].to_numpy())
+        self.seen = np.unique(np.concatenate(fed)) if fed else np.array([], dtype=np.uint64)
+        return self
+
+    def _fed(self, keys: np.ndarray) -> np.ndarray:
+        i = np.minimum(np.searchsorted(self.seen, keys), max(len(self.seen) - 1, 0))
+        return self.seen[i] == keys if len(self.seen) else np.zeros(len(keys), dtype=bool)
+
+    def update(self, path: str = RAW_PATH) -> int:
+        """partial_fit on mentions not fed before; returns how many were fed."""
+        before, fed = self.docs, []
+        for df in chunks(path):
+            df = df[~self._fed(df['key'].to_numpy())]
+            self._feed(df); fed.append(df['key'].to_numpy())
+        if fed:
+            self.seen = np.union1d(self.seen, np.concatenate(fed))
+        return self.docs - before
+
+    def top_terms(self, n: int = 10):
+        terms = self.vec.get_feature_names_out()
+        return [[terms[j] for j in comp.argsort()[-n:][::-1]] for comp in self.lda.components_]
+
+    def mixtures(self) -> pd.DataFrame:
+        topics = [c for c in self.mix.columns if c.startswith('topic_')]
+        out = self.mix.copy()
+        out[topics] = out[topics].div(out['docs'], axis=0)
+        out['dominant_topic'] = out[topics].to_numpy().argmax(axis=1)
+        labels = [', '.join(terms[:5]) for terms in self.top_terms()]
+        out['topic_terms'] = [labels[t] for t in out['dominant_topic']]
+        return out.reset_index()
+
+    def save(self, path: str = MODEL_PATH, mixtures_path: str = MIXTURES_PATH):
+        # plain attributes, not the instance: the class is __main__.TopicModel under python -m
+        joblib.dump({k: getattr(self, k) for k in STATE}, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.mixtures().to_parquet(mixtures_path + '.tmp', index=False)
+        os.replace(mixtures_path + '.tmp', mixtures_path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional['TopicModel']:
+        if not os.path.exists(path):
+            return None
+        state = joblib.load(path)
+        if state.get('keys') != KEYS:
+            return None  # saved with a created_iso watermark or other keys: refit so each mention is fed once
+        model = cls()
+        model.__dict__.update(state)
+        return model
+
+@metrics.instrument('topic_model')
+def main():
+    ap = argparse.ArgumentParser(description='Online LDA topics over the mention history, updated in place each week.')
+    ap.add_argument('--full', action='store_true', help='refit from scratch over the whole history')
+    ap.add_argument('--k', type=int, default=8)
+    ap.add_argument('--max_features', type=int, default=5000)
+    ap.add_argument('--vocab_docs', type=int, default=200000, help='documents the fixed vocabulary is built from')
+    ap.add_argument('--n_jobs', type=int, default=-1, help='cores for the E-step')
+    ap.add_argument('--raw_path', type=str, default=RAW_PATH)
+    args = ap.parse_args()
+    if not os.path.exists(args.raw_path):
+        print('No raw mentions found.'); return
+    model = None if args.full else TopicModel.load()
+    if model is None or model.k != args.k:
+        model = TopicModel(args.k, args.max_features, args.n_jobs).fit(args.raw_path, args.vocab_docs)
+        print(f'Fitted on {model.docs} mentions')
+    else:
+        model.lda.n_jobs = args.n_jobs
+        print(f'Updated with {model.update(args.raw_path)} new mentions ({model.docs} total)')
+    model.save()
     print('Topics:')
-    for i, comp in enumerate(comps):
-        top = comp.argsort()[-10:][::-1]
-        print(f'Topic {i}: ' + ', '.join(terms[j] for j in top))
+    for i, terms in enumerate(model.top_terms()):
+        print(f'Topic {i}: ' + ', '.join(terms))
+    print(f'Mixtures for {len(model.mix)} restaurants -> {MIXTURES_PATH}')
+
 if __name__ == '__main__':
     main()
@@ -3,9 +3,9 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 from sklearn.ensemble import RandomForestClassifier
 from src.config import DATA_DIR
+from src.storage import read_stage
 def main():
-    p = os.path.join(DATA_DIR,'mentions_enhanced.csv')
-    df = pd.read_csv(p)
+    df = read_stage('mentions_enhanced', ['score_total', 'score_buzz', 'score_trend', 'mentions', 'sentiment_label'])
     thresh = df['score_total'].quantile(0.75)
     y = (df['score_total'] >= thresh).astype(int)
     X = pd.DataFrame({
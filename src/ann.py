@@ -0,0 +1,72 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Inverted-file (IVF) index for cosine search over unit-normalised vectors, in plain NumPy.
+# A spherical k-means coarse quantizer splits the rows into nlist lists; a query scores the
+# centroids, then scans only the rows of its nprobe closest lists. Rows are stored grouped by
+# list (order/offsets), so each probe is one contiguous slice of `order`.
+
+def _assign(X: np.ndarray, C: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    return np.concatenate([np.argmax(X[i:i+chunk] @ C.T, axis=1) for i in range(0, len(X), chunk)]) if len(X) else np.zeros(0, dtype=np.int64)
+
+def spherical_kmeans(X: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    C = np.array(X[rng.choice(len(X), k, replace=False)], dtype="float32")
+    for _ in range(iters):
+        labels = _assign(X, C)
+        sums = np.zeros_like(C)
+        np.add.at(sums, labels, X)
+        empty = ~sums.any(axis=1)
+        sums[empty] = X[rng.choice(len(X), int(empty.sum()), replace=False)]  # reseed empty lists
+        C = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-9)
+    return C.astype("float32")
+
+def top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest sims, best first (argpartition, then sort only those k)."""
+    k = min(k, len(sims))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+    return top[np.argsort(-sims[top], kind="stable")]
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids, self.order, self.offsets = centroids, order, offsets
+
+    @property
+    def size(self) -> int:
+        return len(self.order)
+
+    @classmethod
+    def build(cls, V: np.ndarray, nlist: Optional[int] = None, sample: int = 64, iters: int = 10, seed: int = 0) -> "IVFIndex":
+        """nlist defaults to ~sqrt(n); k-means trains on up to sample*nlist rows, then every row is assigned."""
+        n = len(V)
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+        train = np.asarray(V[np.sort(rng.choice(n, min(n, sample * nlist), replace=False))], dtype="float32")
+        C = spherical_kmeans(train, nlist, iters, seed)
+        labels = _assign(V, C)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+        return cls(C, order, offsets)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"])
+
+    def search(self, V: np.ndarray, Q: np.ndarray, k: int = 10, nprobe: int = 8) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Per query (ids, sims) of the best k rows of V among the nprobe nearest lists."""
+        probes = np.argsort(-(Q @ self.centroids.T), axis=1)[:, :nprobe]
+        ids, sims = [], []
+        for q, lists in zip(Q, probes):
+            # sorted ids keep the gather from a memory-mapped V mostly sequential
+            cand = np.sort(np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists]))
+            s = np.asarray(V[cand], dtype="float32") @ q
+            top = top_k(s, k)
+            ids.append(cand[top]); sims.append(s[top])
+        return ids, sims
@@ -0,0 +1,144 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np, pandas as pd
+from .config import DATA_DIR, OUT_DIR
+from .storage import read_stage, stage_file
+
+# Read-only data behind the Streamlit app. Streamlit re-runs the script on every widget
+# interaction, so the app caches these objects keyed on file_stamp() of their source files:
+# a rerun costs a few os.stat calls, and only a changed file is re-read. Filters resolve
+# against per-value posting lists (sorted row positions) instead of scanning the frame.
+
+APP_STAGES = ["mentions_clustered", "mentions_enhanced", "mentions_clean"]
+RAW_PATH = os.path.join(DATA_DIR, "mentions_raw.jsonl")
+MOVERS_PATH = os.path.join(DATA_DIR, "movers.csv")
+MIXTURES_PATH = os.path.join(DATA_DIR, "topic_mixtures.parquet")
+MAP_PATH = os.path.join(OUT_DIR, "la_food_map.html")
+TABLE_COLUMNS = ["name","neighborhood","cuisine","why","score_buzz","score_trend","score_total","source_url"]
+Stamp = Tuple
+
+def file_stamp(*paths: str) -> Stamp:
+    """(path, mtime_ns, size) per path, (path, None, None) for missing ones."""
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out.append((p, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            out.append((p, None, None))
+    return tuple(out)
+
+def mentions_stamp(stages: Sequence[str] = APP_STAGES) -> Optional[Stamp]:
+    try:
+        return file_stamp(stage_file(stages))
+    except FileNotFoundError:
+        return None
+
+def postings(s: pd.Series) -> Dict[str, np.ndarray]:
+    """Sorted row positions for each non-empty value of s."""
+    cat = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype("category")
+    codes = cat.cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(cat.cat.categories) + 1))
+    return {str(v): order[lo:hi] for v, lo, hi in zip(cat.cat.categories, bounds[:-1], bounds[1:]) if v and hi > lo}
+
+class MentionData:
+    """The mentions table plus everything the Explore/Heatmap tabs derive from it.
+
+    `table` is the display frame (TABLE_COLUMNS, strings filled) built once; select() returns
+    the sorted row positions matching the sidebar filters, or None when nothing is filtered."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.table = self.df[[c for c in TABLE_COLUMNS if c in self.df]].astype(object).fillna("")
+        self.index = {c: postings(self.df[c]) for c in ("cuisine", "neighborhood") if c in self.df}
+        self.options = {c: sorted(idx) for c, idx in self.index.items()}
+        buzz = self.df["score_buzz"] if "score_buzz" in self.df else pd.Series(0.0, index=self.df.index)
+        self.buzz = pd.to_numeric(buzz, errors="coerce").fillna(-np.inf).to_numpy("float64")
+        self.max_buzz = int(self.buzz.max()) if len(self.buzz) and np.isfinite(self.buzz.max()) else 0
+        self.must_try = (self.df["sentiment_label"].astype(object) == "must-try").to_numpy() \
+            if "sentiment_label" in self.df else None
+        coords = self.df[["lat","lng"]].dropna() if {"lat","lng"} <= set(self.df.columns) else None
+        self.points = None if coords is None else coords.to_numpy("float64")
+
+    @classmethod
+    def load(cls, stages: Sequence[str] = APP_STAGES) -> "MentionData":
+        return cls(read_stage(stages))
+
+    def __len__(self):
+        return len(self.df)
+
+    def select(self, cuisines: Sequence[str] = (), hoods: Sequence[str] = (), min_buzz: float = 0,
+               must_try_only: bool = False) -> Optional[np.ndarray]:
+        ids = None
+        for col, values in (("cuisine", cuisines), ("neighborhood", hoods)):
+            if values and col in self.index:
+                hits = [self.index[col][v] for v in values if v in self.index[col]]
+                sel = np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp)
+                ids = sel if ids is None else np.intersect1d(ids, sel, assume_unique=True)
+        if min_buzz > self.buzz.min(initial=np.inf):
+            ids = np.flatnonzero(self.buzz >= min_buzz) if ids is None else ids[self.buzz[ids] >= min_buzz]
+        if must_try_only and self.must_try is not None:
+            ids = np.flatnonzero(self.must_try) if ids is None else ids[self.must_try[ids]]
+        return ids
+
+    def rows(self, ids: Optional[np.ndarray]) -> pd.DataFrame:
+        return self.table if ids is None else self.table.iloc[ids]
+
+def weekly_timeline(path: str = RAW_PATH) -> Optional[pd.DataFrame]:
+    """Mentions per week (week = Monday start) from the raw LLM extractions."""
+    if not os.path.exists(path):
+        return None
+    raw = pd.read_json(path, lines=True, dtype=False)
+    if "created_iso" not in raw:
+        return pd.DataFrame({"week": pd.Series(dtype="datetime64[ns]"), "mentions": pd.Series(dtype="int64")})
+    ts = pd.to_datetime(raw["created_iso"], utc=True, errors="coerce", format="mixed").dropna().dt.tz_localize(None)
+    weeks = ts.dt.to_period("W").dt.start_time
+    return weeks.value_counts().sort_index().rename_axis("week").reset_index(name="mentions")
+
+def topic_mixtures(path: str = MIXTURES_PATH) -> Optional[pd.DataFrame]:
+    """Per-restaurant topic mixtures from ml.topic_modeling, most-mentioned first."""
+    if not os.path.exists(path):
+        return None
+    mix = pd.read_parquet(path)
+    topics = [c for c in mix.columns if c.startswith("topic_") and c != "topic_terms"]
+    cols = ["name", "docs", "dominant_topic"] + (["topic_terms"] if "topic_terms" in mix else []) + topics
+    return mix[cols].sort_values(["docs", "name"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+def read_text(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def ops_summary(runs: List[Dict[str, Any]]) -> pd.DataFrame:
+    """One row per stage from its latest metrics run (metrics.load_runs, oldest first)."""
+    rows = []
+    for r in {r["stage"]: r for r in runs}.values():
+        calls, cache = list(r["calls"].values()), list(r["cache"].values())
+        looked = sum(c["hits"] + c["misses"] for c in cache)
+        rows.append({"stage": r["stage"], "started": pd.Timestamp(r["started"]),
+                     "wall_s": r["phases"].get("total", {}).get("wall_s"), "cpu_s": r["phases"].get("total", {}).get("cpu_s"),
+                     "rows_read": sum(v["read"] for v in r["rows"].values()),
+                     "rows_written": sum(v["written"] for v in r["rows"].values()),
+                     "calls": sum(c["count"] for c in calls), "errors": sum(c["errors"] for c in calls),
+                     "retries": sum(c["retries"] for c in calls),
+                     "prompt_tokens": sum(t["prompt"] for t in r["tokens"].values()),
+                     "completion_tokens": sum(t["completion"] for t in r["tokens"].values()),
+                     "cache_hit_rate": round(sum(c["hits"] for c in cache) / looked, 3) if looked else None,
+                     "error": r["error"]})
+    return pd.DataFrame(rows)
+
+def ops_detail(run: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """Tables for one metrics run: phases, rows, calls (with percentiles) and the latency histogram."""
+    edges = [f"≤{b}ms" for b in run["buckets_ms"]] + [f">{run['buckets_ms'][-1]}ms"]
+    calls = pd.DataFrame([{"service": k, **{c: v[c] for c in ("count", "errors", "retries", "mean_ms", "p50_ms", "p95_ms", "max_s")}}
+                          for k, v in run["calls"].items()])
+    hist = pd.DataFrame([{"service": k, "latency": e, "order": i, "requests": n}
+                         for k, v in run["calls"].items() for i, (e, n) in enumerate(zip(edges, v["hist"])) if n])
+    return {"phases": pd.DataFrame([{"phase": k, **v} for k, v in run["phases"].items()]),
+            "rows": pd.DataFrame([{"data": k, **v} for k, v in run["rows"].items()]),
+            "calls": calls, "latency": hist,
+            "tokens": pd.DataFrame([{"model": k, **v} for k, v in run["tokens"].items()]),
+            "cache": pd.DataFrame([{"cache": k, **v} for k, v in run["cache"].items()]),
+            "counters": pd.DataFrame([{"counter": k, "count": v} for k, v in run["counters"].items()])}
@@ -1,24 +1,135 @@
-import os, pandas as pd, numpy as np
-from sklearn.cluster import KMeans
-from openai import OpenAI
-from .config import DATA_DIR, OPENAI_API_KEY
-
-def main(k=6):
-    path = os.path.join(DATA_DIR,"mentions_enhanced.csv")
-    if not os.path.exists(path): path = os.path.join(DATA_DIR,"mentions_clean.csv")
-    df = pd.read_csv(path)
-    texts = (df["name"].fillna("") + " | " + df["why"].fillna("") + " | " + df.get("signature_dishes","").fillna("")).tolist()
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embs = []
-    for i in range(0, len(texts), 100):
-        chunk = texts[i:i+100]
-        resp = client.embeddings.create(model="text-embedding-3-small", input=chunk)
-        embs.extend([e.embedding for e in resp.data])
-    X = np.array(embs, dtype="float32")
-    km = KMeans(n_clusters=k, n_init=10, random_state=42).fit(X)
-    df["topic_cluster"] = km.labels_
-    df.to_csv(os.path.join(DATA_DIR,"mentions_clustered.csv"), index=False)
-    print("Saved data/mentions_clustered.csv with topic clusters.")
+import argparse, os, pandas as pd, numpy as np
+from typing import Optional, Sequence, Tuple
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import pairwise_distances_argmin, silhouette_score
+from . import metrics
+from .config import DATA_DIR
+from .embedding_store import EmbeddingStore, mention_texts, text_key
+from .storage import read_stage, write_stage
+
+# Topic clusters over the mention embeddings, with ids that mean the same thing week to week.
+# The fitted centroids are saved in data/topic_centroids.npz with how many vectors each has
+# absorbed, a stable id per centroid and the keys of the texts already fed in. The default
+# incremental mode only feeds texts it hasn't seen: each new vector moves its nearest centroid
+# by 1/count, the MiniBatchKMeans update, with count carried over from previous runs (sklearn's
+# partial_fit can't be seeded with counts), then every row is labelled by nearest centroid.
+# A refit (no state, --mode full, or new texts past --refit_fraction of the seen ones) fits
+# MiniBatchKMeans (KMeans n_init=10 with --mode full), with k picked by silhouette on a sample
+# when --k auto, and maps the new centroids onto the old ids by minimum-distance matching.
+
+STATE_PATH = os.path.join(DATA_DIR, "topic_centroids.npz")
+
+class TopicState:
+    def __init__(self, centroids: np.ndarray, counts: np.ndarray, ids: np.ndarray, next_id: int, seen: np.ndarray):
+        self.centroids, self.counts, self.ids = centroids.astype(np.float32), counts.astype(np.float64), ids.astype(np.int64)
+        self.next_id, self.seen = int(next_id), seen.astype("S20")
+
+    @classmethod
+    def load(cls, path: str = STATE_PATH) -> Optional["TopicState"]:
+        if not os.path.exists(path):
+            return None
+        d = np.load(path)
+        return cls(d["centroids"], d["counts"], d["ids"], int(d["next_id"]), d["seen"])
+
+    def save(self, path: str = STATE_PATH):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, counts=self.counts, ids=self.ids, next_id=self.next_id, seen=self.seen)
+        os.replace(path + ".tmp", path)
+
+def choose_k(X: np.ndarray, ks: Sequence[int], sample: int = 5000, seed: int = 42) -> Tuple[int, dict]:
+    """k with the best silhouette, each candidate fit and scored on the same random sample."""
+    rng = np.random.default_rng(seed)
+    S = X[rng.choice(len(X), sample, replace=False)] if len(X) > sample else X
+    scores = {}
+    for k in ks:
+        if 2 <= k < len(S):
+            labels = MiniBatchKMeans(n_clusters=k, n_init=3, random_state=seed).fit_predict(S)
+            scores[k] = round(float(silhouette_score(S, labels)), 4) if len(set(labels)) > 1 else -1.0
+    return (max(scores, key=scores.get) if scores else max(1, min(ks[0], len(X)))), scores
+
+def match_ids(new: np.ndarray, prev: Optional[TopicState]) -> Tuple[np.ndarray, int]:
+    """Stable ids for new centroids: each takes the id of the previous centroid it is paired
+    with by minimum total distance (Hungarian); centroids left over get fresh ids."""
+    if prev is None or prev.centroids.shape[1] != new.shape[1]:
+        return np.arange(len(new), dtype=np.int64), len(new)
+    cost = ((new[:, None, :] - prev.centroids[None, :, :]) ** 2).sum(-1)
+    rows, cols = linear_sum_assignment(cost)
+    ids = np.full(len(new), -1, dtype=np.int64)
+    ids[rows] = prev.ids[cols]
+    next_id = prev.next_id
+    for i in np.flatnonzero(ids < 0):
+        ids[i], next_id = next_id, next_id + 1
+    return ids, next_id
+
+def online_update(centroids: np.ndarray, counts: np.ndarray, X: np.ndarray, batch: int = 1024):
+    """Fold X into the centroids in mini-batches: each centroid moves to the running mean of
+    everything assigned to it. Updates centroids and counts in place."""
+    for i in range(0, len(X), batch):
+        B = X[i:i + batch]
+        labels = pairwise_distances_argmin(B, centroids)
+        n = np.bincount(labels, minlength=len(centroids)).astype(np.float64)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, labels, B)
+        hit = n > 0
+        counts[hit] += n[hit]
+        centroids[hit] += ((sums[hit] - n[hit, None] * centroids[hit]) / counts[hit, None]).astype(centroids.dtype)
+
+def fit_topics(X: np.ndarray, keys: np.ndarray, prev: Optional[TopicState], mode: str = "incremental", k="auto",
+               k_range: Sequence[int] = (4, 12), sample: int = 5000, refit_fraction: float = 0.5) -> Tuple[np.ndarray, TopicState, dict]:
+    """Labels (stable ids) for every row of X, the state to save, and what was done."""
+    new = ~np.isin(keys, prev.seen) if prev is not None else np.ones(len(X), dtype=bool)
+    warm = (mode == "incremental" and prev is not None and prev.centroids.shape[1] == X.shape[1]
+            and new.sum() <= refit_fraction * max(len(prev.seen), 1))
+    info = {"mode": "warm" if warm else "refit" if mode == "incremental" else mode, "rows": len(X), "new_rows": int(new.sum())}
+    if warm:
+        with metrics.phase("online_update"):
+            centroids, counts = prev.centroids.copy(), prev.counts.copy()
+            online_update(centroids, counts, X[new])
+        ids, next_id = prev.ids, prev.next_id
+        seen = np.union1d(prev.seen, keys[new])
+    else:
+        if k == "auto":
+            with metrics.phase("choose_k"):
+                k, info["silhouette"] = choose_k(X, range(k_range[0], k_range[1] + 1), sample)
+        k = min(int(k), len(X))
+        with metrics.phase("fit"):
+            if mode == "full":
+                km = KMeans(n_clusters=k, n_init=10, random_state=42).fit(X)
+            else:
+                km = MiniBatchKMeans(n_clusters=k, n_init=3, batch_size=2048, random_state=42).fit(X)
+        centroids = km.cluster_centers_.astype(np.float32)
+        counts = np.bincount(km.labels_, minlength=k).astype(np.float64)
+        ids, next_id = match_ids(centroids, prev)
+        seen = np.unique(keys)
+    info["k"] = len(centroids)
+    labels = ids[pairwise_distances_argmin(X, centroids)]
+    return labels, TopicState(centroids, counts, ids, next_id, seen), info
+
+@metrics.instrument("cluster_topics")
+def main():
+    ap = argparse.ArgumentParser(description="Cluster mention embeddings into topics with week-stable ids.")
+    ap.add_argument("--mode", choices=["incremental", "full"], default="incremental",
+                    help="incremental: warm-start from the saved centroids; full: refit KMeans from scratch")
+    ap.add_argument("--k", default="auto", help="clusters for a refit, or 'auto' (best silhouette in --k_range)")
+    ap.add_argument("--k_range", type=int, nargs=2, default=[4, 12])
+    ap.add_argument("--sample", type=int, default=5000, help="rows the silhouette is computed on")
+    ap.add_argument("--refit_fraction", type=float, default=0.5, help="refit when new texts exceed this share of the seen ones")
+    args = ap.parse_args()
+
+    df = read_stage(["mentions_enhanced", "mentions_clean"])
+    texts = mention_texts(df)
+    store = EmbeddingStore()
+    with metrics.phase("embed"):
+        X = store.embed(texts)
+    print(store.summary())
+    keys = np.array([text_key(t) for t in texts], dtype="S20")
+    prev = TopicState.load()
+    labels, state, info = fit_topics(X, keys, prev, args.mode, args.k, args.k_range, args.sample, args.refit_fraction)
+    df["topic_cluster"] = labels
+    state.save()
+    print(f"Topics: {info}")
+    print(f"Saved {write_stage(df, 'mentions_clustered')} with topic clusters.")
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,14 @@
-import argparse, json, os, math, statistics, datetime as dt
+import argparse, json, os
 from typing import List, Dict, Any
-import pandas as pd
+import numpy as np, pandas as pd
 from rapidfuzz import fuzz
+from . import metrics
 from .config import DATA_DIR
-
-def time_decay_weight(ts: pd.Series, half_life_days: int = 30) -> pd.Series:
-    now = pd.Timestamp.utcnow()
-    ages = (now - pd.to_datetime(ts, errors="coerce")).dt.total_seconds() / (3600*24)
-    lam = math.log(2) / max(half_life_days,1)
-    return (2 ** (-ages * lam))
+from .storage import write_stage
+from .fuzzy_blocking import cluster_names_blocked
+from .dedupe_state import (SEEN_DAYS, load_state, save_state, read_new_mentions, update_state, state_frame, empty_state,
+                           cluster_aliases, save_aliases)
+from .scoring import decayed, group_log_fwd, score_columns
 
 def cluster_names(names: List[str], threshold: int = 88) -> Dict[int, List[int]]:
     clusters = {}
@@ -31,14 +31,103 @@ def cluster_names(names: List[str], threshold: int = 88) -> Dict[int, List[int]]
         cluster_id += 1
     return clusters
 
+ENGINES = {"greedy": cluster_names, "blocked": cluster_names_blocked}
+
+# Per-cluster columns from factorized codes and segment reductions over rows sorted by cluster,
+# instead of a Python lambda per cluster and column. Matches the groupby/value_counts version:
+# modes break count ties by first appearance within the cluster, NaN is skipped, and a cluster
+# with no values gets the column's default.
+
+def _segments(keys):
+    """(sorted unique keys, group index per row, stable row order by group, segment starts)."""
+    gid, uniq = pd.factorize(pd.Series(keys), sort=True)
+    order = np.argsort(gid, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(gid[order]) != 0]) if len(gid) else np.zeros(0, dtype=np.int64)
+    return uniq, gid, order, starts
+
+def _take(uniq, codes, default):
+    out = pd.Series(uniq).reindex(codes).reset_index(drop=True)
+    return out if default is None else out.where(codes >= 0, default)
+
+def group_mode(gid, values, n_groups: int, default=None) -> pd.Series:
+    """Most frequent non-null value per group; ties go to the value seen first in the group."""
+    codes, uniq = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    rows = np.flatnonzero(codes >= 0)
+    pair = gid[rows].astype(np.int64) * max(len(uniq), 1) + codes[rows]
+    keys, first, counts = np.unique(pair, return_index=True, return_counts=True)
+    g = keys // max(len(uniq), 1)
+    best = np.lexsort((first, -counts, g))
+    best = best[np.r_[True, g[best][1:] != g[best][:-1]]] if len(best) else best
+    out = np.full(n_groups, -1, dtype=np.int64)
+    out[g[best]] = keys[best] % max(len(uniq), 1)
+    return _take(uniq, out, default)
+
+def group_first(gid, values, n_groups: int, default=None) -> pd.Series:
+    """First non-null value per group, in row order."""
+    values = pd.Series(values).reset_index(drop=True)
+    rows = np.flatnonzero(values.notna().to_numpy())
+    g, first = np.unique(gid[rows], return_index=True)
+    out = np.full(n_groups, -1, dtype=np.int64)
+    out[g] = rows[first]
+    return _take(values, out, default)
+
+def aggregate_clusters(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per cluster_id (sorted): mode name/neighborhood/cuisine/sentiment, first why and
+    source_url, and first_seen/last_seen/mentions from the non-null created_iso strings."""
+    uniq, gid, order, starts = _segments(df["cluster_id"])
+    n = len(uniq)
+    ts_codes, ts_uniq = pd.factorize(df["created_iso"], sort=True)
+    seg = ts_codes[order]
+    has_ts = seg >= 0
+    mentions = np.add.reduceat(has_ts.astype(np.int64), starts) if n else np.zeros(0, dtype=np.int64)
+    lo = np.minimum.reduceat(np.where(has_ts, seg, len(ts_uniq)), starts) if n else seg
+    hi = np.maximum.reduceat(seg, starts) if n else seg
+    return pd.DataFrame({
+        "name": group_mode(gid, df["name_norm"], n),
+        "neighborhood": group_mode(gid, df["neighborhood"], n),
+        "cuisine": group_mode(gid, df["cuisine"], n),
+        "why": group_first(gid, df["why"], n),
+        "source_url": group_first(gid, df["source_url"], n),
+        "sentiment": group_mode(gid, df["sentiment"], n, default="positive"),
+        "first_seen": _take(ts_uniq, np.where(lo < len(ts_uniq), lo, -1), None),
+        "last_seen": _take(ts_uniq, hi, None),
+        "mentions": mentions.astype(np.int64),
+    }).set_index(pd.Index(uniq, name="cluster_id"))
+
+@metrics.instrument("dedupe_and_score")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--min_similarity", type=int, default=88)
     ap.add_argument("--decay_half_life_days", type=int, default=30)
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="blocked")
+    ap.add_argument("--incremental", action="store_true", help="fold only new mentions into the saved cluster state")
+    ap.add_argument("--rebuild", action="store_true", help="with --incremental, discard the saved state first")
+    ap.add_argument("--seen_days", type=float, default=SEEN_DAYS, help="with --incremental, forget a thread's mention keys after this many days unchanged")
     args = ap.parse_args()
 
     raw_path = os.path.join(DATA_DIR, "mentions_raw.jsonl")
-    rows = [json.loads(l) for l in open(raw_path, "r", encoding="utf-8")] if os.path.exists(raw_path) else []
+    if args.incremental:
+        h = args.decay_half_life_days
+        with metrics.phase("load_state"):
+            state = empty_state(args.min_similarity, h) if args.rebuild else load_state(args.min_similarity, h)
+        with metrics.phase("fold"):
+            new = read_new_mentions(state, raw_path, seen_days=args.seen_days)
+            n_new = update_state(state, new)
+        metrics.rows("mentions_raw", read=len(new))
+        with metrics.phase("save_state"):
+            save_state(state)
+        if not state["clusters"]:
+            print("No mentions found. Did you run llm_pipeline?")
+            return
+        frame = state_frame(state)
+        save_aliases(cluster_aliases(state["names"], state["names"].values(), frame["name"].tolist()))
+        write_scored(frame, args.decay_half_life_days)
+        print(f"Folded {n_new} new mentions into {len(state['clusters'])} clusters")
+        return
+
+    with metrics.phase("load"):
+        rows = [json.loads(l) for l in open(raw_path, "r", encoding="utf-8")] if os.path.exists(raw_path) else []
+    metrics.rows("mentions_raw", read=len(rows))
 
     if not rows:
         print("No mentions found. Did you run llm_pipeline?")
@@ -53,30 +142,26 @@ def main():
     df = df[df["name_norm"]!=""].copy()
 
     names = df["name_norm"].tolist()
-    clusters = cluster_names(names, threshold=args.min_similarity)
+    with metrics.phase("cluster"):
+        clusters = ENGINES[args.engine](names, threshold=args.min_similarity)
     df["cluster_id"] = -1
     for cid, idxs in clusters.items():
         df.loc[df.index[idxs], "cluster_id"] = cid
 
-    agg = df.groupby("cluster_id").agg({
-        "name_norm": lambda s: s.value_counts().idxmax(),
-        "neighborhood": lambda s: s.dropna().value_counts().index[0] if s.dropna().size else None,
-        "cuisine": lambda s: s.dropna().value_counts().index[0] if s.dropna().size else None,
-        "why": lambda s: s.dropna().iloc[0] if s.dropna().size else None,
-        "source_url": lambda s: s.dropna().iloc[0] if s.dropna().size else None,
-        "sentiment": lambda s: s.dropna().value_counts().idxmax() if s.dropna().size else "positive",
-        "created_iso": ["min","max","count"]
-    })
-    agg.columns = ["name","neighborhood","cuisine","why","source_url","sentiment","first_seen","last_seen","mentions"]
+    with metrics.phase("aggregate"):
+        agg = aggregate_clusters(df)
+        agg["log_fwd"] = group_log_fwd(df["cluster_id"], df["created_iso"], args.decay_half_life_days).reindex(agg.index)
+        save_aliases(cluster_aliases(df["name_norm"], df["cluster_id"], agg["name"]))
     agg = agg.reset_index(drop=True)
+    write_scored(agg, args.decay_half_life_days)
 
-    agg["score_buzz"] = agg["mentions"]
-    agg["score_trend"] = time_decay_weight(agg["last_seen"], half_life_days=args.decay_half_life_days)
-    agg["score_total"] = agg["score_buzz"] * (1 + agg["score_trend"])
+def write_scored(agg: pd.DataFrame, decay_half_life_days: int):
+    """Scores as of now from each cluster's mention count and log2 forward-decay sum (see scoring)."""
+    scores = score_columns(agg["mentions"], decayed(agg["log_fwd"], pd.Timestamp.now(tz="UTC"), decay_half_life_days))
+    agg = pd.concat([agg.drop(columns="log_fwd").reset_index(drop=True), scores], axis=1)
 
-    out_csv = os.path.join(DATA_DIR, "mentions_clean.csv")
-    agg.to_csv(out_csv, index=False)
-    print(f"Wrote cleaned dataset -> {out_csv} (rows={len(agg)})")
+    out = write_stage(agg, "mentions_clean")
+    print(f"Wrote cleaned dataset -> {out} (rows={len(agg)})")
 
 if __name__ == "__main__":
     main()
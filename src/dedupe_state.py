@@ -0,0 +1,203 @@
+import datetime as dt, hashlib, json, os
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from . import mentions_log
+from .config import DATA_DIR
+from .fuzzy_blocking import candidate_pairs
+from .geocode_cache import normalize
+from .scoring import fold
+
+# Persisted cluster state for incremental dedupe. It mirrors the greedy loop in
+# dedupe_and_score.cluster_names: each new name is claimed by the first cluster (in creation
+# order) whose base name scores >= threshold, or becomes a new base, and each cluster keeps its
+# per-column value counts and decayed mention count (scoring.fold), so scores update per
+# mention. Names arrive in the order runs extracted them rather than in file order, so the
+# clusters can differ from a full re-run's where a name is close to two bases; --rebuild
+# re-folds the current mentions_raw.jsonl from scratch.
+#
+# New mentions come from the tail of data/mentions_log.jsonl (src/mentions_log.py), read from
+# the saved byte offset, so a run costs what llm_pipeline changed, not the history. A log line
+# is a whole thread as re-extracted: each mention is keyed by thread, normalised name and the
+# occurrence of that pair, and only keys the thread hasn't folded before are added. Per-thread
+# keys are dropped once a thread has gone seen_days without changing (past the scrape's
+# lookback it can't change again). An empty state starts from mentions_raw.jsonl, then the log.
+
+STATE_PATH = os.path.join(DATA_DIR, "dedupe_state.json")
+ALIASES_PATH = os.path.join(DATA_DIR, "name_aliases.json")  # both engines write it; load_warehouse reads it
+MODE_COLS = ["name_norm", "neighborhood", "cuisine", "sentiment"]
+FIRST_COLS = ["why", "source_url"]
+SEEN_DAYS = 90
+
+VERSION = 4
+
+def empty_state(threshold: int, half_life_days: float = 30) -> Dict[str, Any]:
+    return {"version": VERSION, "threshold": threshold, "half_life_days": half_life_days,
+            "log_id": None, "log_offset": 0, "threads": {}, "names": {}, "clusters": []}
+
+def load_state(threshold: int, half_life_days: float = 30, path: str = STATE_PATH) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return empty_state(threshold, half_life_days)
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != VERSION:
+        print("Dedupe state is from an older version; rebuilding.")
+        return empty_state(threshold, half_life_days)
+    if state.get("threshold") != threshold:
+        print(f"Dedupe state was built with min_similarity={state.get('threshold')}; rebuilding.")
+        return empty_state(threshold, half_life_days)
+    if state.get("half_life_days") != half_life_days:
+        print(f"Dedupe state was built with decay_half_life_days={state.get('half_life_days')}; rebuilding.")
+        return empty_state(threshold, half_life_days)
+    if state.get("log_id") is not None and state["log_id"] != mentions_log.header()[0]:
+        print("data/mentions_log.jsonl was replaced since the last run; rebuilding.")
+        return empty_state(threshold, half_life_days)
+    return state
+
+def save_state(state: Dict[str, Any], path: str = STATE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def cluster_aliases(names, cluster_ids, canonical) -> Dict[str, str]:
+    """normalize(raw name) -> normalize(its cluster's name), canonical indexed by cluster id."""
+    out = {}
+    for name, cid in dict(zip(names, cluster_ids)).items():
+        raw, canon = normalize(name), normalize(canonical[cid])
+        if raw and canon:
+            out[raw] = canon
+    return out
+
+def save_aliases(aliases: Dict[str, str], path: str = ALIASES_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(aliases, f)
+    os.replace(tmp, path)
+
+def mention_keys(rows: List[Dict[str, Any]], counts: Optional[Dict[Tuple[str, str], int]] = None) -> List[str]:
+    """Stable key per mention row: thread, normalised name and occurrence of that pair. Pass
+    the same counts dict to key one file a batch at a time."""
+    counts = {} if counts is None else counts
+    keys = []
+    for r in rows:
+        pair = (str(r.get("post_id") or r.get("source_url") or ""), normalize(r.get("name")))
+        n = counts[pair] = counts.get(pair, -1) + 1
+        keys.append(hashlib.sha1(f"{pair[0]}|{pair[1]}|{n}".encode("utf-8")).hexdigest()[:16])
+    return keys
+
+def _thread_id(m: Dict[str, Any]) -> str:
+    return str(m.get("post_id") or m.get("source_url") or "")
+
+def _new_in_thread(state: Dict[str, Any], thread: str, mentions: List[Dict[str, Any]], now: str) -> List[Dict[str, Any]]:
+    """The mentions of one (re-)extracted thread not folded before; records their keys."""
+    keys = mention_keys(mentions)
+    done = state["threads"].get(thread, {}).get("keys", [])
+    seen = set(done)
+    new = [(m, k) for m, k in zip(mentions, keys) if k not in seen]
+    state["threads"][thread] = {"keys": done + [k for _, k in new], "at": now}
+    return [m for m, _ in new]
+
+def read_new_mentions(state: Dict[str, Any], raw_path: str, log_path: str = mentions_log.LOG_PATH,
+                      seen_days: float = SEEN_DAYS) -> List[Dict[str, Any]]:
+    """Mentions not yet folded into state: the log past the saved offset, or all of raw_path for
+    an empty state. Call on a state whose log_id matches the log (see load_state)."""
+    now = dt.datetime.now(dt.timezone.utc).isoformat()
+    log_id, size = mentions_log.header(log_path)
+    new: List[Dict[str, Any]] = []
+    if state["log_id"] is None:
+        by_thread: Dict[str, List[Dict[str, Any]]] = {}
+        if os.path.exists(raw_path):
+            with open(raw_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        m = json.loads(line)
+                        by_thread.setdefault(_thread_id(m), []).append(m)
+        for thread, mentions in by_thread.items():
+            new += _new_in_thread(state, thread, mentions, now)
+        state["log_offset"] = size  # everything logged so far is in raw_path already
+    elif log_id is not None:
+        for rec, offset in mentions_log.read_from(state["log_offset"], log_path):
+            mentions = [dict(m, post_id=m.get("post_id") or rec["post_id"]) for m in rec["mentions"]]
+            new += _new_in_thread(state, _thread_id({"post_id": rec["post_id"]}), mentions, now)
+            state["log_offset"] = offset
+    state["log_id"] = log_id
+    if log_id is not None:  # without a log every run re-reads raw_path and needs all the keys
+        cutoff = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=seen_days)).isoformat()
+        state["threads"] = {t: v for t, v in state["threads"].items() if v["at"] >= cutoff}
+    return new
+
+def _notnull(v) -> bool:
+    return v is not None and not (isinstance(v, float) and np.isnan(v))
+
+def _assign(state: Dict[str, Any], names: List[str], threshold: int) -> List[int]:
+    """Cluster id for each name, creating clusters for names no existing base matches."""
+    clusters, known = state["clusters"], state["names"]
+    todo = list(dict.fromkeys(n for n in names if n not in known))
+    if todo:
+        bases = [c["base"] for c in clusters]
+        # new names first so candidate_pairs only joins them against each other and the bases
+        pool = todo + bases
+        hits: Dict[int, List[Tuple[int, bool]]] = {i: [] for i in range(len(todo))}
+        for left, right in candidate_pairs(pool, threshold, rows=len(todo)):
+            if not len(left):
+                continue
+            sims = process.cpdist([pool[i] for i in left], [pool[j] for j in right],
+                                  scorer=fuzz.token_set_ratio, score_cutoff=threshold, workers=-1)
+            for i, j in zip(left[sims >= threshold].tolist(), right[sims >= threshold].tolist()):
+                if j >= len(todo):
+                    hits[i].append((j - len(todo), True))
+                else:
+                    hits[j].append((i, False))
+        base_of = {}  # todo index -> cluster id, for names that became bases this run
+        for i, name in enumerate(todo):
+            cids = [ref if is_base else base_of[ref] for ref, is_base in hits[i] if is_base or ref in base_of]
+            if cids:
+                known[name] = min(cids)
+            else:
+                known[name] = base_of[i] = len(clusters)
+                clusters.append({"base": name, "mentions": 0, "first_seen": None, "last_seen": None,
+                                 **{c: {} for c in MODE_COLS}, **{c: None for c in FIRST_COLS}})
+    return [known[n] for n in names]
+
+def update_state(state: Dict[str, Any], rows: List[Dict[str, Any]]) -> int:
+    """Fold new mention rows into state; returns how many were usable."""
+    rows = [dict(r, name_norm=r["name"].strip()) for r in rows if isinstance(r.get("name"), str) and r["name"].strip()]
+    cids = _assign(state, [r["name_norm"] for r in rows], state["threshold"])
+    clusters = state["clusters"]
+    for r, cid in zip(rows, cids):
+        c = clusters[cid]
+        for col in MODE_COLS:
+            v = r.get(col)
+            if _notnull(v):
+                c[col][v] = c[col].get(v, 0) + 1
+        for col in FIRST_COLS:
+            if c[col] is None and _notnull(r.get(col)):
+                c[col] = r[col]
+        ts = r.get("created_iso")
+        if _notnull(ts):
+            c["mentions"] += 1
+            c["first_seen"] = ts if c["first_seen"] is None else min(c["first_seen"], ts)
+            c["last_seen"] = ts if c["last_seen"] is None else max(c["last_seen"], ts)
+            fold(c, ts, state["half_life_days"])
+    return len(rows)
+
+def _mode(counts: Dict[str, int], default=None):
+    # ties go to the value seen first, matching pandas value_counts
+    return max(counts, key=counts.get) if counts else default
+
+def state_frame(state: Dict[str, Any]) -> pd.DataFrame:
+    """Per-cluster aggregates with the same columns as the full dedupe_and_score groupby."""
+    return pd.DataFrame([{
+        "name": _mode(c["name_norm"]),
+        "neighborhood": _mode(c["neighborhood"]),
+        "cuisine": _mode(c["cuisine"]),
+        "why": c["why"],
+        "source_url": c["source_url"],
+        "sentiment": _mode(c["sentiment"], "positive"),
+        "first_seen": c["first_seen"],
+        "last_seen": c["last_seen"],
+        "mentions": c["mentions"],
+        "log_fwd": c.get("log_fwd"),
+    } for c in state["clusters"]], columns=["name","neighborhood","cuisine","why","source_url","sentiment","first_seen","last_seen","mentions","log_fwd"])
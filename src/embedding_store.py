@@ -0,0 +1,176 @@
+import argparse, asyncio, fcntl, hashlib, json, os, time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+import numpy as np, pandas as pd
+from openai import AsyncOpenAI
+from . import metrics
+from .config import DATA_DIR, OPENAI_API_KEY
+from .llm_async import aretry, async_http_client, gather_bounded
+
+# On-disk embedding cache shared by cluster_topics and embeddings_and_qna. Each model gets its
+# own directory holding three parallel append-only files:
+#   keys.bin     20-byte sha1 of the embedded text, one per row
+#   vectors.f32  raw float32 rows of meta.json["dim"]
+#   used.f64     unix time each row was last looked up (what compaction ages out on)
+# Vectors are written before their keys, so a torn append leaves only unreachable bytes that
+# the next compaction drops. Writers and compaction serialise on an flock.
+
+STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(DATA_DIR, "embeddings"))
+DEFAULT_MODEL = "text-embedding-3-small"
+KEY_BYTES = 20
+
+def mention_texts(df: pd.DataFrame) -> List[str]:
+    """The one string per mention that both stages embed, so they hit the same store rows."""
+    cols = ["name", "neighborhood", "cuisine", "why", "signature_dishes"]
+    return [" | ".join(r) for r in zip(*(df[c].astype(object).fillna("").astype(str) if c in df else [""] * len(df) for c in cols))]
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+class EmbeddingStore:
+    """Embeddings for one model. embed(texts) returns a (len(texts), dim) float32 array, reusing
+    stored vectors and fetching only the missing texts, in concurrent batches."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, root: str = STORE_DIR):
+        self.model = model
+        self.dir = os.path.join(root, model.replace("/", "_"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.reused = self.fetched = 0
+        self.dim: Optional[int] = None
+        self.index: Dict[bytes, int] = {}
+        self.rows = 0
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._path("lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        meta = self._path("meta.json")
+        if os.path.exists(meta):
+            with open(meta, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self.index, self.rows = {}, 0
+        if self.dim is None or not os.path.exists(self._path("keys.bin")):
+            return
+        keys = np.fromfile(self._path("keys.bin"), dtype=np.uint8)
+        n = min(len(keys) // KEY_BYTES, os.path.getsize(self._path("vectors.f32")) // (4 * self.dim))
+        keys = keys[:n * KEY_BYTES].reshape(n, KEY_BYTES)
+        self.rows = n
+        # later rows win, so a duplicate written by a concurrent run resolves to the newest copy
+        self.index = {k.tobytes(): i for i, k in enumerate(keys)}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def vectors(self) -> np.ndarray:
+        if not self.index:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.memmap(self._path("vectors.f32"), dtype="float32", mode="r", shape=(self.rows, self.dim))
+
+    def _touch(self, rows: Sequence[int]):
+        if not len(rows):
+            return
+        used = np.memmap(self._path("used.f64"), dtype="float64", mode="r+")
+        used[np.asarray(rows)] = time.time()
+        used.flush()
+
+    def _append(self, keys: List[bytes], vecs: np.ndarray):
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vecs.shape[1])
+                with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            self._load()  # pick up rows another process appended since we loaded
+            base = self.rows
+            # truncate any torn tail so row numbers line up across the three files
+            for name, width in (("vectors.f32", 4 * self.dim), ("used.f64", 8), ("keys.bin", KEY_BYTES)):
+                with open(self._path(name), "ab") as f:
+                    f.truncate(base * width)
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(np.ascontiguousarray(vecs, dtype="float32").tobytes())
+            with open(self._path("used.f64"), "ab") as f:
+                f.write(np.full(len(keys), time.time(), dtype="float64").tobytes())
+            with open(self._path("keys.bin"), "ab") as f:
+                f.write(b"".join(keys))
+            self.index.update({k: base + i for i, k in enumerate(keys)})
+            self.rows = base + len(keys)
+
+    async def _fetch(self, texts: List[str], batch_size: int, concurrency: int, max_retries: int) -> np.ndarray:
+        async with async_http_client(concurrency) as http:
+            client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0, http_client=http)
+
+            async def batch(chunk):
+                resp = await aretry(lambda: client.embeddings.create(model=self.model, input=chunk), max_retries=max_retries,
+                                    service="openai.embeddings")
+                metrics.tokens(self.model, prompt=getattr(resp.usage, "prompt_tokens", 0))
+                return [e.embedding for e in resp.data]
+
+            chunks = [texts[i:i+batch_size] for i in range(0, len(texts), batch_size)]
+            got = await gather_bounded([lambda c=c: batch(c) for c in chunks], concurrency, desc="Embedding")
+        for g in got:
+            if isinstance(g, Exception):
+                raise g
+        return np.array([e for g in got for e in g], dtype="float32")
+
+    def embed(self, texts: Sequence[str], batch_size: int = 100, concurrency: int = 4, max_retries: int = 5) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+        missing: Dict[bytes, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in self.index and k not in missing:
+                missing[k] = t
+        if missing:
+            vecs = asyncio.run(self._fetch(list(missing.values()), batch_size, concurrency, max_retries))
+            self._append(list(missing.keys()), vecs)
+        self.fetched += len(missing)
+        self.reused += len(set(keys)) - len(missing)
+        metrics.cache("embeddings", len(set(keys)) - len(missing), len(missing))
+        rows = np.fromiter((self.index[k] for k in keys), dtype=np.int64, count=len(keys))
+        self._touch(np.unique(rows))
+        return np.array(self.vectors()[rows]) if len(rows) else np.zeros((0, self.dim or 0), dtype="float32")
+
+    def compact(self, max_age_days: Optional[float] = None) -> int:
+        """Rewrite the files keeping one row per key, dropping rows not looked up within
+        max_age_days (if given) and any torn tail. Returns the number of rows removed."""
+        with self._locked():
+            self._load()
+            if not self.index:
+                return 0
+            before = self.rows
+            rows = np.array(sorted(self.index.values()), dtype=np.int64)
+            used = np.fromfile(self._path("used.f64"), dtype="float64")
+            if max_age_days:
+                rows = rows[used[rows] >= time.time() - max_age_days * 86400]
+            keys = np.fromfile(self._path("keys.bin"), dtype=np.uint8)[:before * KEY_BYTES].reshape(before, KEY_BYTES)
+            for name, data in (("vectors.f32", np.array(self.vectors()[rows])), ("used.f64", used[rows]), ("keys.bin", keys[rows])):
+                tmp = self._path(name + ".tmp")
+                data.tofile(tmp)
+                os.replace(tmp, self._path(name))
+            self._load()
+            return before - len(rows)
+
+    def summary(self) -> str:
+        return f"Embedding store ({self.model}): {self.reused} reused, {self.fetched} fetched, {len(self)} stored"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    ap.add_argument("--compact", action="store_true", help="rewrite the store without duplicates / stale rows")
+    ap.add_argument("--max_age_days", type=float, default=None, help="with --compact, drop rows unused for this long")
+    args = ap.parse_args()
+    store = EmbeddingStore(args.model)
+    if args.compact:
+        removed = store.compact(args.max_age_days)
+        print(f"Compacted: removed {removed} rows, {len(store)} left")
+    print(store.summary())
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,149 @@
-import os, json, argparse, numpy as np, pandas as pd
+import os, json, argparse, threading, numpy as np, pandas as pd
+from collections import OrderedDict
+from typing import List, Optional
 from openai import OpenAI
+from . import metrics
 from .config import DATA_DIR, OPENAI_API_KEY
+from .ann import IVFIndex, top_k as top_k_ids
+from .embedding_store import DEFAULT_MODEL, EmbeddingStore, mention_texts
+from .storage import read_stage
 
-INDEX_PATH = os.path.join(DATA_DIR, "qna_index.npz")
-
-def build_index():
-    path = os.path.join(DATA_DIR,"mentions_enhanced.csv")
-    if not os.path.exists(path): path = os.path.join(DATA_DIR,"mentions_clean.csv")
-    df = pd.read_csv(path)
-    texts = (df["name"].fillna("") + " | " + df["neighborhood"].fillna("") + " | " + df["cuisine"].fillna("") + " | " + df["why"].fillna("") + " | " + df.get("signature_dishes","").fillna("")).tolist()
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embs = []
-    for i in range(0, len(texts), 100):
-        chunk = texts[i:i+100]
-        resp = client.embeddings.create(model="text-embedding-3-small", input=chunk)
-        embs.extend([e.embedding for e in resp.data])
-    embs = np.array(embs).astype("float32")
-    np.savez(INDEX_PATH, vectors=embs, ids=np.arange(len(texts)))
-    df.to_csv(os.path.join(DATA_DIR,"qna_index_rows.csv"), index=False)
-    print(f"Index built with {len(texts)} items.")
+INDEX_PATH = os.path.join(DATA_DIR, "qna_index.npy")
+ROWS_PATH = os.path.join(DATA_DIR, "qna_index_rows.parquet")
+IVF_PATH = os.path.join(DATA_DIR, "qna_index_ivf.npz")
+BACKENDS = ("auto", "exact", "ivf")
+
+def _normalize(V: np.ndarray) -> np.ndarray:
+    return (V / (np.linalg.norm(V, axis=-1, keepdims=True) + 1e-9)).astype("float32")
+
+def build_index(ann: str = "exact", nlist: Optional[int] = None):
+    df = read_stage(["mentions_enhanced", "mentions_clean"])
+    texts = mention_texts(df)
+    store = EmbeddingStore()
+    with metrics.phase("embed"):
+        embs = store.embed(texts)
+    print(store.summary())
+    # rows first, vectors last: a Searcher only reloads once both agree on the row count
+    df.to_parquet(ROWS_PATH + ".tmp", index=False)
+    os.replace(ROWS_PATH + ".tmp", ROWS_PATH)
+    with open(INDEX_PATH + ".tmp", "wb") as f:
+        np.save(f, _normalize(embs))
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    if ann == "ivf":
+        with metrics.phase("ivf"):
+            ivf = IVFIndex.build(np.load(INDEX_PATH, mmap_mode="r"), nlist)
+        ivf.save(IVF_PATH + ".tmp")
+        os.replace(IVF_PATH + ".tmp", IVF_PATH)
+    elif os.path.exists(IVF_PATH):
+        os.remove(IVF_PATH)  # stale lists would point at the old rows
+    print(f"Index built with {len(texts)} items" + (f", {len(ivf.centroids)} IVF lists." if ann == "ivf" else "."))
+
+class Searcher:
+    """Loads the index once and answers queries against it.
+
+    Vectors are stored unit-normalised by build_index and memory-mapped, so a query costs one
+    mat-vec plus an argpartition. Query embeddings are kept in an LRU, and the index files are
+    re-stat'ed on each call so a rebuild is picked up without restarting the app.
+
+    backend "ivf" scans only the nprobe nearest IVF lists built by --build --ann ivf; "auto"
+    uses them when present and falls back to exact search otherwise."""
+
+    def __init__(self, index_path: str = INDEX_PATH, rows_path: str = ROWS_PATH, model: str = DEFAULT_MODEL,
+                 cache_size: int = 1024, client: Optional[OpenAI] = None, backend: str = "auto",
+                 ivf_path: str = IVF_PATH, nprobe: int = 8):
+        self.index_path, self.rows_path, self.model = index_path, rows_path, model
+        self.backend, self.ivf_path, self.nprobe = backend, ivf_path, nprobe
+        self.ivf: Optional[IVFIndex] = None
+        self.cache_size = cache_size
+        self.client = client
+        self.queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.V: Optional[np.ndarray] = None
+        self.rows: Optional[pd.DataFrame] = None
+        self.stamp = None
+        self._lock = threading.Lock()
+
+    def _stamp(self):
+        paths = [self.index_path, self.rows_path] + ([self.ivf_path] if self.backend != "exact" and os.path.exists(self.ivf_path) else [])
+        return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, paths))
+
+    def refresh(self) -> bool:
+        """Reload if the index files changed since the last load. Returns True if reloaded."""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return False
+        with self._lock:
+            if stamp == self.stamp:
+                return False
+            V = np.load(self.index_path, mmap_mode="r")
+            rows = pd.read_parquet(self.rows_path)
+            if len(rows) != len(V):
+                if self.V is None:
+                    raise RuntimeError(f"{self.index_path} and {self.rows_path} disagree; rebuild with --build")
+                return False  # caught mid-rebuild; keep serving the old index
+            ivf = IVFIndex.load(self.ivf_path) if len(stamp) == 3 else None
+            if ivf is not None and ivf.size != len(V):
+                ivf = None
+            if ivf is None and self.backend == "ivf":
+                raise RuntimeError(f"no IVF index matching {self.index_path}; rebuild with --build --ann ivf")
+            self.V, self.rows, self.ivf, self.stamp = V, rows, ivf, stamp
+            return True
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalised query vectors, embedding only the ones not already in the LRU (in one request)."""
+        missing = list(dict.fromkeys(q for q in queries if q not in self.queries))
+        if missing:
+            self.client = self.client or OpenAI(api_key=OPENAI_API_KEY)
+            with metrics.timed("openai.embeddings"):
+                resp = self.client.embeddings.create(model=self.model, input=missing)
+            for q, e in zip(missing, resp.data):
+                self.queries[q] = _normalize(np.asarray(e.embedding, dtype="float32"))
+        out = np.stack([self.queries[q] for q in queries])
+        for q in queries:
+            self.queries.move_to_end(q)
+        while len(self.queries) > self.cache_size:
+            self.queries.popitem(last=False)
+        return out
+
+    def search_many(self, queries: List[str], top_k: int = 10) -> List[pd.DataFrame]:
+        self.refresh()
+        Q = self.embed_queries(queries)
+        if self.ivf is not None:
+            ids, sims = self.ivf.search(self.V, Q, top_k, self.nprobe)
+        else:
+            S = Q @ self.V.T
+            ids = [top_k_ids(s, top_k) for s in S]
+            sims = [s[i] for s, i in zip(S, ids)]
+        return [self.rows.iloc[i].assign(similarity=s) for i, s in zip(ids, sims)]
+
+    def search(self, query: str, top_k: int = 10) -> pd.DataFrame:
+        return self.search_many([query], top_k)[0]
+
+_searcher: Optional[Searcher] = None
+
+def get_searcher() -> Searcher:
+    global _searcher
+    if _searcher is None:
+        _searcher = Searcher()
+    return _searcher
 
 def search(query: str, top_k=10):
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    q = client.embeddings.create(model="text-embedding-3-small", input=[query]).data[0].embedding
-    data = np.load(INDEX_PATH)
-    V = data["vectors"]; ids = data["ids"]
-    import numpy as np, pandas as pd
-    vq = np.array(q, dtype="float32")
-    Vn = V / (np.linalg.norm(V, axis=1, keepdims=True) + 1e-9)
-    vqn = vq / (np.linalg.norm(vq) + 1e-9)
-    sims = (Vn @ vqn)
-    top = sims.argsort()[-top_k:][::-1]
-    rows = pd.read_csv(os.path.join(DATA_DIR,"qna_index_rows.csv")).iloc[ids[top]]
-    rows = rows.assign(similarity=sims[top])
-    return rows
+    return get_searcher().search(query, top_k)
 
+@metrics.instrument("embeddings_and_qna")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--build", action="store_true")
     ap.add_argument("--ask", type=str, default=None)
     ap.add_argument("--top_k", type=int, default=5)
+    ap.add_argument("--ann", choices=BACKENDS, default="auto",
+                    help="--build: ivf also builds IVF lists; --ask: search backend (auto = ivf if built)")
+    ap.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~sqrt(rows))")
+    ap.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
     args = ap.parse_args()
-    if args.build: build_index()
-    if args.ask: print(search(args.ask, args.top_k).to_string(index=False))
+    if args.build: build_index("ivf" if args.ann == "ivf" else "exact", args.nlist)
+    if args.ask:
+        s = Searcher(backend=args.ann, nprobe=args.nprobe)
+        print(s.search(args.ask, args.top_k).to_string(index=False))
 
 if __name__ == "__main__":
     main()
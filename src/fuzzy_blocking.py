@@ -0,0 +1,148 @@
+import math
+from collections import Counter
+from typing import List, Dict, Optional
+import numpy as np
+from scipy import sparse
+from rapidfuzz import fuzz, process
+
+# Blocked replacement for dedupe_and_score.cluster_names. It produces the same clusters as the
+# greedy loop, but only scores pairs that can possibly reach the threshold.
+#
+# Why blocking is exact: token_set_ratio is the max of two kinds of comparison.
+# 1. Ratio of two space-joined arrangements of each name's token set. Pad every token with spaces
+#    (" pho ") and take its character bigrams; any arrangement's bigrams are a sub-multiset of
+#    these. Two strings with Indel ratio >= t share at least (3t-2)/(2-t) * len - 1 bigrams for
+#    either string's length (a common subsequence of length M splits into at most U+1 contiguous
+#    runs, U = unmatched chars). If two names share >= o grams, their rarest |grams| - o + k grams
+#    share >= k of them, so a prefix join that demands k common grams never loses a pair. Names
+#    too short for this bound to be positive are scored against everyone.
+# 2. Ratio of the shared tokens against one whole name. That needs the shared tokens to cover at
+#    least t/(2-t) of that name, so it must share one of its rarest tokens with the other name.
+
+def _canonical(name: str) -> List[str]:
+    return sorted(set(name.split()))
+
+def _padded_bigrams(tokens: List[str]) -> List[str]:
+    grams = []
+    for t in tokens:
+        p = f" {t} "
+        grams.extend(p[i:i+2] for i in range(len(p) - 1))
+    # tag repeats so the set overlap below equals the multiset overlap
+    seen = Counter()
+    tagged = []
+    for g in grams:
+        tagged.append(f"{g}\x00{seen[g]}")
+        seen[g] += 1
+    return tagged
+
+def _min_overlap(length: int, threshold: float) -> int:
+    t = threshold / 100 - 1e-9
+    if t <= 2 / 3:
+        return 0
+    return math.ceil(length * (3 * t - 2) / (2 - t) - 1)
+
+def _min_shared_len(length: int, threshold: float) -> float:
+    t = threshold / 100 - 1e-9
+    return t * length / (2 - t)
+
+def _joined_len(tokens: List[str]) -> int:
+    return sum(map(len, tokens)) + max(len(tokens) - 1, 0)
+
+def _csr(rows, cols, shape):
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=shape)
+
+def candidate_pairs(names: List[str], threshold: float = 88, block: int = 4096, k: int = 4, rows: Optional[int] = None):
+    """Yield (left, right) index arrays, left < right, covering every pair that may score >= threshold.
+
+    Pairs are produced block by block of left rows so memory stays bounded for large inputs.
+    With rows set, only pairs whose left index is < rows are produced (new names listed first)."""
+    n = len(names)
+    toks = [_canonical(x) for x in names]
+    grams = [_padded_bigrams(t) for t in toks]
+    gfreq = Counter(g for gs in grams for g in gs)
+    tfreq = Counter(t for ts in toks for t in ts)
+    gvocab = {g: i for i, g in enumerate(gfreq)}
+    tvocab = {t: i for i, t in enumerate(tfreq)}
+
+    lengths = np.array([_joined_len(ts) for ts in toks])
+    need_k = np.zeros(n, dtype=np.int32)
+    grow, gcol, trow, tcol, prow, pcol = [], [], [], [], [], []
+    short = np.zeros(n, dtype=bool)
+    for i, (ts, gs) in enumerate(zip(toks, grams)):
+        # case 1: bigram prefix, both sides
+        o = _min_overlap(lengths[i], threshold)
+        if o < 1:
+            short[i] = True
+        else:
+            need_k[i] = min(k, o)
+            prefix = sorted(gs, key=lambda g: (gfreq[g], g))[:max(len(gs) - o + need_k[i], 0)]
+            grow.extend([i] * len(prefix)); gcol.extend(gvocab[g] for g in prefix)
+        # case 2: rarest tokens of this name against every token of the other
+        trow.extend([i] * len(ts)); tcol.extend(tvocab[t] for t in ts)
+        need = _min_shared_len(lengths[i], threshold)
+        rest = sorted(ts, key=lambda t: (tfreq[t], t))
+        while rest and _joined_len(rest) >= need:
+            t = rest.pop(0)
+            prow.append(i); pcol.append(tvocab[t])
+
+    gpref = _csr(grow, gcol, (n, len(gvocab)))
+    tpref = _csr(prow, pcol, (n, len(tvocab)))
+    tfull = _csr(trow, tcol, (n, len(tvocab)))
+    ratio = _min_shared_len(1, threshold)  # case 1 also implies min(len) >= t/(2-t) * max(len)
+    short_idx = np.flatnonzero(short)
+
+    stop = n if rows is None else min(rows, n)
+    for lo in range(0, stop, block):
+        hi = min(lo + block, stop)
+        # multiply the block only against rows lo: since we keep j > i anyway
+        g = (gpref[lo:hi] @ gpref[lo:].T).tocoo()
+        i, j = g.row + lo, g.col + lo
+        keep = (j > i) & (g.data >= np.minimum(need_k[i], need_k[j]))
+        i, j = i[keep], j[keep]
+        la, lb = lengths[i], lengths[j]
+        keep = np.minimum(la, lb) >= ratio * np.maximum(la, lb)
+        t = (tpref[lo:hi] @ tfull[lo:].T + tfull[lo:hi] @ tpref[lo:].T).tocoo()
+        up = t.col > t.row
+        left = [i[keep], t.row[up] + lo]; right = [j[keep], t.col[up] + lo]
+        # names too short for the bigram bound pair with everything after them
+        if len(short_idx):
+            ids = np.arange(lo, hi)
+            r, c = np.nonzero(short_idx[None, :] > ids[:, None])
+            left.append(ids[r]); right.append(short_idx[c])
+            for i in short_idx[(short_idx >= lo) & (short_idx < hi)]:
+                left.append(np.full(n - i - 1, i)); right.append(np.arange(i + 1, n))
+        left, right = np.concatenate(left) - lo, np.concatenate(right)
+        pairs = _csr(left, right, (hi - lo, n))  # sums duplicates, rows come out sorted
+        yield np.repeat(np.arange(lo, hi), np.diff(pairs.indptr)), pairs.indices
+
+def cluster_names_blocked(names: List[str], threshold: int = 88, workers: int = -1) -> Dict[int, List[int]]:
+    # identical names always land in the same greedy cluster, so work on first occurrences
+    first, inverse = {}, []
+    for name in names:
+        inverse.append(first.setdefault(name, len(first)))
+    uniq = list(first)
+    members = [[] for _ in uniq]
+    for i, u in enumerate(inverse):
+        members[u].append(i)
+
+    hits_l, hits_r = [], []
+    for left, right in candidate_pairs(uniq, threshold):
+        if not len(left):
+            continue
+        sims = process.cpdist([uniq[i] for i in left], [uniq[j] for j in right],
+                              scorer=fuzz.token_set_ratio, score_cutoff=threshold, workers=workers)
+        hit = sims >= threshold
+        hits_l.append(left[hit]); hits_r.append(right[hit])
+    left = np.concatenate(hits_l) if hits_l else np.empty(0, dtype=np.int64)
+    right = np.concatenate(hits_r) if hits_r else np.empty(0, dtype=np.int64)
+    starts = np.searchsorted(left, np.arange(len(uniq) + 1))
+
+    clusters = {}
+    used = np.zeros(len(uniq), dtype=bool)
+    for u in range(len(uniq)):
+        if used[u]:
+            continue
+        group = [u] + [v for v in right[starts[u]:starts[u + 1]] if not used[v]]
+        used[group] = True
+        clusters[len(clusters)] = sorted(i for g in group for i in members[g])
+    return clusters
@@ -1,62 +1,117 @@
 import argparse, os, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tqdm import tqdm
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
+from . import metrics
 from .config import DATA_DIR, OUT_DIR, GEOCODER, GOOGLE_MAPS_API_KEY
+from .geocode_cache import GeocodeCache, geo_key
+from .map_render import CELL_DEG, MAX_MARKERS, MODES, build_map
+from .storage import read_stage, write_stage
 
-def geocode_free(df):
+GOOGLE_GEOCODE_URL = os.getenv("GOOGLE_GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+TRANSIENT = object()  # provider error worth retrying next run; never cached
+
+def geocode_free(queries: List[str]) -> List[Any]:
+    """Nominatim at its 1 request/second policy limit, one query at a time."""
     geolocator = Nominatim(user_agent="la-food-scenes-map")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    lats, lngs = [], []
-    for name, hood in zip(df["name"], df["neighborhood"].fillna("")):
-        query = f"{name}, {hood}, Los Angeles, CA"
+
+    def lookup(query):
+        with metrics.timed("nominatim"):
+            return geolocator.geocode(query)
+
+    geocode = RateLimiter(lookup, min_delay_seconds=1, swallow_exceptions=False)
+    out = []
+    for query in tqdm(queries, desc="Geocoding (nominatim)"):
         try:
             loc = geocode(query)
-            if loc:
-                lats.append(loc.latitude); lngs.append(loc.longitude)
-            else:
-                lats.append(None); lngs.append(None)
+            out.append((loc.latitude, loc.longitude) if loc else None)
         except Exception:
-            lats.append(None); lngs.append(None)
-    df["lat"] = lats; df["lng"] = lngs
+            out.append(TRANSIENT)
+    return out
+
+def geocode_google(queries: List[str], concurrency: int = 8) -> List[Any]:
+    """Google Geocoding over one pooled session, `concurrency` requests in flight."""
+    key = GOOGLE_MAPS_API_KEY
+    if not key:
+        raise RuntimeError("GOOGLE_MAPS_API_KEY is missing for provider=google")
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry))
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry))
+
+    def one(query):
+        t = time.perf_counter()
+        try:
+            resp = session.get(GOOGLE_GEOCODE_URL, params={"address": query, "key": key}, timeout=20).json()
+        except Exception as e:
+            metrics.call("google.geocode", time.perf_counter() - t, type(e).__name__)
+            return TRANSIENT
+        status = resp.get("status")
+        metrics.call("google.geocode", time.perf_counter() - t, None if status in ("OK", "ZERO_RESULTS") else status)
+        if resp.get("status") == "ZERO_RESULTS" or (resp.get("status") == "OK" and not resp.get("results")):
+            return None
+        if resp.get("results"):
+            loc = resp["results"][0]["geometry"]["location"]
+            return (loc["lat"], loc["lng"])
+        return TRANSIENT  # OVER_QUERY_LIMIT, REQUEST_DENIED, UNKNOWN_ERROR
+
+    with session, ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        return list(tqdm(pool.map(one, queries), total=len(queries), desc="Geocoding (google)"))
+
+PROVIDERS = {"nominatim": lambda queries, concurrency: geocode_free(queries),
+             "google": geocode_google}
+
+def geocode_table(df: pd.DataFrame, provider: str, cache: GeocodeCache, concurrency: int = 8) -> pd.DataFrame:
+    """Add lat/lng, asking the provider only once per normalised (name, neighborhood) not in the cache."""
+    hoods = df["neighborhood"].astype(object).fillna("") if "neighborhood" in df else pd.Series([""] * len(df), index=df.index)
+    keys = [geo_key(n, h) for n, h in zip(df["name"], hoods)]
+    queries = {}
+    for k, name, hood in zip(keys, df["name"], hoods):
+        queries.setdefault(k, f"{name}, {hood}, Los Angeles, CA" if hood else f"{name}, Los Angeles, CA")
+    found = cache.get_many(queries)
+    todo = [k for k in queries if k not in found]
+    fresh = dict(zip(todo, PROVIDERS[provider]([queries[k] for k in todo], concurrency))) if todo else {}
+    cache.put_many({k: v for k, v in fresh.items() if v is not TRANSIENT}, provider)
+    found.update({k: v for k, v in fresh.items() if v is not TRANSIENT})
+    print(f"{len(df)} rows, {len(queries)} distinct places, {len(todo)} sent to {provider} "
+          f"({sum(v is TRANSIENT for v in fresh.values())} failed)")
+    df = df.copy()
+    df["lat"] = [found[k][0] if found.get(k) else None for k in keys]
+    df["lng"] = [found[k][1] if found.get(k) else None for k in keys]
     return df
 
+@metrics.instrument("geocode_and_map")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--provider", choices=["nominatim","google"], default="nominatim")
+    ap.add_argument("--concurrency", type=int, default=8, help="google: requests in flight")
+    ap.add_argument("--negative_ttl_days", type=float, default=14, help="re-query places not found after this long")
+    ap.add_argument("--refresh_cache", action="store_true", help="re-geocode every place")
+    ap.add_argument("--map_mode", choices=MODES, default="auto", help="auto: clustered markers, heat cells past --max_markers")
+    ap.add_argument("--max_markers", type=int, default=MAX_MARKERS)
+    ap.add_argument("--cell_deg", type=float, default=CELL_DEG, help="heat cell size in degrees of latitude")
     args = ap.parse_args()
 
-    csv_path = os.path.join(DATA_DIR, "mentions_clean.csv")
-    df = pd.read_csv(csv_path)
-
-    if args.provider == "nominatim":
-        df = geocode_free(df)
-    else:
-        import requests
-        key = GOOGLE_MAPS_API_KEY
-        if not key:
-            raise RuntimeError("GOOGLE_MAPS_API_KEY is missing for provider=google")
-        lats, lngs = [], []
-        for name, hood in zip(df["name"], df["neighborhood"].fillna("")):
-            query = f"{name}, {hood}, Los Angeles, CA"
-            url = f"https://maps.googleapis.com/maps/api/geocode/json?address={requests.utils.quote(query)}&key={key}"
-            resp = requests.get(url).json()
-            if resp.get("results"):
-                loc = resp["results"][0]["geometry"]["location"]
-                lats.append(loc["lat"]); lngs.append(loc["lng"])
-            else:
-                lats.append(None); lngs.append(None)
-        df["lat"] = lats; df["lng"] = lngs
-
-    import folium
-    m = folium.Map(location=[34.0522, -118.2437], zoom_start=10)
-    for _, r in df.iterrows():
-        if pd.notna(r.get("lat")) and pd.notna(r.get("lng")):
-            popup = f"<b>{r['name']}</b><br>{r.get('cuisine','') or ''} — {r.get('neighborhood','') or ''}<br>Buzz: {int(r['score_buzz'])} • Trend: {round(r['score_trend'],2)}"
-            folium.Marker([r["lat"], r["lng"]], popup=popup).add_to(m)
-    out_html = os.path.join(OUT_DIR, "la_food_map.html")
-    m.save(out_html)
-    df.to_csv(os.path.join(DATA_DIR, "mentions_geocoded.csv"), index=False)
+    df = read_stage("mentions_clean")
+    cache = GeocodeCache(negative_ttl_days=args.negative_ttl_days, refresh=args.refresh_cache)
+    try:
+        with metrics.phase("geocode"):
+            df = geocode_table(df, args.provider, cache, args.concurrency)
+    finally:
+        print(cache.summary())
+        cache.close()
+
+    with metrics.phase("map"):
+        m = build_map(df, args.map_mode, args.cell_deg, args.max_markers)
+        out_html = os.path.join(OUT_DIR, "la_food_map.html")
+        m.save(out_html)
+    write_stage(df, "mentions_geocoded")
     print(f"Saved map -> {out_html}")
 
 if __name__ == "__main__":
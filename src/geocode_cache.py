@@ -0,0 +1,65 @@
+import os, re, sqlite3, time, unicodedata
+from typing import Dict, Iterable, Optional, Tuple
+from . import metrics
+from .config import DATA_DIR
+
+# Persistent geocode results keyed by normalised (name, neighborhood), shared by both
+# providers. Misses ("no such place") are stored too, with lat/lng NULL, and expire after
+# negative_ttl_days so a newly opened restaurant is eventually found. Transient failures
+# (timeouts, quota errors) are never stored.
+
+CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", os.path.join(DATA_DIR, "geocode_cache.sqlite"))
+LatLng = Optional[Tuple[float, float]]
+
+def normalize(text) -> str:
+    if text is None or (isinstance(text, float) and text != text):
+        return ""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+def geo_key(name, neighborhood) -> str:
+    return f"{normalize(name)}|{normalize(neighborhood)}"
+
+class GeocodeCache:
+    def __init__(self, path: str = CACHE_PATH, negative_ttl_days: float = 14, refresh: bool = False):
+        self.negative_ttl_days, self.refresh = negative_ttl_days, refresh
+        self.hits = self.misses = self.writes = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS geocodes (
+            key TEXT PRIMARY KEY, lat REAL, lng REAL, provider TEXT, created REAL NOT NULL)""")
+        self.db.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, LatLng]:
+        """Cached result per key: (lat, lng), or None for an unexpired negative. Absent keys are misses."""
+        keys = list(keys)
+        out: Dict[str, LatLng] = {}
+        if not self.refresh:
+            cutoff = time.time() - self.negative_ttl_days * 86400
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i+500]
+                q = f"SELECT key, lat, lng, created FROM geocodes WHERE key IN ({','.join('?' * len(chunk))})"
+                for key, lat, lng, created in self.db.execute(q, chunk):
+                    if lat is not None:
+                        out[key] = (lat, lng)
+                    elif created >= cutoff:
+                        out[key] = None
+        self.hits += len(out)
+        self.misses += len(keys) - len(out)
+        metrics.cache("geocode", len(out), len(keys) - len(out))
+        return out
+
+    def put_many(self, results: Dict[str, LatLng], provider: str):
+        now = time.time()
+        self.db.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                            [(k, *(v if v else (None, None)), provider, now) for k, v in results.items()])
+        self.db.commit()
+        self.writes += len(results)
+
+    def summary(self) -> str:
+        looked = self.hits + self.misses
+        rate = f"{100 * self.hits / looked:.1f}%" if looked else "n/a"
+        return f"Geocode cache: {self.hits} hits, {self.misses} misses ({rate} hit rate), {self.writes} writes"
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,128 @@
+import asyncio, random, sys, time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+import httpx
+import openai
+from tqdm import tqdm
+from . import metrics
+
+# Shared plumbing for the LLM stages: bounded concurrency, a requests/tokens-per-minute limiter
+# and retry with backoff on 429/5xx, so stages don't each hand-roll a sequential invoke loop.
+# Every attempt is recorded as a call to `service` in the current metrics run.
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # BPE files are fetched on first use; fall back to a length estimate when offline
+        return None
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    enc = _encoding(model)
+    return len(enc.encode(text, disallowed_special=())) if enc else max(len(text) // 4, 1)
+
+class RateLimiter:
+    """Token buckets for requests/min and tokens/min shared by all concurrent calls.
+
+    Each bucket holds up to a tenth of a minute's budget, so bursts stay well inside the
+    provider's per-minute window. A request bigger than the bucket waits for a full bucket."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.rates = [r / 60 for r in (rpm, tpm) if r]
+        self.kinds = [k for k, r in (("req", rpm), ("tok", tpm)) if r]
+        self.caps = [max(r * 6, 1.0) for r in self.rates]
+        self.levels = list(self.caps)
+        self.stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 0):
+        if not self.rates:
+            return
+        need = [1.0 if k == "req" else float(tokens) for k in self.kinds]
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.levels = [min(c, l + r * (now - self.stamp)) for c, l, r in zip(self.caps, self.levels, self.rates)]
+                self.stamp = now
+                want = [min(n, c) for n, c in zip(need, self.caps)]
+                if all(l >= w for l, w in zip(self.levels, want)):
+                    self.levels = [l - w for l, w in zip(self.levels, want)]
+                    return
+                await asyncio.sleep(max((w - l) / r for l, w, r in zip(self.levels, want, self.rates) if l < w))
+
+def async_http_client(concurrency: int, timeout: float = 60) -> httpx.AsyncClient:
+    """Per-run client for ChatOpenAI(http_async_client=...). langchain-openai otherwise shares one
+    cached client across event loops, which breaks the second asyncio.run in a process."""
+    return httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=max(concurrency, 10), max_keepalive_connections=max(concurrency, 10)))
+
+def retry_delay(err: Exception, attempt: int, base_delay: float = 1.0) -> Optional[float]:
+    """Seconds to wait before retrying err, or None if it is not worth retrying."""
+    if isinstance(err, openai.APIStatusError):
+        if err.status_code not in RETRYABLE_STATUS:
+            return None
+        after = err.response.headers.get("retry-after") if err.response is not None else None
+        try:
+            if after is not None:
+                return float(after)
+        except ValueError:
+            pass
+    elif not isinstance(err, openai.APIConnectionError):  # connection errors include timeouts
+        return None
+    return min(60.0, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+async def aretry(call: Callable[[], Awaitable[Any]], limiter: Optional[RateLimiter] = None, cost: int = 0,
+                 max_retries: int = 5, base_delay: float = 1.0, stats: Optional[dict] = None, service: str = "openai"):
+    """await call(), waiting on limiter first and retrying 429/5xx/connection errors with backoff."""
+    for attempt in range(max_retries + 1):
+        if limiter:
+            await limiter.acquire(cost)
+        try:
+            with metrics.timed(service):
+                return await call()
+        except Exception as e:
+            delay = retry_delay(e, attempt, base_delay)
+            if delay is None or attempt == max_retries:
+                raise
+            if stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            metrics.retry(service)
+            await asyncio.sleep(delay)
+
+async def ainvoke_with_retry(llm, messages, limiter: Optional[RateLimiter] = None, max_retries: int = 5,
+                             base_delay: float = 1.0, stats: Optional[dict] = None):
+    """llm.ainvoke(messages) that waits on limiter and retries 429/5xx/connection errors with backoff."""
+    model = getattr(llm, "model_name", "gpt-4o-mini")
+    cost = count_tokens("".join(str(m.content) for m in messages), model)
+    res = await aretry(lambda: llm.ainvoke(messages), limiter, cost, max_retries, base_delay, stats, "openai.chat")
+    record_usage(model, res)
+    return res
+
+def record_usage(model: str, res):
+    """Add a chat response's prompt / completion tokens to the current metrics run."""
+    usage = getattr(res, "usage_metadata", None) or {}
+    metrics.tokens(model, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+async def gather_bounded(jobs: Sequence[Callable[[], Awaitable[Any]]], concurrency: int, desc: Optional[str] = None) -> List[Any]:
+    """Run the job factories with at most `concurrency` in flight. Results (or the exception
+    each job raised) come back in input order, whatever order they finished in."""
+    sem = asyncio.Semaphore(max(concurrency, 1))
+    bar = tqdm(total=len(jobs), desc=desc, disable=desc is None, file=sys.stderr)
+
+    async def run(job):
+        async with sem:
+            try:
+                return await job()
+            finally:
+                bar.update(1)
+
+    try:
+        return await asyncio.gather(*(run(j) for j in jobs), return_exceptions=True)
+    finally:
+        bar.close()
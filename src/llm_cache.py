@@ -0,0 +1,123 @@
+import argparse, hashlib, json, os, sqlite3, time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+from . import metrics
+from .config import DATA_DIR
+
+# Disk-backed cache of LLM responses shared by llm_pipeline, llm_enhance and weekly_digest.
+# Entries are keyed on a hash of model + temperature + the fully rendered messages, so an
+# unchanged prompt is never sent twice. Responses are stored only after the caller's parse
+# succeeds, so a malformed reply is retried on the next run rather than pinned.
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.sqlite"))
+
+def cache_key(model: str, temperature: Optional[float], messages: Sequence[Any]) -> str:
+    payload = {"model": model, "temperature": temperature, "messages": [[m.type, m.content] for m in messages]}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def add_cache_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--no_cache", dest="cache_mode", action="store_const", const="off", default="use",
+                    help="neither read nor write the LLM response cache")
+    ap.add_argument("--refresh_cache", dest="cache_mode", action="store_const", const="refresh",
+                    help="ignore cached responses but store the fresh ones")
+    ap.add_argument("--cache_max_age_days", type=float, default=60)
+    ap.add_argument("--cache_max_mb", type=float, default=256)
+
+class LLMCache:
+    """SQLite response cache. mode is "use" (read + write), "refresh" (write only) or "off"."""
+
+    def __init__(self, path: str = CACHE_PATH, mode: str = "use", max_age_days: float = 60, max_mb: float = 256):
+        self.mode, self.max_age_days, self.max_bytes = mode, max_age_days, int(max_mb * 1024 * 1024)
+        self.hits = self.misses = self.writes = 0
+        self.db = None
+        if mode != "off":
+            self.db = sqlite3.connect(path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL,
+                created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)""")
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self.db.commit()
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "LLMCache":
+        return cls(mode=args.cache_mode, max_age_days=args.cache_max_age_days, max_mb=args.cache_max_mb)
+
+    def get(self, key: str) -> Optional[str]:
+        if self.mode != "use":
+            return None
+        row = self.db.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.max_age_days and time.time() - row[1] > self.max_age_days * 86400):
+            return None
+        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, model: str, content: str):
+        if self.db is None:
+            return
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, content, now, now, len(content.encode("utf-8"))))
+        self.db.commit()
+        self.writes += 1
+
+    def _lookup(self, llm, messages):
+        key = cache_key(llm.model_name, getattr(llm, "temperature", None), messages)
+        content = self.get(key)
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        metrics.cache("llm", hits=int(content is not None), misses=int(content is None))
+        return key, content
+
+    def fetch(self, llm, messages, call: Callable[[], str], parse: Callable[[str], Any] = lambda c: c):
+        """parse(cached content), or parse(call()) and store the content once it parses."""
+        key, content = self._lookup(llm, messages)
+        if content is not None:
+            return parse(content)
+        content = call()
+        out = parse(content)
+        self.put(key, llm.model_name, content)
+        return out
+
+    async def afetch(self, llm, messages, call: Callable[[], Awaitable[str]], parse: Callable[[str], Any] = lambda c: c):
+        key, content = self._lookup(llm, messages)
+        if content is not None:
+            return parse(content)
+        content = await call()
+        out = parse(content)
+        self.put(key, llm.model_name, content)
+        return out
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days, then least recently used ones until under max_mb."""
+        if self.db is None:
+            return 0
+        before = self.db.total_changes
+        if self.max_age_days:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_days * 86400,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            cutoff, running = None, total
+            for accessed, size in self.db.execute("SELECT accessed, size FROM responses ORDER BY accessed"):
+                running -= size
+                cutoff = accessed
+                if running <= self.max_bytes:
+                    break
+            self.db.execute("DELETE FROM responses WHERE accessed <= ?", (cutoff,))
+        self.db.commit()
+        return self.db.total_changes - before
+
+    def summary(self) -> str:
+        if self.mode == "off":
+            return "LLM cache: off"
+        looked = self.hits + self.misses
+        rate = f"{100 * self.hits / looked:.1f}%" if looked else "n/a"
+        return f"LLM cache: {self.hits} hits, {self.misses} misses ({rate} hit rate), {self.writes} writes"
+
+    def close(self):
+        if self.db is not None:
+            self.evict()
+            self.db.close()
+            self.db = None
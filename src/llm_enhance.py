@@ -1,8 +1,14 @@
-import argparse, os, json, pandas as pd
+import argparse, asyncio, hashlib, os, json, sys, time, pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
+from . import metrics
 from .config import DATA_DIR, OPENAI_API_KEY
+from .llm_async import RateLimiter, ainvoke_with_retry, async_http_client, gather_bounded
+from .llm_cache import LLMCache, add_cache_args
+from .storage import read_stage, write_stage
 
 SYSTEM = """Enhance each restaurant mention.
 Return JSON with:
@@ -14,35 +20,134 @@ USER_TMPL = """NAME: {name}
 WHY: {why}
 """
 
+BATCH_SYSTEM = """Enhance each restaurant mention in the input JSON list.
+Return ONLY JSON of the form {"results": [...]} with exactly one entry per input item:
+- id: the input item's id, unchanged
+- signature_dishes: list[str] (<=3)
+- sentiment_label: "must-try" | "good" | "mixed"
+If info insufficient, dishes []."""
+
+LABELS = {"must-try", "good", "mixed"}
+
+def _valid_item(item: Any) -> bool:
+    return (isinstance(item, dict) and item.get("sentiment_label") in LABELS
+            and isinstance(item.get("signature_dishes", []), list)
+            and all(isinstance(d, str) for d in item.get("signature_dishes", [])))
+
+def _item_id(item: dict) -> Optional[str]:
+    rid = item.get("id")
+    return str(rid) if rid is not None else None
+
+def row_id(name: str, why: str) -> str:
+    """Content id of a row as sent: the same name and why always get the same id."""
+    return hashlib.sha1(f"{name}\0{why}".encode("utf-8")).hexdigest()[:12]
+
+def stable_batches(rows: List[Tuple[str, str, str]], batch_size: int) -> List[List[Tuple[str, str, str]]]:
+    """Rows sorted by id and cut after every id that hashes to 0 mod batch_size (at most
+    2 * batch_size per batch). Boundaries depend on the ids, not on positions, so a new or
+    changed row only changes the prompt, and cache key, of its own batch."""
+    chunks, cur = [], []
+    for r in sorted(rows):
+        cur.append(r)
+        if int(r[0], 16) % batch_size == 0 or len(cur) >= 2 * batch_size:
+            chunks.append(cur); cur = []
+    return chunks + [cur] if cur else chunks
+
+async def enhance_rows(model: str, rows: List[Tuple[str, str, str]], batch_size: int, concurrency: int,
+                       limiter: Optional[RateLimiter], max_retries: int, cache: LLMCache, stats: dict) -> Dict[str, dict]:
+    """Map row id -> parsed enhancement. Rows go out in stable_batches of about batch_size; any
+    row a batch drops or answers malformed is re-asked on its own with the single-row prompt."""
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM), ("user", USER_TMPL)])
+    parser = JsonOutputParser()
+    results: Dict[str, dict] = {}
+    async with async_http_client(concurrency) as http:
+        llm = ChatOpenAI(model=model, temperature=0, timeout=60, max_retries=0, http_async_client=http)
+
+        async def call(msg):
+            stats["calls"] += 1
+            return (await ainvoke_with_retry(llm, msg, limiter=limiter, max_retries=max_retries, stats=stats)).content
+
+        async def batch(chunk):
+            msg = [SystemMessage(content=BATCH_SYSTEM),
+                   HumanMessage(content=json.dumps([{"id": rid, "name": name, "why": why} for rid, name, why in chunk]))]
+            out = await cache.afetch(llm, msg, lambda: call(msg), parser.parse)
+            ids = {rid for rid, _, _ in chunk}
+            items = out.get("results", []) if isinstance(out, dict) else out
+            return {_item_id(it): it for it in items if _valid_item(it) and _item_id(it) in ids}
+
+        async def single(name, why):
+            msg = prompt.format_messages(name=name, why=why)
+            return await cache.afetch(llm, msg, lambda: call(msg), parser.parse)
+
+        todo = rows
+        if batch_size > 1:
+            chunks = stable_batches(rows, batch_size)
+            got = await gather_bounded([lambda c=c: batch(c) for c in chunks], concurrency, desc="LLM enhancing (batched)")
+            for g in got:
+                if isinstance(g, Exception):
+                    stats["batch_failed"] += 1
+                    metrics.count(f"batch_failed.{type(g).__name__}")
+                else:
+                    results.update(g)
+            todo = [r for r in rows if r[0] not in results]
+            stats["retried_rows"] = len(todo)
+
+        got = await gather_bounded([lambda r=r: single(r[1], r[2]) for r in todo], concurrency,
+                                   desc="LLM enhancing" if todo else None)
+        for (rid, _, _), g in zip(todo, got):
+            if isinstance(g, Exception) or not isinstance(g, dict):
+                stats["failed"] += 1
+                metrics.count(f"failed.{type(g).__name__}")
+                print(f"Enhancement failed for row {rid}: {g}", file=sys.stderr)
+            else:
+                results[rid] = g
+    return results
+
+def enhance(df: pd.DataFrame, model: str = "gpt-4o-mini", batch_size: int = 20, concurrency: int = 8,
+            rpm: Optional[float] = 500, tpm: Optional[float] = 200000, max_retries: int = 5,
+            cache: Optional[LLMCache] = None) -> Tuple[pd.DataFrame, dict]:
+    cache = cache or LLMCache(mode="off")
+    pairs = [(str(name), str(why if pd.notna(why) else "")[:500])
+             for name, why in zip(df["name"], df.get("why", pd.Series([""] * len(df))))]
+    ids = [row_id(name, why) for name, why in pairs]
+    # identical rows are asked once
+    rows = list({rid: (rid, name, why) for rid, (name, why) in zip(ids, pairs)}.values())
+    stats = {"rows": len(df), "calls": 0, "retries": 0, "batch_failed": 0, "retried_rows": 0, "failed": 0}
+    t = time.perf_counter()
+    with metrics.phase("enhance"):
+        out = asyncio.run(enhance_rows(model, rows, batch_size, concurrency, RateLimiter(rpm, tpm), max_retries, cache, stats))
+    stats["wall_s"] = round(time.perf_counter() - t, 2)
+
+    df = df.copy()
+    df["signature_dishes"] = [", ".join(out[i].get("signature_dishes", [])[:3]) if i in out else "" for i in ids]
+    df["sentiment_label"] = [out[i].get("sentiment_label", "good") if i in out else "good" for i in ids]
+    return df, stats
+
+@metrics.instrument("llm_enhance")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--model", type=str, default="gpt-4o-mini")
+    ap.add_argument("--batch_size", type=int, default=20, help="restaurants per request (1 = one request per row)")
+    ap.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    ap.add_argument("--rpm", type=float, default=500, help="requests per minute limit (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=200000, help="prompt tokens per minute limit (0 = unlimited)")
+    ap.add_argument("--max_retries", type=int, default=5, help="retries per request on 429/5xx/connection errors")
+    add_cache_args(ap)
     args = ap.parse_args()
 
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY missing")
 
-    import pandas as pd, json
-    df = pd.read_csv(os.path.join(DATA_DIR, "mentions_clean.csv"))
-    llm = ChatOpenAI(model=args.model, temperature=0)
-    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM), ("user", USER_TMPL)])
-    parser = JsonOutputParser()
-
-    sigs, labels = [], []
-    for _, r in df.iterrows():
-        msg = prompt.format_messages(name=r["name"], why=str(r.get("why",""))[:500])
-        try:
-            res = llm.invoke(msg)
-            out = parser.parse(res.content)
-            sigs.append(", ".join(out.get("signature_dishes", [])[:3]))
-            labels.append(out.get("sentiment_label","good"))
-        except Exception:
-            sigs.append("")
-            labels.append("good")
-    df["signature_dishes"] = sigs
-    df["sentiment_label"] = labels
-    df.to_csv(os.path.join(DATA_DIR,"mentions_enhanced.csv"), index=False)
-    print("Wrote data/mentions_enhanced.csv")
+    df = read_stage("mentions_clean")
+    cache = LLMCache.from_args(args)
+    try:
+        df, stats = enhance(df, args.model, args.batch_size, args.concurrency, args.rpm, args.tpm, args.max_retries, cache)
+    finally:
+        cache.close()
+    print(f"Wrote {write_stage(df, 'mentions_enhanced')}")
+    print(f"{stats['calls']} LLM calls for {stats['rows']} rows in {stats['wall_s']}s "
+          f"({stats['retried_rows']} rows retried individually, {stats['failed']} failed, {stats['retries']} retries)")
+    print(cache.summary())
 
 if __name__ == "__main__":
     main()
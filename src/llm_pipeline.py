@@ -1,13 +1,17 @@
-import argparse, json, os
-from typing import Dict, Any, List
-from tqdm import tqdm
+import argparse, asyncio, hashlib, json, os, sys
+from typing import Dict, Any, List, Optional, Tuple
 import pandas as pd
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
+from . import mentions_log, metrics
 from .config import DATA_DIR, OPENAI_API_KEY
+from .llm_async import RateLimiter, ainvoke_with_retry, async_http_client, count_tokens, gather_bounded
+from .llm_cache import LLMCache, add_cache_args
+from .prefilter import MODEL_PATH as PREFILTER_PATH, Prefilter, filter_posts
 
 SYSTEM = """You are a precise information extractor. Given Reddit posts and comments about restaurants in Los Angeles, extract structured mentions.
+The input holds one or more threads, each starting with POST_ID; comments are ordered by score.
 Return ONLY valid JSON following this schema:
 {
   "mentions":[
@@ -17,6 +21,7 @@ Return ONLY valid JSON following this schema:
       "cuisine": "Cuisine/category if mentioned or infer",
       "why": "Short reason/quote for recommendation",
       "sentiment": "positive|neutral|negative",
+      "post_id": "POST_ID of the thread the mention comes from",
       "source_url": "Reddit permalink",
       "created_iso": "ISO timestamp of mention"
     }
@@ -26,63 +31,210 @@ If nothing is found, return {"mentions": []}.
 Keep "why" under 160 characters.
 """
 
-USER_TMPL = """POST_TITLE: {title}
+THREAD_TMPL = """POST_ID: {id}
+POST_TITLE: {title}
 POST_BODY: {selftext}
 PERMALINK: {permalink}
-TOP_COMMENTS_JSON: {comments_json}
-"""
+COMMENTS_JSON: """
+
+# ids and parent_ids cost tokens and tell the model nothing
+COMMENT_FIELDS = ("body", "score", "created_utc")
+
+def compact_comment(c: Dict[str, Any]) -> str:
+    d = {k: c[k] for k in COMMENT_FIELDS if c.get(k) not in (None, "")}
+    if isinstance(d.get("created_utc"), float):
+        d["created_utc"] = int(d["created_utc"])  # sub-second digits are ~6 tokens a comment
+    return json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+
+def _cut_after(post: Dict[str, Any], every: int) -> bool:
+    digest = hashlib.sha1(str(post.get("id", "")).encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) % every == 0
+
+def pack_jobs(posts: List[Dict[str, Any]], max_tokens: int = 4000, max_threads: int = 8,
+              model: str = "gpt-4o-mini") -> List[Tuple[List[Dict[str, Any]], str]]:
+    """Pack threads into requests of up to max_tokens prompt tokens (system prompt aside).
+
+    Comments go in by score, highest first, whole. Threads go in by id and share requests, cut
+    after every thread whose id hashes to 0 mod max_threads // 2 and before one that wouldn't
+    fit (tokens or max_threads); a thread that doesn't fit an empty request continues in the
+    next under a repeated header. Boundaries depend on ids rather than positions, so a thread
+    that gains comments changes the prompts (and cache keys) of its own requests and at most
+    the rest of its group. Only a single comment longer than the budget makes a request go
+    over it, alone. Posts without comments are skipped, as before."""
+    every = max(1, max_threads // 2)
+    jobs, cur, cur_posts, used = [], [], [], 0
+
+    def flush():
+        nonlocal cur, cur_posts, used
+        if cur:
+            jobs.append((cur_posts, "\n".join(cur)))
+        cur, cur_posts, used = [], [], 0
+
+    for post in sorted(posts, key=lambda p: str(p.get("id", ""))):
+        comments = sorted(post.get("comments") or [], key=lambda c: -(c.get("score") or 0))
+        if not comments:
+            continue
+        header = THREAD_TMPL.format(id=post.get("id", ""), title=post.get("title", ""),
+                                    selftext=post.get("selftext", ""), permalink=post.get("permalink", ""))
+        h = count_tokens(header, model)
+        items = [compact_comment(c) for c in comments]
+        costs = [count_tokens(it, model) + 1 for it in items]  # + the separating comma
+        if cur_posts and (used + h + sum(costs) > max_tokens or len(cur_posts) >= max_threads):
+            flush()
+        i = 0
+        while i < len(items):
+            used += h
+            j = i
+            while j < len(items) and (j == i or used + costs[j] <= max_tokens):
+                used += costs[j]
+                j += 1
+            cur.append(header + "[" + ",".join(items[i:j]) + "]")
+            cur_posts.append(post)
+            if j < len(items):
+                flush()
+            i = j
+        if _cut_after(post, every):
+            flush()
+    flush()
+    return jobs
+
+def read_threads(raw_path: str) -> List[Dict[str, Any]]:
+    # incremental scrapes append a thread again when it gains comments; the last copy wins
+    posts = {}
+    with open(raw_path, "r", encoding="utf-8") as f_in:
+        for i, line in enumerate(f_in):
+            post = json.loads(line)
+            posts[post.get("id", i)] = post
+    metrics.rows("raw_threads", read=len(posts))
+    return list(posts.values())
 
-def chunk_comments(comments: List[Dict[str, Any]], max_items=50) -> List[List[Dict[str, Any]]]:
-    chunks = []
-    for i in range(0, len(comments), max_items):
-        chunks.append(comments[i:i+max_items])
-    return chunks
+def build_jobs(raw_path: str, max_tokens: int = 4000, max_threads: int = 8, model: str = "gpt-4o-mini",
+               prefilter: Optional[Prefilter] = None) -> List[Tuple[List[Dict[str, Any]], str]]:
+    posts = read_threads(raw_path)
+    if prefilter is not None:
+        posts = filter_posts(posts, prefilter)
+    return pack_jobs(posts, max_tokens, max_threads, model)
 
-def run_llm(model_name: str, batch_size: int):
-    llm = ChatOpenAI(model=model_name, temperature=0, timeout=60)
-    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM), ("user", USER_TMPL)])
+def attribute(m: Dict[str, Any], posts: List[Dict[str, Any]]) -> Any:
+    """post_id for a mention from a request carrying several threads: the model's post_id if it
+    names one of them, else the first thread whose text contains the restaurant name."""
+    ids = [p.get("id") for p in posts]
+    if m.get("post_id") in ids:
+        return m["post_id"]
+    name = str(m.get("name") or "").lower()
+    for p in posts if len(posts) > 1 else []:
+        text = " ".join([p.get("title") or "", p.get("selftext") or ""] + [c.get("body") or "" for c in p.get("comments") or []])
+        if name and name in text.lower():
+            return p.get("id")
+    return ids[0]
+
+def previous_mentions(path: str) -> Dict[Any, List[Dict[str, Any]]]:
+    """The last run's mentions by post_id, to tell which threads this run changed."""
+    prev: Dict[Any, List[Dict[str, Any]]] = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    m = json.loads(line)
+                    prev.setdefault(m.get("post_id"), []).append(m)
+    return prev
+
+async def extract_all(model_name: str, jobs: List[Tuple[List[Dict[str, Any]], str]], concurrency: int,
+                      limiter: Optional[RateLimiter], max_retries: int, stats: dict, cache: LLMCache) -> List[Any]:
     parser = JsonOutputParser()
+    async with async_http_client(concurrency) as http:
+        # retries are ours (with the limiter in the loop), not the client's
+        llm = ChatOpenAI(model=model_name, temperature=0, timeout=60, max_retries=0, http_async_client=http)
+
+        async def extract(user: str):
+            # SYSTEM holds literal JSON braces, so build messages directly rather than via a template
+            msg = [SystemMessage(content=SYSTEM), HumanMessage(content=user)]
+
+            async def call():
+                res = await ainvoke_with_retry(llm, msg, limiter=limiter, max_retries=max_retries, stats=stats)
+                return res.content
+
+            return await cache.afetch(llm, msg, call, parser.parse)
+
+        return await gather_bounded([lambda u=user: extract(u) for _, user in jobs], concurrency, desc="LLM extracting")
+
+def run_llm(model_name: str, max_tokens: int = 4000, max_threads: int = 8, concurrency: int = 8, rpm: Optional[float] = 500, tpm: Optional[float] = 200000,
+            max_retries: int = 5, raw_path: Optional[str] = None, out_path: Optional[str] = None,
+            cache: Optional[LLMCache] = None, prefilter: Optional[Prefilter] = None, log_path: Optional[str] = None) -> dict:
+    raw_path = raw_path or os.path.join(DATA_DIR, "raw_threads.jsonl")
+    out_path = out_path or os.path.join(DATA_DIR, "mentions_raw.jsonl")
+
+    with metrics.phase("build_jobs"):
+        jobs = build_jobs(raw_path, max_tokens, max_threads, model_name, prefilter)
+    stats = {"requests": len(jobs), "failed": 0, "retries": 0}
+    cache = cache or LLMCache(mode="off")
+    with metrics.phase("extract"):
+        results = asyncio.run(extract_all(model_name, jobs, concurrency, RateLimiter(rpm, tpm), max_retries, stats, cache))
 
-    raw_path = os.path.join(DATA_DIR, "raw_threads.jsonl")
-    out_path = os.path.join(DATA_DIR, "mentions_raw.jsonl")
     n = 0
+    prev = previous_mentions(out_path)
+    by_thread: Dict[Any, List[Dict[str, Any]]] = {}
+    failed_threads = set()
+    # results line up with jobs, so the output order is the jobs' order whatever the concurrency
+    with open(out_path, "w", encoding="utf-8") as f_out:
+        for (posts, _), data in zip(jobs, results):
+            if isinstance(data, Exception):
+                stats["failed"] += 1
+                metrics.count(f"failed.{type(data).__name__}")
+                ids = ", ".join(str(p.get("id")) for p in posts)
+                print(f"Extraction failed for posts {ids}: {type(data).__name__}: {data}", file=sys.stderr)
+                failed_threads.update(p.get("id") for p in posts)
+                continue
+            for p in posts:
+                by_thread.setdefault(p.get("id"), [])
+            for m in data.get("mentions", []):
+                m["post_id"] = attribute(m, posts)
+                by_thread.setdefault(m["post_id"], []).append(m)
+                f_out.write(json.dumps(m) + "\n")
+                n += 1
 
-    with open(raw_path, "r", encoding="utf-8") as f_in, open(out_path, "w", encoding="utf-8") as f_out:
-        for line in tqdm(f_in, desc="LLM extracting"):
-            post = json.loads(line)
-            comments = post.get("comments", [])
-            for chunk in chunk_comments(comments, max_items=batch_size*4):
-                user = USER_TMPL.format(
-                    title=post.get("title",""),
-                    selftext=post.get("selftext",""),
-                    permalink=post.get("permalink",""),
-                    comments_json=json.dumps(chunk)[:12000]
-                )
-                try:
-                    msg = prompt.format_messages()
-                    msg[1].content = user
-                    res = llm.invoke(msg)
-                    data = parser.parse(res.content)
-                except Exception:
-                    data = {"mentions": []}
-
-                for m in data.get("mentions", []):
-                    m["post_id"] = post.get("id")
-                    f_out.write(json.dumps(m) + "\n")
-                    n += 1
-
-    print(f"Wrote {n} mentions -> {out_path}")
+    # threads whose mentions differ from the last run go to the log incremental dedupe reads;
+    # a thread with a failed request is left out whole, it is extracted again next run
+    changed = [(tid, ms) for tid, ms in by_thread.items() if tid not in failed_threads and ms != prev.get(tid, [])]
+    log_path = log_path or os.path.join(os.path.dirname(out_path), os.path.basename(mentions_log.LOG_PATH))
+    stats["threads_changed"] = mentions_log.append(changed, log_path)
+    metrics.rows("mentions_raw", out=n)
+    print(f"Wrote {n} mentions -> {out_path} ({stats['failed']}/{stats['requests']} requests failed, {stats['retries']} retries), "
+          f"{stats['threads_changed']} changed threads logged")
+    print(cache.summary())
+    return stats
 
+@metrics.instrument("llm_pipeline")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--model", type=str, default="gpt-4o-mini")
-    ap.add_argument("--batch_size", type=int, default=12)
+    ap.add_argument("--max_tokens", type=int, default=4000, help="prompt tokens per request, threads and comments packed up to it")
+    ap.add_argument("--max_threads", type=int, default=8, help="threads sharing one request at most")
+    ap.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    ap.add_argument("--rpm", type=float, default=500, help="requests per minute limit (0 = unlimited)")
+    ap.add_argument("--tpm", type=float, default=200000, help="prompt tokens per minute limit (0 = unlimited)")
+    ap.add_argument("--max_retries", type=int, default=5, help="retries per request on 429/5xx/connection errors")
+    ap.add_argument("--prefilter", action="store_true", help="skip comments the saved prefilter model (data/prefilter.npz) drops")
+    ap.add_argument("--prefilter_threshold", type=float, default=None, help="keep comments scoring at least this (default: the trained one)")
+    add_cache_args(ap)
     args = ap.parse_args()
 
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY missing in environment.")
 
-    run_llm(args.model, args.batch_size)
+    prefilter = None
+    if args.prefilter:
+        if not os.path.exists(PREFILTER_PATH):
+            raise FileNotFoundError(f"{PREFILTER_PATH} missing: train it with python -m src.prefilter --train")
+        prefilter = Prefilter.load()
+        if args.prefilter_threshold is not None:
+            prefilter.threshold = args.prefilter_threshold
+    cache = LLMCache.from_args(args)
+    try:
+        run_llm(args.model, args.max_tokens, args.max_threads, args.concurrency, args.rpm, args.tpm, args.max_retries,
+                cache=cache, prefilter=prefilter)
+    finally:
+        cache.close()
 
 if __name__ == "__main__":
     main()
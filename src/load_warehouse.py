@@ -0,0 +1,266 @@
+import argparse, hashlib, json, os, re, time
+from typing import Dict, Iterable, List, Optional
+import numpy as np, pandas as pd
+from . import metrics
+from .config import DATA_DIR, WAREHOUSE_URL
+from .dedupe_state import ALIASES_PATH, mention_keys
+from .geocode_cache import normalize
+from .storage import read_stage, stage_exists
+
+# Loads the star schema in warehouse/sql/schema.sql. Each run stages the scored restaurants and
+# every raw mention into temp tables (COPY on Postgres, a registered DataFrame on DuckDB,
+# executemany on SQLite), then does set-based SQL: upsert restaurants_dim on name_norm, add
+# unseen sources, insert facts joined to their dimension ids and skip mention_keys already
+# loaded, refresh the views. A fact's mention_key is dedupe_state.mention_keys (thread,
+# normalised name, occurrence), so re-extracting a thread re-keys its mentions the same way. Re-running over the same data is a no-op apart from the refresh.
+# Locally the "materialized views" are plain tables rebuilt on refresh. Anything relative to
+# now (recency, the last 60 days) is computed by the views from created_at, so facts never
+# hold a value that goes stale once inserted.
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "warehouse", "sql", "schema.sql")
+RAW_PATH = os.path.join(DATA_DIR, "mentions_raw.jsonl")
+DIM_COLS = ["name", "name_norm", "neighborhood", "cuisine", "first_seen", "last_seen"]
+FACT_COLS = ["mention_key", "legacy_key", "name_norm", "source", "created_at", "sentiment_label", "why", "url", "score_buzz", "score_trend"]
+TIMESTAMP_COLS = {"first_seen", "last_seen", "created_at"}
+FLOAT_COLS = {"score_buzz", "score_trend"}
+
+UPSERT_DIMS = """INSERT INTO restaurants_dim (name, name_norm, neighborhood, cuisine, first_seen, last_seen)
+SELECT name, name_norm, neighborhood, cuisine, first_seen, last_seen FROM st_restaurants WHERE true
+ON CONFLICT (name_norm) DO UPDATE SET
+  name = excluded.name,
+  neighborhood = COALESCE(excluded.neighborhood, restaurants_dim.neighborhood),
+  cuisine = COALESCE(excluded.cuisine, restaurants_dim.cuisine),
+  first_seen = {least}(COALESCE(excluded.first_seen, restaurants_dim.first_seen), COALESCE(restaurants_dim.first_seen, excluded.first_seen)),
+  last_seen = {greatest}(COALESCE(excluded.last_seen, restaurants_dim.last_seen), COALESCE(restaurants_dim.last_seen, excluded.last_seen))"""
+INSERT_SOURCES = """INSERT INTO sources_dim (source_name)
+SELECT DISTINCT source FROM st_mentions WHERE source NOT IN (SELECT source_name FROM sources_dim)"""
+# Facts loaded before the key scheme above carry a hash of source, url, name and created_iso;
+# drop those for the mentions being staged so they come back under their new key, not twice.
+DELETE_LEGACY = "DELETE FROM mentions_fact WHERE mention_key IN (SELECT legacy_key FROM st_mentions)"
+INSERT_FACTS = """INSERT INTO mentions_fact (restaurant_id, source_id, created_at, sentiment_label, why, url, score_buzz, score_trend, mention_key)
+SELECT r.restaurant_id, s.source_id, st.created_at, st.sentiment_label, st.why, st.url, st.score_buzz, st.score_trend, st.mention_key
+FROM st_mentions st
+JOIN restaurants_dim r ON r.name_norm = st.name_norm
+JOIN sources_dim s ON s.source_name = st.source
+WHERE true
+ON CONFLICT (mention_key) DO NOTHING"""
+
+def legacy_key(*parts) -> str:
+    return hashlib.sha1("|".join("" if p is None else str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+def canonical_names(path: str = ALIASES_PATH) -> Dict[str, str]:
+    """normalize(raw name) -> normalize(cluster name), as written by dedupe_and_score."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def restaurant_rows(scored: pd.DataFrame) -> pd.DataFrame:
+    df = pd.DataFrame({c: scored[c].astype(object) if c in scored else None for c in ["name", "neighborhood", "cuisine", "first_seen", "last_seen"]})
+    df["name_norm"] = [normalize(n) for n in df["name"]]
+    return df[df["name_norm"] != ""][DIM_COLS]
+
+def mention_rows(raw: pd.DataFrame, aliases: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """One fact row per mention. score_buzz and score_trend stay NULL: the views count each
+    mention as 1 and decay the latest created_at against NOW() on every refresh."""
+    get = lambda c: raw[c].astype(object) if c in raw else pd.Series(None, index=raw.index, dtype=object)
+    aliases = aliases or {}
+    norm = [normalize(n) for n in get("name")]
+    source = get("source").where(get("source").notna(), "reddit")
+    created = pd.to_datetime(get("created_iso"), utc=True, errors="coerce", format="mixed")
+    # external rows have no post_id; their thread is the source's url
+    thread = get("post_id").where(get("post_id").notna(), source + "|" + get("source_url").fillna("").astype(str))
+    df = pd.DataFrame({
+        "mention_key": mention_keys([{"post_id": t, "name": n} for t, n in zip(thread, get("name"))]),
+        "legacy_key": [legacy_key(*r) for r in zip(source, get("source_url"), get("name"), get("created_iso"))],
+        "name": get("name"), "name_norm": [aliases.get(n, n) for n in norm], "source": source,
+        "created_at": created, "sentiment_label": get("sentiment"), "why": get("why"), "url": get("source_url"),
+        "score_buzz": np.nan, "score_trend": np.nan,
+    })
+    return df[df["name_norm"] != ""]
+
+def _split_sql(text: str) -> List[str]:
+    text = re.sub(r"--[^\n]*", "", text)
+    return [s.strip() for s in text.split(";") if s.strip()]
+
+class Warehouse:
+    """A connection to the star schema on postgresql://, sqlite:/// or duckdb:/// URLs."""
+
+    def __init__(self, url: str = WAREHOUSE_URL, schema_path: str = SCHEMA_PATH):
+        scheme, _, rest = url.partition("://")
+        self.dialect = {"postgresql": "postgres", "postgres": "postgres", "sqlite": "sqlite", "duckdb": "duckdb"}.get(scheme)
+        if self.dialect is None:
+            raise ValueError(f"unsupported warehouse URL {url!r}; expected postgresql://, sqlite:/// or duckdb:///")
+        if self.dialect == "postgres":
+            try:
+                import psycopg
+            except ImportError:
+                raise RuntimeError("psycopg is required for a Postgres warehouse: pip install 'psycopg[binary]'")
+            self.con = psycopg.connect(url)
+        elif self.dialect == "sqlite":
+            import sqlite3
+            self.con = sqlite3.connect(rest[1:] or ":memory:")
+            for pragma in ("journal_mode=WAL", "synchronous=NORMAL", "cache_size=-131072", "temp_store=MEMORY"):
+                self.con.execute(f"PRAGMA {pragma}")
+        else:
+            try:
+                import duckdb
+            except ImportError:
+                raise RuntimeError("duckdb is required for a duckdb:/// warehouse: pip install duckdb")
+            self.con = duckdb.connect(rest[1:] or ":memory:")
+        with open(schema_path, "r", encoding="utf-8") as f:
+            stmts = _split_sql(f.read())
+        self.tables = [s for s in stmts if not s.upper().startswith("CREATE MATERIALIZED VIEW")]
+        self.views = dict(re.match(r"CREATE MATERIALIZED VIEW IF NOT EXISTS (\w+) AS\s+(.*)", s, re.S).groups()
+                          for s in stmts if s.upper().startswith("CREATE MATERIALIZED VIEW"))
+
+    # --- dialect differences ---------------------------------------------------------------
+    def _local(self, stmt: str) -> List[str]:
+        """schema.sql statement rewritten for SQLite/DuckDB."""
+        if self.dialect == "sqlite":
+            stmt = re.sub(r"(\w+) (BIG)?SERIAL PRIMARY KEY", r"\1 INTEGER PRIMARY KEY", stmt)
+            stmt = stmt.replace("NOW() - INTERVAL '60 days'", "datetime('now', '-60 days')")
+            stmt = stmt.replace("EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - MAX(m.created_at)) / 86400.0",
+                                "(julianday('now') - julianday(MAX(m.created_at)))")
+            return [stmt]
+        pre = []
+        table = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", stmt)
+        for col, big in re.findall(r"(\w+) (BIG)?SERIAL PRIMARY KEY", stmt):
+            pre.append(f"CREATE SEQUENCE IF NOT EXISTS {table[1]}_{col}_seq")
+            stmt = stmt.replace(f"{col} {big}SERIAL PRIMARY KEY",
+                                f"{col} {'BIGINT' if big else 'INTEGER'} PRIMARY KEY DEFAULT nextval('{table[1]}_{col}_seq')")
+        return pre + [stmt]
+
+    def execute(self, sql: str, params=None):
+        return self.con.execute(sql, params) if params is not None else self.con.execute(sql)
+
+    def ensure_schema(self):
+        for stmt in self.tables:
+            for s in ([stmt] if self.dialect == "postgres" else self._local(stmt)):
+                if self.dialect == "sqlite" and "ADD COLUMN IF NOT EXISTS" in s:
+                    table, col = re.search(r"ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)", s).groups()
+                    if col in [r[1] for r in self.execute(f"PRAGMA table_info({table})")]:
+                        continue
+                    s = s.replace(" IF NOT EXISTS", "")
+                self.execute(s)
+        if self.dialect == "postgres":
+            # vw_trending_restaurants used to read the load-time score_trend; replace it once
+            stale = self.execute("SELECT matviewname FROM pg_matviews WHERE matviewname = 'vw_trending_restaurants' "
+                                 "AND definition LIKE '%score_trend%'").fetchall()
+            for (name,) in stale:
+                self.execute(f"DROP MATERIALIZED VIEW {name}")
+            for name, select in self.views.items():
+                self.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {select}")
+        self.con.commit()
+
+    def _rows(self, df: pd.DataFrame) -> Iterable[tuple]:
+        df = df.copy()
+        for c in df.columns:
+            if c in TIMESTAMP_COLS:
+                ts = pd.to_datetime(df[c], utc=True, errors="coerce", format="mixed").dt.tz_localize(None)
+                df[c] = ts.dt.strftime("%Y-%m-%d %H:%M:%S") if self.dialect == "sqlite" else ts.astype(object)
+        return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+    def stage(self, table: str, df: pd.DataFrame, batch_size: int = 50000):
+        """Bulk-load df into a fresh temp table."""
+        types = ", ".join(f"{c} {'TIMESTAMP' if c in TIMESTAMP_COLS else 'FLOAT8' if c in FLOAT_COLS else 'TEXT'}" for c in df.columns)
+        self.execute(f"DROP TABLE IF EXISTS {table}")
+        self.execute(f"CREATE TEMP TABLE {table} ({types})")
+        cols = ", ".join(df.columns)
+        if self.dialect == "postgres":
+            with self.con.cursor().copy(f"COPY {table} ({cols}) FROM STDIN") as cp:
+                for row in self._rows(df):
+                    cp.write_row(row)
+        elif self.dialect == "duckdb":
+            frame = df.copy()
+            for c in TIMESTAMP_COLS & set(frame.columns):
+                frame[c] = pd.to_datetime(frame[c], utc=True, errors="coerce", format="mixed").dt.tz_localize(None)
+            for c in set(frame.columns) - TIMESTAMP_COLS - FLOAT_COLS:
+                frame[c] = frame[c].astype(object).where(frame[c].notna(), None)
+            self.con.register("_stage_frame", frame)
+            self.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _stage_frame")
+            self.con.unregister("_stage_frame")
+        else:
+            rows = list(self._rows(df))
+            sql = f"INSERT INTO {table} ({cols}) VALUES ({', '.join('?' * len(df.columns))})"
+            for i in range(0, len(rows), batch_size):
+                self.con.executemany(sql, rows[i:i+batch_size])
+
+    def count(self, table: str) -> int:
+        return self.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def load(self, dims: pd.DataFrame, facts: pd.DataFrame) -> Dict[str, int]:
+        """Upsert dims, add sources and facts, refresh views; one transaction."""
+        least, greatest = ("MIN", "MAX") if self.dialect == "sqlite" else ("LEAST", "GREATEST")
+        if self.dialect == "duckdb":
+            self.execute("BEGIN TRANSACTION")
+        try:
+            before = {t: self.count(t) for t in ("restaurants_dim", "sources_dim", "mentions_fact")}
+            self.stage("st_restaurants", dims[DIM_COLS])
+            self.stage("st_mentions", facts[FACT_COLS])
+            self.execute(UPSERT_DIMS.format(least=least, greatest=greatest))
+            self.execute(INSERT_SOURCES)
+            self.execute(DELETE_LEGACY)
+            self.execute(INSERT_FACTS)
+            out = {f"{t}_new": self.count(t) - n for t, n in before.items()}
+            self.refresh_views(commit=False)
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+        return out
+
+    def refresh_views(self, commit: bool = True):
+        for name, select in self.views.items():
+            if self.dialect == "postgres":
+                self.execute(f"REFRESH MATERIALIZED VIEW {name}")
+            else:
+                self.execute(f"DROP TABLE IF EXISTS {name}")
+                self.execute(f"CREATE TABLE {name} AS {self._local(select)[-1]}")
+        if commit:
+            self.con.commit()
+
+    def close(self):
+        self.con.close()
+
+def build_frames(raw_path: str = RAW_PATH):
+    """(dims, facts) from the scored stage and mentions_raw.jsonl, plus external_merged rows."""
+    scored = read_stage(["mentions_enhanced", "mentions_clean"], ["name", "neighborhood", "cuisine", "first_seen", "last_seen"])
+    raw = pd.read_json(raw_path, lines=True, dtype=False) if os.path.exists(raw_path) else pd.DataFrame()
+    metrics.rows("mentions_raw", read=len(raw))
+    if stage_exists("external_merged"):
+        raw = pd.concat([raw, read_stage("external_merged", ["name", "neighborhood", "cuisine", "why", "source_url", "source"])],
+                        ignore_index=True)
+    facts = mention_rows(raw, canonical_names())
+    dims = restaurant_rows(scored)
+    extra = facts[~facts["name_norm"].isin(dims["name_norm"])].drop_duplicates("name_norm")
+    dims = pd.concat([dims, pd.DataFrame({"name": extra["name"], "name_norm": extra["name_norm"]})], ignore_index=True)
+    return dims.drop_duplicates("name_norm")[DIM_COLS], facts
+
+@metrics.instrument("load_warehouse")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", type=str, default=WAREHOUSE_URL, help="postgresql://..., sqlite:///path or duckdb:///path")
+    ap.add_argument("--refresh_only", action="store_true", help="only refresh the views")
+    args = ap.parse_args()
+
+    wh = Warehouse(args.url)
+    try:
+        wh.ensure_schema()
+        if args.refresh_only:
+            wh.refresh_views(); print("Refreshed views."); return
+        with metrics.phase("build_frames"):
+            dims, facts = build_frames()
+        t = time.perf_counter()
+        with metrics.phase("load"):
+            counts = wh.load(dims, facts)
+        secs = time.perf_counter() - t
+        for table in ("restaurants_dim", "sources_dim", "mentions_fact"):
+            metrics.rows(table, out=counts[f"{table}_new"])
+        print(f"Loaded {len(facts)} mentions / {len(dims)} restaurants into {wh.dialect} in {secs:.1f}s "
+              f"({len(facts) / max(secs, 1e-9):,.0f} rows/s): " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    finally:
+        wh.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import math
+from typing import Optional, Tuple
+import numpy as np, pandas as pd
+import folium
+from folium.plugins import FastMarkerCluster, HeatMap
+
+# Folium maps that stay small as the mention count grows. Points are binned on a lat/lng grid
+# in NumPy (cells roughly square at LA's latitude) and the heat layer gets one weighted point
+# per cell instead of one per row. Markers go through FastMarkerCluster: rows ship as compact
+# arrays and the popup is assembled in the browser, so there is no per-marker JS or HTML.
+
+LA_CENTER = [34.0522, -118.2437]
+MODES = ("auto", "markers", "cluster", "binned")
+CELL_DEG = 0.005  # ~550m of latitude
+MAX_MARKERS = 5000
+
+POPUP_JS = """function (row) {
+    var esc = function (s) { return String(s).replace(/[&<>"]/g, function (c) {
+        return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c]; }); };
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup("<b>" + esc(row[2]) + "</b><br>" + esc(row[3]) + " — " + esc(row[4]) +
+                     "<br>Buzz: " + row[5] + " • Trend: " + row[6]);
+    return marker;
+}"""
+
+def bin_points(lat, lng, weights=None, cell_deg: float = CELL_DEG) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Grid cells holding at least one point: (center lat, center lng, summed weight, count)."""
+    lat, lng = np.asarray(lat, dtype="float64"), np.asarray(lng, dtype="float64")
+    w = np.ones_like(lat) if weights is None else np.nan_to_num(np.asarray(weights, dtype="float64"))
+    ok = np.isfinite(lat) & np.isfinite(lng)
+    lat, lng, w = lat[ok], lng[ok], w[ok]
+    if not len(lat):
+        return (np.empty(0),) * 4
+    dlng = cell_deg / max(math.cos(math.radians(float(lat.mean()))), 0.1)
+    i, j = np.floor(lat / cell_deg).astype("int64"), np.floor(lng / dlng).astype("int64")
+    i0, j0 = i.min(), j.min()
+    ncols = j.max() - j0 + 1
+    cells, inv = np.unique((i - i0) * ncols + (j - j0), return_inverse=True)
+    return ((cells // ncols + i0 + 0.5) * cell_deg, (cells % ncols + j0 + 0.5) * dlng,
+            np.bincount(inv, weights=w), np.bincount(inv))
+
+def heat_layer(lat, lng, weights=None, cell_deg: float = CELL_DEG, radius: int = 18) -> HeatMap:
+    clat, clng, w, _ = bin_points(lat, lng, weights, cell_deg)
+    w = w / w.max() if len(w) and w.max() > 0 else w
+    return HeatMap(np.round(np.column_stack([clat, clng, w]), 5).tolist(), radius=radius)
+
+def _coords(df: pd.DataFrame) -> pd.DataFrame:
+    if not {"lat", "lng"} <= set(df.columns):
+        return df.iloc[:0]
+    return df[df["lat"].notna() & df["lng"].notna()]
+
+def _num(df: pd.DataFrame, col: str) -> pd.Series:
+    return pd.to_numeric(df[col], errors="coerce").fillna(0) if col in df else pd.Series(0.0, index=df.index)
+
+def marker_layer(df: pd.DataFrame) -> FastMarkerCluster:
+    text = lambda c: df[c].astype(object).fillna("").astype(str) if c in df else pd.Series("", index=df.index)
+    rows = pd.DataFrame({"lat": df["lat"].astype("float64").round(5), "lng": df["lng"].astype("float64").round(5),
+                         "name": text("name"), "cuisine": text("cuisine"), "hood": text("neighborhood"),
+                         "buzz": _num(df, "score_buzz").astype(int), "trend": _num(df, "score_trend").round(2)})
+    return FastMarkerCluster(rows.to_numpy(dtype=object).tolist(), callback=POPUP_JS, chunkedLoading=True)
+
+def legacy_markers(m: folium.Map, df: pd.DataFrame):
+    """One folium.Marker per row, as geocode_and_map used to draw them."""
+    for _, r in df.iterrows():
+        popup = f"<b>{r['name']}</b><br>{r.get('cuisine','') or ''} — {r.get('neighborhood','') or ''}<br>Buzz: {int(r['score_buzz'])} • Trend: {round(r['score_trend'],2)}"
+        folium.Marker([r["lat"], r["lng"]], popup=popup).add_to(m)
+
+def build_map(df: pd.DataFrame, mode: str = "auto", cell_deg: float = CELL_DEG, max_markers: int = MAX_MARKERS) -> folium.Map:
+    """markers: one Marker per row. cluster: every row in a client-side cluster layer.
+    binned: weighted heat cells for all rows plus clustered markers for the top max_markers
+    by score_total. auto: cluster up to max_markers rows, binned beyond."""
+    pts = _coords(df)
+    if mode == "auto":
+        mode = "cluster" if len(pts) <= max_markers else "binned"
+    m = folium.Map(location=LA_CENTER, zoom_start=10)
+    if mode == "markers":
+        legacy_markers(m, pts)
+    elif mode == "cluster":
+        if len(pts):
+            marker_layer(pts).add_to(m)
+    elif mode == "binned":
+        if len(pts):
+            heat_layer(pts["lat"], pts["lng"], _num(pts, "score_buzz").clip(lower=1), cell_deg).add_to(m)
+            top = pts.nlargest(max_markers, "score_total") if "score_total" in pts else pts.head(max_markers)
+            marker_layer(top).add_to(m)
+    else:
+        raise ValueError(f"unknown map mode {mode!r}; expected one of {', '.join(MODES)}")
+    return m
+
+def heat_map(lat, lng, weights=None, cell_deg: Optional[float] = CELL_DEG) -> folium.Map:
+    """Density heatmap; cell_deg=None ships the raw points (the old behaviour)."""
+    m = folium.Map(location=LA_CENTER, zoom_start=10)
+    if len(lat):
+        if cell_deg is None:
+            HeatMap(np.column_stack([lat, lng]).tolist(), radius=18).add_to(m)
+        else:
+            heat_layer(lat, lng, weights, cell_deg).add_to(m)
+    return m
+
+def map_html(m: folium.Map) -> str:
+    return folium.Figure().add_child(m)._repr_html_()
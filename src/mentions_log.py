@@ -0,0 +1,43 @@
+import json, os, uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import DATA_DIR
+
+# Append-only record of what each llm_pipeline run changed, so incremental consumers read only
+# what is new instead of the whole of mentions_raw.jsonl (which is rewritten every run). The
+# first line is {"log_id": ...}, fresh whenever the log is created; every other line is one
+# thread whose extracted mentions differ from the previous run: {"post_id", "mentions"}, with
+# all of the thread's mentions as extracted now. Readers keep (log_id, byte offset): a
+# different log_id means the log was replaced and the offset is meaningless.
+
+LOG_PATH = os.path.join(DATA_DIR, "mentions_log.jsonl")
+
+def header(path: str = LOG_PATH) -> Tuple[Optional[str], int]:
+    """(log_id, size in bytes), or (None, 0) if there is no log."""
+    if not os.path.exists(path):
+        return None, 0
+    with open(path, "rb") as f:
+        first = f.readline()
+    return json.loads(first)["log_id"] if first.endswith(b"\n") else None, os.path.getsize(path)
+
+def append(threads: List[Tuple[Any, List[Dict[str, Any]]]], path: str = LOG_PATH) -> int:
+    """Append one line per (post_id, mentions); creates the log with a new log_id if needed."""
+    fresh = header(path)[0] is None
+    with open(path, "w" if fresh else "a", encoding="utf-8") as f:
+        if fresh:
+            f.write(json.dumps({"log_id": uuid.uuid4().hex}) + "\n")
+        for post_id, mentions in threads:
+            f.write(json.dumps({"post_id": post_id, "mentions": mentions}) + "\n")
+    return len(threads)
+
+def read_from(offset: int, path: str = LOG_PATH) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """(thread record, offset after it) for each complete line past offset (past the header
+    when offset is 0). A partial last line, from a run still writing, is left for next time."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if offset == 0:
+            offset += len(f.readline())
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            yield json.loads(line), offset
@@ -0,0 +1,186 @@
+import bisect, datetime as dt, functools, glob, json, os, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from .config import DATA_DIR
+
+# Per-run instrumentation shared by the src/ stages. A stage's main is wrapped in
+# @instrument("name"), which makes a Run current for the process; code anywhere below it
+# records into that Run through the module functions here:
+#   phase("embed")               wall + CPU seconds of a block (phases may repeat; they add up)
+#   rows("mentions_clean", out=n) rows read / written (storage.read_stage / write_stage do this)
+#   call("openai.chat", secs, error)  one external request: count, errors, latency histogram
+#   retry / tokens / cache / count    retries, prompt + completion tokens, cache hits / misses
+# On exit the run is written to data/metrics/<stage>_<UTC time>.json (the last KEEP per stage
+# are kept) and the Streamlit Ops tab reads them back. With no instrumented main (library
+# use, benchmarks) records go to a throwaway Run, so callers never need to check.
+
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+KEEP = 50
+
+class Run:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.started = dt.datetime.now(dt.timezone.utc)
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.rows: Dict[str, Dict[str, int]] = {}
+        self.calls: Dict[str, Dict[str, Any]] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.counters: Dict[str, int] = {}
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                p = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "count": 0})
+                p["wall_s"] += time.perf_counter() - wall
+                p["cpu_s"] += time.process_time() - cpu
+                p["count"] += 1
+
+    def add_rows(self, name: str, read: int = 0, out: int = 0):
+        with self._lock:
+            r = self.rows.setdefault(name, {"read": 0, "written": 0})
+            r["read"] += read
+            r["written"] += out
+
+    def _service(self, service: str) -> Dict[str, Any]:
+        return self.calls.setdefault(service, {"count": 0, "errors": 0, "retries": 0, "total_s": 0.0, "max_s": 0.0,
+                                               "errors_by_type": {}, "hist": [0] * (len(BUCKETS_MS) + 1)})
+
+    def add_call(self, service: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            c = self._service(service)
+            c["count"] += 1
+            c["total_s"] += seconds
+            c["max_s"] = max(c["max_s"], seconds)
+            c["hist"][bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+            if error:
+                c["errors"] += 1
+                c["errors_by_type"][error] = c["errors_by_type"].get(error, 0) + 1
+
+    def add_retry(self, service: str):
+        with self._lock:
+            self._service(service)["retries"] += 1
+
+    def add_tokens(self, model: str, prompt: int = 0, completion: int = 0):
+        with self._lock:
+            t = self.tokens.setdefault(model, {"prompt": 0, "completion": 0})
+            t["prompt"] += int(prompt or 0)
+            t["completion"] += int(completion or 0)
+
+    def add_cache(self, name: str, hits: int = 0, misses: int = 0):
+        with self._lock:
+            c = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            c["hits"] += hits
+            c["misses"] += misses
+
+    def add_count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = {}
+        for k, c in self.calls.items():
+            calls[k] = {**c, "total_s": round(c["total_s"], 4), "max_s": round(c["max_s"], 4),
+                        "mean_ms": round(1000 * c["total_s"] / c["count"], 2) if c["count"] else None,
+                        "p50_ms": quantile_ms(c["hist"], 0.5), "p95_ms": quantile_ms(c["hist"], 0.95)}
+        return {"stage": self.stage, "started": self.started.isoformat(), "error": self.error,
+                "phases": {k: {**v, "wall_s": round(v["wall_s"], 4), "cpu_s": round(v["cpu_s"], 4)} for k, v in self.phases.items()},
+                "rows": self.rows, "calls": calls, "buckets_ms": BUCKETS_MS, "tokens": self.tokens,
+                "cache": self.cache, "counters": self.counters}
+
+    def write(self, root: str = METRICS_DIR) -> str:
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, f"{self.stage}_{self.started.strftime('%Y%m%dT%H%M%S%fZ')}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(path + ".tmp", path)
+        for old in sorted(glob.glob(os.path.join(root, f"{self.stage}_*.json")))[:-KEEP]:
+            os.remove(old)
+        return path
+
+def quantile_ms(hist: List[int], q: float) -> Optional[float]:
+    """Upper bound of the histogram bucket holding the q-quantile (None past the last bucket)."""
+    n = sum(hist)
+    if not n:
+        return None
+    seen = 0
+    for i, c in enumerate(hist):
+        seen += c
+        if seen >= q * n:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+    return None
+
+_current = Run("adhoc")
+
+def current() -> Run:
+    return _current
+
+def phase(name: str):
+    return _current.phase(name)
+
+def rows(name: str, read: int = 0, out: int = 0):
+    _current.add_rows(name, read, out)
+
+def call(service: str, seconds: float, error: Optional[str] = None):
+    _current.add_call(service, seconds, error)
+
+@contextmanager
+def timed(service: str):
+    """Record the enclosed request as one call to service, with the exception type if it raises."""
+    t = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        _current.add_call(service, time.perf_counter() - t, type(e).__name__)
+        raise
+    _current.add_call(service, time.perf_counter() - t)
+
+def retry(service: str):
+    _current.add_retry(service)
+
+def tokens(model: str, prompt: int = 0, completion: int = 0):
+    _current.add_tokens(model, prompt, completion)
+
+def cache(name: str, hits: int = 0, misses: int = 0):
+    _current.add_cache(name, hits, misses)
+
+def count(name: str, n: int = 1):
+    _current.add_count(name, n)
+
+def instrument(stage: str):
+    """Decorator for a stage's main: run it under a fresh Run, timed as phase "total", and
+    write the metrics file however it exits."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            global _current
+            prev, _current = _current, Run(stage)
+            try:
+                with _current.phase("total"):
+                    return fn(*args, **kwargs)
+            except BaseException as e:
+                if not (isinstance(e, SystemExit) and not e.code):
+                    _current.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                try:
+                    print(f"Metrics -> {_current.write()}")
+                finally:
+                    _current = prev
+        return run
+    return wrap
+
+def load_runs(root: str = METRICS_DIR) -> List[Dict[str, Any]]:
+    """Every metrics file under root, oldest first."""
+    out = []
+    for path in sorted(glob.glob(os.path.join(root, "*.json")), key=os.path.getmtime):
+        with open(path, "r", encoding="utf-8") as f:
+            out.append({**json.load(f), "path": path})
+    return out
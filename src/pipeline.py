@@ -0,0 +1,212 @@
+import argparse, ast, fcntl, functools, hashlib, json, os, runpy, sys, time, traceback
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional, Sequence, Tuple
+from .config import DATA_DIR
+from .stages import STAGES, Input, Stage, _data
+from .storage import file_digest, stage_file
+
+# Local runner for the whole pipeline: python -m src.pipeline. Each stage declares the files it
+# reads and writes (src/stages.py); a stage is skipped when the content hash of its inputs, its
+# argv and its code (the module and every src/ml module it imports, transitively) match the
+# last successful run and its outputs are still there. Stages with no
+# file inputs (the scrapers) always run, and downstream stages skip if they wrote the same
+# bytes. Independent branches run in parallel: each stage is a forked child of this process,
+# which has already imported pandas/pyarrow/sklearn/langchain, so a stage doesn't pay for them
+# again. Fingerprints live in data/pipeline_state.json with a size/mtime memo per file, so
+# unchanged inputs aren't re-read.
+
+STATE_PATH = os.path.join(DATA_DIR, "pipeline_state.json")
+PRELOAD = ["pandas", "pyarrow.parquet", "numpy", "sklearn.cluster", "langchain_openai", "langchain_core.prompts", "openai"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_PACKAGES = {"src", "ml"}
+
+def _resolve(inp: Input) -> str:
+    if isinstance(inp, tuple):
+        try:
+            return stage_file(list(inp))
+        except FileNotFoundError:
+            return _data(f"{inp[0]}.parquet")
+    return inp
+
+def _module_path(module: str) -> Optional[str]:
+    path = os.path.join(ROOT, *module.split(".")) + ".py"
+    return path if module.split(".")[0] in LOCAL_PACKAGES and os.path.exists(path) else None
+
+@functools.lru_cache(maxsize=None)
+def _imports(path: str, mtime_ns: int) -> Tuple[str, ...]:
+    """Local modules path imports anywhere in it (function-level imports too)."""
+    package = os.path.basename(os.path.dirname(path))
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found += [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = package if node.level else ""
+            base = ".".join(p for p in (base, node.module or "") if p)
+            found += [base] + [f"{base}.{a.name}" for a in node.names]  # `from . import metrics`
+    return tuple(m for m in found if _module_path(m))
+
+def code_files(module: str) -> List[str]:
+    """The stage module's file and every local module file it imports, transitively."""
+    seen, todo = {}, [module]
+    while todo:
+        path = _module_path(todo.pop())
+        if path and path not in seen:
+            seen[path] = True
+            todo.extend(_imports(path, os.stat(path).st_mtime_ns))
+    return sorted(seen)
+
+def fingerprint(stage: Stage, memo: Dict[str, list]) -> str:
+    code = {os.path.relpath(p, ROOT): file_digest(p, memo) for p in code_files(stage.module)}
+    parts = {"argv": stage.argv, "code": code, "key": stage.key() if stage.key else None,
+             "inputs": {os.path.relpath(p, ROOT): file_digest(p, memo) for p in map(_resolve, stage.inputs)}}
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def load_state(path: str = STATE_PATH) -> Dict:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+def save_state(update: Dict, path: str = STATE_PATH):
+    """Merge this run's fingerprints and file memo into the state file (other runs may have
+    written it since, e.g. parallel Airflow tasks), under an flock, then atomically replace it."""
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = load_state(path)
+        state["stages"].update(update["stages"])
+        state["files"].update(update["files"])
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+def _run_child(module: str, argv: List[str], conn):
+    sys.argv = [module] + argv
+    sys.modules.pop(module, None)  # imported by this runner (src.storage): run it afresh as __main__
+    code = 0
+    try:
+        runpy.run_module(module, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
+        code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush(); sys.stderr.flush()
+    conn.send((code, time.process_time()))
+    conn.close()
+
+def preload():
+    for m in PRELOAD:
+        try:
+            __import__(m)
+        except ImportError:
+            pass
+
+def upstream(stage: Stage, by_name: Dict[str, Stage]) -> set:
+    """Names of every stage `stage` transitively comes after."""
+    out, todo = set(), list(stage.after)
+    while todo:
+        d = todo.pop()
+        if d not in out:
+            out.add(d)
+            todo.extend(by_name[d].after if d in by_name else [])
+    return out
+
+def run(stages: List[Stage], jobs: int = 4, force: Sequence[str] = (), dry_run: bool = False) -> List[Dict]:
+    """Run stages in dependency order, up to `jobs` at once. Upstream stages left out of `stages`
+    count as done. Returns one report row per stage: status ran/skipped/failed/blocked, wall and
+    CPU seconds."""
+    names = {s.name for s in stages}
+    by_name = {**{s.name: s for s in STAGES}, **{s.name: s for s in stages}}
+    deps_of = {s.name: upstream(s, by_name) & names for s in stages}
+    state = load_state()
+    memo = state["files"]
+    pending = {s.name: s for s in stages}
+    status: Dict[str, str] = {}
+    report: Dict[str, Dict] = {}
+    running: Dict = {}
+    ctx = mp.get_context("fork")
+    t_all = time.perf_counter()
+
+    def ready(s: Stage) -> Optional[bool]:
+        deps = [status.get(d) for d in deps_of[s.name]]
+        if any(d in ("failed", "blocked") for d in deps):
+            return None
+        return all(d in ("ran", "skipped") for d in deps)
+
+    while pending or running:
+        for s in list(pending.values()):
+            if len(running) >= jobs:
+                break
+            r = ready(s)
+            if r is None:
+                status[s.name] = "blocked"; report[s.name] = {"stage": s.name, "status": "blocked"}
+                del pending[s.name]
+            elif r:
+                del pending[s.name]
+                fp = fingerprint(s, memo) if s.inputs else None
+                fresh = fp is not None and state["stages"].get(s.name) == fp and all(map(os.path.exists, s.outputs))
+                if fresh and s.name not in force and "all" not in force:
+                    status[s.name] = "skipped"; report[s.name] = {"stage": s.name, "status": "skipped"}
+                    print(f"[pipeline] {s.name}: inputs unchanged, skipped")
+                elif dry_run:
+                    status[s.name] = "ran"; report[s.name] = {"stage": s.name, "status": "would run"}
+                else:
+                    print(f"[pipeline] {s.name}: python -m {s.module} {' '.join(s.argv)}".rstrip())
+                    recv, send = ctx.Pipe(duplex=False)
+                    p = ctx.Process(target=_run_child, args=(s.module, s.argv, send), name=s.name)
+                    sys.stdout.flush(); sys.stderr.flush()
+                    p.start(); send.close()
+                    running[p.sentinel] = (s, p, recv, fp, time.perf_counter())
+        if not running:
+            if pending and not any(ready(s) is not False for s in pending.values()):
+                break  # unreachable: after-cycle
+            continue
+        for sentinel in wait(list(running)):
+            s, p, recv, fp, t0 = running.pop(sentinel)
+            p.join()
+            code, cpu = recv.recv() if recv.poll() else (p.exitcode or 1, None)
+            ok = code == 0
+            status[s.name] = "ran" if ok else "failed"
+            report[s.name] = {"stage": s.name, "status": status[s.name], "wall_s": round(time.perf_counter() - t0, 2),
+                              "cpu_s": None if cpu is None else round(cpu, 2)}
+            if ok and s.inputs:
+                state["stages"][s.name] = fp
+            print(f"[pipeline] {s.name}: {status[s.name]} in {report[s.name]['wall_s']}s")
+    if not dry_run:
+        save_state(state)
+    rows = [report.get(s.name, {"stage": s.name, "status": "blocked"}) for s in stages]
+    rows.append({"stage": "total", "status": "", "wall_s": round(time.perf_counter() - t_all, 2),
+                 "cpu_s": round(sum(r.get("cpu_s") or 0 for r in rows), 2)})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the pipeline locally, skipping stages whose inputs are unchanged.")
+    ap.add_argument("--stages", nargs="+", metavar="STAGE", choices=[s.name for s in STAGES],
+                    help="run only these (their upstream stages are assumed done)")
+    ap.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="run these even if unchanged ('all' for every stage)")
+    ap.add_argument("--jobs", type=int, default=4, help="stages run at once")
+    ap.add_argument("--dry_run", action="store_true", help="print what would run without running it")
+    ap.add_argument("--report", type=str, default=None, help="also write the timing report as JSON")
+    args = ap.parse_args()
+
+    stages = [s for s in STAGES if not args.stages or s.name in args.stages]
+    preload()
+    rows = run(stages, args.jobs, args.force, args.dry_run)
+    print(f"\n{'stage':<22}{'status':<11}{'wall_s':>9}{'cpu_s':>9}")
+    for r in rows:
+        fmt = lambda v: "" if v is None else f"{v:.2f}"
+        print(f"{r['stage']:<22}{r['status']:<11}{fmt(r.get('wall_s')):>9}{fmt(r.get('cpu_s')):>9}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    if any(r["status"] == "failed" for r in rows):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse, json, os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np, pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from . import metrics
+from .config import DATA_DIR
+
+# Local pre-filter for llm_pipeline --prefilter: most comments ("thanks!", "+1", "Following")
+# name no restaurant, yet each one costs prompt tokens. A comment is kept if it contains a name
+# we already know (the gazetteer: the names in the training extraction) or if a small logistic
+# regression over hashed word and character n-grams scores it at or above a threshold. The
+# model is trained on past extraction results (python -m src.prefilter --train): a comment is
+# positive when a name the LLM extracted from its thread appears in it. The threshold is set on
+# held-out comments to keep --recall of the positives. Hashing needs no vocabulary, so the
+# saved model is just the weights, the threshold and the names, in data/prefilter.npz. Train on
+# an extraction run without --prefilter: names that only appear in comments it dropped were
+# never extracted, so a filtered run would teach the model that those comments are negatives.
+# For the same reason the gazetteer is fixed at training time rather than read from the
+# (filtered) stage outputs.
+
+MODEL_PATH = os.path.join(DATA_DIR, "prefilter.npz")
+N_FEATURES = 2 ** 18
+# lowercased words for content; case-kept character n-grams catch capitalised names ("Xo Noodle")
+WORDS = HashingVectorizer(n_features=N_FEATURES, ngram_range=(1, 2), alternate_sign=False)
+CHARS = HashingVectorizer(n_features=N_FEATURES, analyzer="char_wb", ngram_range=(3, 4), lowercase=False, alternate_sign=False)
+MAX_NAME_WORDS = 5
+
+def _norm(texts: pd.Series) -> pd.Series:
+    return texts.fillna("").astype(str).str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+class Gazetteer:
+    """Exact matcher for known restaurant names, on lowercased alphanumeric words: one sparse
+    n-gram transform over all texts rather than a regex per name."""
+
+    def __init__(self, names: Iterable[str]):
+        norm = _norm(pd.Series(list(names), dtype=object)).unique()
+        self.names = sorted(n for n in norm if len(n) >= 3 and n not in ENGLISH_STOP_WORDS and n.count(" ") < MAX_NAME_WORDS)
+        self.vec = None
+        if self.names:
+            longest = max(n.count(" ") + 1 for n in self.names)
+            self.vec = CountVectorizer(vocabulary=self.names, ngram_range=(1, longest), token_pattern=r"[a-z0-9]+",
+                                       lowercase=False, binary=True)
+
+    def hits(self, texts: pd.Series) -> np.ndarray:
+        if self.vec is None:
+            return np.zeros(len(texts), dtype=bool)
+        return self.vec.transform(_norm(texts)).getnnz(axis=1) > 0
+
+def features(texts: pd.Series) -> sparse.csr_matrix:
+    texts = texts.fillna("").astype(str)
+    caps = texts.str.count(r"\b[A-Z][a-z]+").to_numpy(dtype=np.float64)
+    dense = np.column_stack([np.log1p(caps), np.log1p(texts.str.len().to_numpy(dtype=np.float64)) / 5])
+    return sparse.hstack([WORDS.transform(texts), CHARS.transform(texts), sparse.csr_matrix(dense)], format="csr")
+
+class Prefilter:
+    def __init__(self, coef: np.ndarray, intercept: float, threshold: float, names: Iterable[str] = ()):
+        self.coef, self.intercept, self.threshold = np.asarray(coef, dtype=np.float64), float(intercept), float(threshold)
+        self.gazetteer = Gazetteer(names)
+
+    def model_scores(self, texts: pd.Series) -> np.ndarray:
+        return 1 / (1 + np.exp(-(features(texts) @ self.coef + self.intercept)))
+
+    def scores(self, texts: pd.Series) -> np.ndarray:
+        """P(comment names a restaurant); 1.0 for gazetteer hits."""
+        return np.where(self.gazetteer.hits(texts), 1.0, self.model_scores(texts))
+
+    def keep(self, texts: pd.Series, threshold: Optional[float] = None) -> np.ndarray:
+        return self.scores(texts) >= (self.threshold if threshold is None else threshold)
+
+    def save(self, path: str = MODEL_PATH):
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, coef=self.coef, intercept=self.intercept, threshold=self.threshold,
+                                names=np.array(self.gazetteer.names, dtype=str))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH, names: Iterable[str] = ()) -> "Prefilter":
+        """Load a trained model; names, if any, are added to the saved gazetteer."""
+        data = np.load(path)
+        return cls(data["coef"], data["intercept"], data["threshold"], list(data["names"]) + list(names))
+
+    @classmethod
+    def fit(cls, texts: pd.Series, labels: np.ndarray, names: Iterable[str] = (), recall: float = 0.98,
+            holdout: float = 0.2, seed: int = 0) -> Tuple["Prefilter", Dict[str, Any]]:
+        """Train on all but `holdout` of the comments and set the threshold on the rest so the
+        model alone keeps `recall` of held-out positives; the gazetteer only adds to that. The
+        names usually come from the same extraction as the labels, so the held-out report is
+        for the model without them."""
+        labels = np.asarray(labels, dtype=bool)
+        test = np.random.default_rng(seed).random(len(texts)) < holdout
+        X = features(texts)
+        clf = LogisticRegression(C=4.0, max_iter=1000, class_weight="balanced").fit(X[~test], labels[~test])
+        model = cls(clf.coef_.ravel(), clf.intercept_[0], 0.5)
+        held = texts[test].reset_index(drop=True)
+        pos = np.sort(model.model_scores(held)[labels[test]])
+        # the score of the positive at the (1 - recall) quantile: everything from it up is kept
+        if len(pos):
+            model.threshold = float(pos[int(np.floor((1 - recall) * len(pos)))])
+        return cls(model.coef, model.intercept, model.threshold, names), evaluate(model, held, labels[test])
+
+def evaluate(pf: Prefilter, texts: pd.Series, labels: np.ndarray, threshold: Optional[float] = None) -> Dict[str, Any]:
+    keep = pf.keep(texts, threshold)
+    labels = np.asarray(labels, dtype=bool)
+    chars = texts.fillna("").astype(str).str.len().to_numpy()
+    return {"comments": int(len(texts)), "positives": int(labels.sum()), "threshold": round(pf.threshold if threshold is None else threshold, 4),
+            "recall": round(float(keep[labels].mean()), 4) if labels.any() else None,
+            "comments_removed": round(float(1 - keep.mean()), 4) if len(keep) else 0.0,
+            "chars_removed": round(float(1 - chars[keep].sum() / max(chars.sum(), 1)), 4)}
+
+def comment_frame(posts: List[Dict[str, Any]]) -> pd.DataFrame:
+    rows = [(i, j, c.get("body") or "") for i, p in enumerate(posts) for j, c in enumerate(p.get("comments") or [])]
+    return pd.DataFrame(rows, columns=["post", "comment", "body"]).astype({"post": "int64", "comment": "int64", "body": object})
+
+def label_comments(posts: List[Dict[str, Any]], mentions: pd.DataFrame) -> pd.DataFrame:
+    """comment_frame(posts) plus `label`: the comment contains (case-insensitively) a name the
+    LLM extracted from its thread."""
+    names: Dict[Any, List[str]] = {}
+    for pid, name in zip(mentions["post_id"], mentions["name"]):
+        if isinstance(name, str) and len(name.strip()) >= 3:
+            names.setdefault(pid, []).append(name.strip().lower())
+    df = comment_frame(posts)
+    ids = [p.get("id") for p in posts]
+    df["label"] = [any(n in body.lower() for n in names.get(ids[i], ())) for i, body in zip(df["post"], df["body"])]
+    return df
+
+def filter_posts(posts: List[Dict[str, Any]], pf: Prefilter, threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """posts with the comments pf drops removed; one vectorised scoring pass over every comment."""
+    df = comment_frame(posts)
+    keep = pf.keep(df["body"], threshold) if len(df) else np.zeros(0, dtype=bool)
+    metrics.rows("prefilter_comments", read=len(df), out=int(keep.sum()))
+    kept: Dict[int, List[int]] = {}
+    for i, j in zip(df["post"][keep], df["comment"][keep]):
+        kept.setdefault(i, []).append(j)
+    comments = [p.get("comments") or [] for p in posts]
+    return [{**p, "comments": [comments[i][j] for j in kept.get(i, [])]} for i, p in enumerate(posts)]
+
+def main():
+    ap = argparse.ArgumentParser(description="Train or evaluate the llm_pipeline comment pre-filter.")
+    ap.add_argument("--train", action="store_true", help="fit on raw_threads.jsonl + mentions_raw.jsonl (from a run without --prefilter) and save the model")
+    ap.add_argument("--recall", type=float, default=0.98, help="share of comments with a restaurant the threshold keeps")
+    ap.add_argument("--threshold", type=float, default=None, help="evaluate at this score instead of the saved threshold")
+    ap.add_argument("--raw_path", type=str, default=os.path.join(DATA_DIR, "raw_threads.jsonl"))
+    ap.add_argument("--mentions_path", type=str, default=os.path.join(DATA_DIR, "mentions_raw.jsonl"))
+    args = ap.parse_args()
+
+    from .llm_pipeline import read_threads
+    posts = read_threads(args.raw_path)
+    mentions = pd.read_json(args.mentions_path, lines=True)
+    df = label_comments(posts, mentions)
+    if args.train:
+        names = mentions["name"].dropna().astype(str) if "name" in mentions else []
+        pf, report = Prefilter.fit(df["body"], df["label"].to_numpy(), names, args.recall)
+        pf.save()
+        print(f"Saved prefilter -> {MODEL_PATH} (held-out comments)")
+    else:
+        pf = Prefilter.load()
+        report = evaluate(pf, df["body"], df["label"].to_numpy(), args.threshold)
+    print(json.dumps(report))
+
+if __name__ == "__main__":
+    main()
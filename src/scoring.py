@@ -0,0 +1,105 @@
+import argparse, datetime as dt, json, math, os
+from typing import Any, Dict, Optional
+import numpy as np, pandas as pd
+
+# Exponentially decayed mention counts, maintained per restaurant in O(1) per mention.
+# Forward decay: a mention at time t contributes 2^((t - EPOCH) / h) and the decayed count as of
+# T is that sum times 2^(-(T - EPOCH) / h), so adding a mention never touches the others and the
+# count can be read at any T after the last mention. Sums are kept as log2 (logaddexp2) so short
+# half-lives don't overflow. Each restaurant also keeps per-UTC-day buckets of (count, log2 sum)
+# for point-in-time reads: scores as of the end of any past day.
+
+EPOCH = pd.Timestamp("2020-01-01", tz="UTC")
+DAY = pd.Timedelta(days=1)
+
+def epoch_days(ts) -> float:
+    """Days since EPOCH for one timestamp (naive = UTC); NaN if it doesn't parse."""
+    try:
+        t = dt.datetime.fromisoformat(str(ts))
+    except ValueError:
+        t = pd.to_datetime(ts, utc=True, errors="coerce")
+        if pd.isna(t):
+            return math.nan
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=dt.timezone.utc)
+    return (t - EPOCH).total_seconds() / 86400
+
+def exponent(ts, half_life_days: float) -> np.ndarray:
+    """log2 of each mention's forward-decay weight; NaN where ts doesn't parse."""
+    t = pd.to_datetime(pd.Series(ts, dtype=object), utc=True, errors="coerce", format="mixed")
+    return ((t - EPOCH) / DAY / max(half_life_days, 1)).to_numpy("float64", na_value=np.nan)
+
+def _lae(a: Optional[float], b: float) -> float:
+    if a is None:
+        return b
+    hi, lo = max(a, b), min(a, b)
+    return hi + math.log2(1 + 2 ** (lo - hi))
+
+def fold(c: Dict[str, Any], ts, half_life_days: float):
+    """Add one mention at ts to a restaurant record (a dedupe_state cluster): O(1)."""
+    d = epoch_days(ts)
+    if math.isnan(d):
+        return
+    x = d / max(half_life_days, 1)
+    c["log_fwd"] = _lae(c.get("log_fwd"), x)
+    b = c.setdefault("days", {}).setdefault(str(math.floor(d)), [0, None])
+    b[0] += 1
+    b[1] = _lae(b[1], x)
+
+def decayed(log_fwd, as_of, half_life_days: float) -> np.ndarray:
+    """Decayed count as of `as_of` from log2 forward sums (NaN/None -> 0)."""
+    lf = np.asarray(pd.Series(log_fwd, dtype="float64"))
+    return np.nan_to_num(np.exp2(lf - exponent([as_of], half_life_days)[0]))
+
+def group_log_fwd(keys, ts, half_life_days: float) -> pd.Series:
+    """Vectorised log2 forward sum per key, the batch equivalent of repeated fold()."""
+    x = pd.Series(exponent(ts, half_life_days), index=pd.Index(keys, name="key")).dropna()
+    m = x.groupby(level=0).max()
+    return m + np.log2(np.exp2(x - m.reindex(x.index).to_numpy()).groupby(level=0).sum())
+
+def score_columns(mentions, decayed_count) -> pd.DataFrame:
+    """score_buzz = mentions; score_trend = the recent share of them (decayed / mentions, 1.0
+    when every mention is from right now); score_total = mentions + decayed mentions."""
+    mentions = pd.Series(mentions, dtype="float64").reset_index(drop=True)
+    dec = pd.Series(decayed_count, dtype="float64").reset_index(drop=True)
+    trend = (dec / mentions.where(mentions > 0)).fillna(0.0)
+    return pd.DataFrame({"score_decayed": dec, "score_buzz": mentions, "score_trend": trend,
+                         "score_total": mentions * (1 + trend)})
+
+def as_of_frame(state: Dict[str, Any], as_of: dt.date) -> pd.DataFrame:
+    """Per-cluster mentions and decayed count using only mentions up to the end of `as_of` (UTC)."""
+    h = state["half_life_days"]
+    cutoff = (pd.Timestamp(as_of, tz="UTC") + DAY - EPOCH) // DAY
+    rows = []
+    for c in state["clusters"]:
+        n, lf, days = 0, None, []
+        for day, (count, x) in c.get("days", {}).items():
+            if int(day) < cutoff:
+                n, lf = n + count, _lae(lf, x)
+                days.append(int(day))
+        rows.append((n, lf, min(days) if days else None, max(days) if days else None))
+    out = pd.DataFrame(rows, columns=["mentions", "log_fwd", "first_day", "last_day"])
+    end = pd.Timestamp(as_of, tz="UTC") + DAY
+    out["score_decayed"] = decayed(out["log_fwd"], end, h)
+    for col in ("first_day", "last_day"):
+        out[col] = EPOCH + pd.to_timedelta(out[col], unit="D")
+    return out.drop(columns="log_fwd")
+
+def main():
+    from .dedupe_state import STATE_PATH, state_frame
+    ap = argparse.ArgumentParser(description="Restaurant scores as of a past date, from the incremental dedupe state.")
+    ap.add_argument("--as_of", type=dt.date.fromisoformat, required=True, help="YYYY-MM-DD (end of day, UTC)")
+    ap.add_argument("--top", type=int, default=20)
+    args = ap.parse_args()
+    if not os.path.exists(STATE_PATH):
+        raise SystemExit("No dedupe state; run python -m src.dedupe_and_score --incremental first.")
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    snap = as_of_frame(state, args.as_of)
+    df = pd.concat([state_frame(state)[["name", "neighborhood", "cuisine"]], snap[["first_day", "last_day"]],
+                    score_columns(snap["mentions"], snap["score_decayed"])], axis=1)
+    df = df[df["score_buzz"] > 0].sort_values("score_total", ascending=False)
+    print(df.head(args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
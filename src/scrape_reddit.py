@@ -1,69 +1,218 @@
-import argparse, json, time, os
+import argparse, json, time, os, threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from tqdm import tqdm
 import praw
+from . import metrics
 from .config import DATA_DIR, REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT
 
+RAW_PATH = os.path.join(DATA_DIR, "raw_threads.jsonl")
+STATE_PATH = os.path.join(DATA_DIR, "scrape_state.json")
+
 def utcnow():
     return datetime.now(timezone.utc)
 
-def scrape(subreddits: List[str], days_back: int, max_posts: int, query: str) -> List[Dict[str, Any]]:
-    reddit = praw.Reddit(
+def make_reddit():
+    return praw.Reddit(
         client_id=REDDIT_CLIENT_ID,
         client_secret=REDDIT_CLIENT_SECRET,
         user_agent=REDDIT_USER_AGENT,
     )
+
+class Throttle:
+    """At most rpm calls per minute across threads (Reddit allows ~100/min per OAuth client)."""
+
+    def __init__(self, rpm: Optional[float] = None):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self.next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self.next, now)
+            self.next = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+def thread_record(post, sub: str, comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "id": post.id,
+        "title": post.title,
+        "selftext": post.selftext,
+        "permalink": "https://www.reddit.com" + post.permalink,
+        "url": post.url,
+        "score": post.score,
+        "num_comments": post.num_comments,
+        "created_utc": post.created_utc,
+        "subreddit": sub,
+        "comments": comments,
+    }
+
+def fetch_comments(submission) -> List[Dict[str, Any]]:
+    submission.comments.replace_more(limit=0)
+    comments = []
+    for c in submission.comments.list():
+        comments.append({
+            "id": c.id,
+            "parent_id": c.parent_id,
+            "body": c.body,
+            "score": c.score,
+            "created_utc": c.created_utc,
+        })
+    return comments
+
+def fetch_threads(posts: Iterable[Tuple[Any, str]], reddit_factory: Callable, workers: int = 4,
+                  rpm: Optional[float] = 90) -> Iterator[Dict[str, Any]]:
+    """Comment trees for (post, subreddit) pairs, `workers` posts at a time, yielded in input order.
+    Each worker thread gets its own Reddit instance (PRAW instances aren't thread-safe); the
+    Throttle keeps the combined request rate under rpm."""
+    local, throttle = threading.local(), Throttle(rpm)
+
+    def one(item):
+        post, sub = item
+        if not hasattr(local, "reddit"):
+            local.reddit = reddit_factory()
+        throttle.wait()
+        with metrics.timed("reddit.comments"):
+            comments = fetch_comments(local.reddit.submission(id=post.id))
+        return thread_record(post, sub, comments)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        yield from pool.map(one, posts)
+
+def scrape(subreddits: List[str], days_back: int, max_posts: int, query: str, reddit_factory: Callable = make_reddit,
+           workers: int = 4, rpm: Optional[float] = 90) -> List[Dict[str, Any]]:
+    reddit = reddit_factory()
     since = utcnow() - timedelta(days=days_back)
-    results = []
+    posts = []
 
     for sub in subreddits:
         sr = reddit.subreddit(sub.strip("r/"))
         for post in tqdm(sr.search(query=query, sort="new", time_filter="month"), desc=f"Searching {sub}"):
-            if len(results) >= max_posts:
+            if len(posts) >= max_posts:
                 break
             created = datetime.fromtimestamp(post.created_utc, tz=timezone.utc)
             if created < since:
                 continue
+            posts.append((post, sub))
+    return list(tqdm(fetch_threads(posts, reddit_factory, workers, rpm), total=len(posts), desc="Fetching comments"))
+
+def load_state(path: str = STATE_PATH) -> Dict[str, Any]:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"version": 1, "subreddits": {}, "seen": {}}
+
+def save_state(state: Dict[str, Any], path: str = STATE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def _trim_partial_line(path: str):
+    """Drop a half-written last line left by a run killed mid-write."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return
+        f.seek(0)
+        data = f.read()
+        f.truncate(data.rfind(b"\n") + 1)
+
+def scrape_incremental(subreddits: List[str], days_back: int, max_posts: int, query: str, out_path: str = RAW_PATH,
+                       state_path: str = STATE_PATH, refresh_days: float = 3, reddit_factory: Callable = make_reddit,
+                       workers: int = 4, rpm: Optional[float] = 90, checkpoint_every: int = 20) -> Dict[str, int]:
+    """Append new threads, and threads whose comment count grew, to out_path.
+
+    Per subreddit, the listing is walked newest-first down to the high-water mark (newest post
+    of the last completed pass) minus refresh_days, so recent threads are re-checked for new
+    comments. seen maps post id -> num_comments as last written. Every thread is flushed to
+    out_path as it arrives and the state is checkpointed every checkpoint_every threads, so a
+    killed run resumes by skipping what it already wrote. A thread may be appended more than
+    once (updated, or written just before a crash); llm_pipeline keeps the last copy."""
+    state = load_state(state_path)
+    reddit = reddit_factory()
+    since = (utcnow() - timedelta(days=days_back)).timestamp()
+    stats = {"listed": 0, "new": 0, "updated": 0, "unchanged": 0}
+    todo: List[Tuple[Any, str]] = []
+    newest: Dict[str, float] = {}
+    capped = set()
+
+    for sub in subreddits:
+        hwm = state["subreddits"].get(sub, {}).get("hwm")
+        floor = max(since, hwm - refresh_days * 86400) if hwm else since
+        sr = reddit.subreddit(sub.strip("r/"))
+        for post in tqdm(sr.search(query=query, sort="new", time_filter="month"), desc=f"Searching {sub}"):
+            if post.created_utc < floor:
+                break  # sorted newest-first: everything further down is older
+            stats["listed"] += 1
+            newest[sub] = max(newest.get(sub, 0.0), post.created_utc)
+            seen = state["seen"].get(post.id)
+            if seen is not None and seen["num_comments"] >= post.num_comments:
+                stats["unchanged"] += 1
+                continue
+            if len(todo) >= max_posts:
+                capped.add(sub)
+                break
+            stats["updated" if seen is not None else "new"] += 1
+            todo.append((post, sub))
 
-            post.comments.replace_more(limit=0)
-            comments = []
-            for c in post.comments.list():
-                comments.append({
-                    "id": c.id,
-                    "parent_id": c.parent_id,
-                    "body": c.body,
-                    "score": c.score,
-                    "created_utc": c.created_utc,
-                })
-
-            results.append({
-                "id": post.id,
-                "title": post.title,
-                "selftext": post.selftext,
-                "permalink": "https://www.reddit.com" + post.permalink,
-                "url": post.url,
-                "score": post.score,
-                "num_comments": post.num_comments,
-                "created_utc": post.created_utc,
-                "subreddit": sub,
-                "comments": comments,
-            })
-    return results
+    written = 0
+    _trim_partial_line(out_path)
+    try:
+        with open(out_path, "a", encoding="utf-8") as f:
+            for row in tqdm(fetch_threads(todo, reddit_factory, workers, rpm), total=len(todo), desc="Fetching comments"):
+                f.write(json.dumps(row) + "\n")
+                f.flush()
+                state["seen"][row["id"]] = {"num_comments": row["num_comments"], "created_utc": row["created_utc"]}
+                written += 1
+                if written % checkpoint_every == 0:
+                    save_state(state, state_path)
+        # only a fully fetched subreddit may move its high-water mark
+        for sub, ts in newest.items():
+            if sub not in capped:
+                prev = state["subreddits"].get(sub, {}).get("hwm") or 0.0
+                state["subreddits"][sub] = {"hwm": max(prev, ts), "last_run": utcnow().isoformat()}
+        # forget posts that have aged out of the lookback window
+        state["seen"] = {k: v for k, v in state["seen"].items() if v["created_utc"] >= since}
+    finally:
+        save_state(state, state_path)
+    stats["written"] = written
+    return stats
 
+@metrics.instrument("scrape_reddit")
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--subreddits", nargs="+", required=True)
     ap.add_argument("--days_back", type=int, default=60)
     ap.add_argument("--max_posts", type=int, default=200)
     ap.add_argument("--query", type=str, default="restaurant OR opening OR recommend OR eats OR best")
+    ap.add_argument("--workers", type=int, default=4, help="posts whose comment trees are fetched at once")
+    ap.add_argument("--rpm", type=float, default=90, help="comment fetches per minute across workers (0 = unlimited)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="append only new/updated threads, tracked in data/scrape_state.json; resumes after a crash")
+    ap.add_argument("--refresh_days", type=float, default=3, help="--incremental: re-check threads this recent for new comments")
     args = ap.parse_args()
 
-    data = scrape(args.subreddits, args.days_back, args.max_posts, args.query)
-    out_path = os.path.join(DATA_DIR, "raw_threads.jsonl")
+    out_path = RAW_PATH
+    if args.incremental:
+        stats = scrape_incremental(args.subreddits, args.days_back, args.max_posts, args.query, out_path,
+                                   refresh_days=args.refresh_days, workers=args.workers, rpm=args.rpm)
+        metrics.rows("raw_threads", out=stats["written"])
+        print(f"Appended {stats['written']} threads ({stats['new']} new, {stats['updated']} updated, "
+              f"{stats['unchanged']} unchanged) -> {out_path}")
+        return
+
+    data = scrape(args.subreddits, args.days_back, args.max_posts, args.query, workers=args.workers, rpm=args.rpm)
     with open(out_path, "w", encoding="utf-8") as f:
         for row in data:
             f.write(json.dumps(row) + "\n")
+    metrics.rows("raw_threads", out=len(data))
     print(f"Wrote {len(data)} threads -> {out_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import datetime as dt, os
+from typing import Sequence, Tuple, Union
+from .config import DATA_DIR, GEOCODER, OUT_DIR
+
+# The pipeline's stages: what each runs, the files it reads and writes and what it comes after.
+# src.pipeline runs them and the Airflow DAG builds one task per stage from STAGES, so this
+# module imports nothing heavier than src.config: parsing the DAG must not load pandas.
+
+# An input is a path, or a tuple of stage names resolved like read_stage (first present file).
+Input = Union[str, Tuple[str, ...]]
+
+class Stage:
+    def __init__(self, name: str, module: str, argv: Sequence[str] = (), inputs: Sequence[Input] = (),
+                 outputs: Sequence[str] = (), after: Sequence[str] = (), key=None):
+        self.name, self.module, self.argv = name, module, list(argv)
+        self.inputs, self.outputs, self.after = list(inputs), list(outputs), list(after)
+        self.key = key  # callable -> str for state outside the files, e.g. the ISO week
+
+def _data(*parts: str) -> str:
+    return os.path.join(DATA_DIR, *parts)
+
+ENHANCED = ("mentions_enhanced", "mentions_clean")
+STAGES = [
+    Stage("scrape_reddit", "src.scrape_reddit",
+          ["--subreddits", "r/LosAngeles", "r/FoodLosAngeles", "r/AskLosAngeles", "--days_back", "45", "--max_posts", "150"],
+          outputs=[_data("raw_threads.jsonl")]),
+    Stage("llm_extract", "src.llm_pipeline", ["--model", "gpt-4o-mini"], [_data("raw_threads.jsonl"), _data("prefilter.npz")],
+          [_data("mentions_raw.jsonl")], ["scrape_reddit"]),
+    Stage("dedupe_and_score", "src.dedupe_and_score", [], [_data("mentions_raw.jsonl")],
+          [_data("mentions_clean.parquet"), _data("name_aliases.json")], ["llm_extract"]),
+    Stage("llm_enhance", "src.llm_enhance", [], [("mentions_clean",)], [_data("mentions_enhanced.parquet")], ["dedupe_and_score"]),
+    Stage("external_sources", "src.sources_external", outputs=[_data("external_merged.parquet")]),
+    Stage("geocode_map", "src.geocode_and_map", ["--provider", GEOCODER], [("mentions_clean",)],
+          [_data("mentions_geocoded.parquet"), os.path.join(OUT_DIR, "la_food_map.html")], ["dedupe_and_score"]),
+    Stage("qna_index", "src.embeddings_and_qna", ["--build"], [ENHANCED],
+          [_data("qna_index.npy"), _data("qna_index_rows.parquet")], ["llm_enhance"]),
+    Stage("cluster_topics", "src.cluster_topics", [], [ENHANCED], [_data("mentions_clustered.parquet")], ["llm_enhance"]),
+    Stage("topic_model", "ml.topic_modeling", [], [_data("mentions_raw.jsonl")], [_data("topic_mixtures.parquet")], ["llm_extract"]),
+    Stage("snapshot_and_movers", "src.trends", [], [ENHANCED], [_data("movers.csv")], ["llm_enhance"],
+          key=lambda: "%d-W%02d" % dt.date.today().isocalendar()[:2]),
+    Stage("load_warehouse", "src.load_warehouse", [], [ENHANCED, _data("mentions_raw.jsonl"), _data("name_aliases.json"), ("external_merged",)],
+          after=["llm_enhance", "external_sources"]),
+    Stage("weekly_digest", "src.weekly_digest", [], [_data("movers.csv"), ("external_merged",)],
+          after=["snapshot_and_movers", "external_sources"]),
+]
@@ -0,0 +1,138 @@
+import argparse, hashlib, os
+from typing import Dict, List, Optional, Sequence, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from . import metrics
+from .config import DATA_DIR
+
+# Typed hand-off between stages. Each stage output (mentions_clean, mentions_enhanced, ...) is
+# one Parquet file under data/ written against SCHEMA: neighborhood/cuisine/sentiment columns
+# are dictionary-encoded (pandas categoricals), first_seen/last_seen are UTC timestamps.
+# read_stage loads only the requested columns and falls back to a legacy CSV of the same
+# stage, coerced to the same dtypes, so old data dirs and the sample data keep working.
+# Set WRITE_CSV=1 (or run `python -m src.storage --export`) for CSV copies.
+
+CATEGORICAL = ["neighborhood", "cuisine", "sentiment", "sentiment_label", "source"]
+TIMESTAMPS = ["first_seen", "last_seen"]
+SCHEMA = {
+    "cluster_id": pa.int64(),
+    "name": pa.string(),
+    "name_norm": pa.string(),
+    "why": pa.string(),
+    "source_url": pa.string(),
+    "signature_dishes": pa.string(),
+    "mentions": pa.int64(),
+    "score_buzz": pa.float64(),
+    "score_trend": pa.float64(),
+    "score_total": pa.float64(),
+    "score_decayed": pa.float64(),
+    "topic_cluster": pa.int64(),
+    "lat": pa.float64(),
+    "lng": pa.float64(),
+    **{c: pa.dictionary(pa.int32(), pa.string()) for c in CATEGORICAL},
+    **{c: pa.timestamp("us", tz="UTC") for c in TIMESTAMPS},
+}
+STAGES = ["mentions_clean", "mentions_enhanced", "mentions_clustered", "mentions_geocoded", "external_merged"]
+WRITE_CSV = os.getenv("WRITE_CSV", "0") == "1"
+
+def stage_path(stage: str, ext: str = "parquet") -> str:
+    return os.path.join(DATA_DIR, f"{stage}.{ext}")
+
+def stage_exists(stage: str) -> bool:
+    return os.path.exists(stage_path(stage)) or os.path.exists(stage_path(stage, "csv"))
+
+def coerce(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the SCHEMA columns present in df to their declared pandas dtypes."""
+    df = df.copy()
+    for c in df.columns:
+        if c in CATEGORICAL:
+            df[c] = df[c].astype(object).where(df[c].notna(), None).astype("category")
+        elif c in TIMESTAMPS:
+            df[c] = pd.to_datetime(df[c], utc=True, errors="coerce", format="mixed")
+        elif c in SCHEMA and pa.types.is_floating(SCHEMA[c]):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+        elif c in SCHEMA and pa.types.is_integer(SCHEMA[c]):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+        elif c in SCHEMA and pa.types.is_string(SCHEMA[c]):
+            df[c] = df[c].astype(object).where(df[c].notna(), None)
+    return df
+
+def to_table(df: pd.DataFrame) -> pa.Table:
+    df = coerce(df)
+    fields = [pa.field(c, SCHEMA[c]) if c in SCHEMA else pa.field(c, pa.Schema.from_pandas(df[[c]], preserve_index=False).field(c).type)
+              for c in df.columns]
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+def write_stage(df: pd.DataFrame, stage: str, csv: Optional[bool] = None) -> str:
+    path = stage_path(stage)
+    metrics.rows(stage, out=len(df))
+    pq.write_table(to_table(df), path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    if csv or (csv is None and WRITE_CSV):
+        export_csv(stage)
+    return path
+
+def export_csv(stage: str) -> str:
+    path = stage_path(stage, "csv")
+    read_stage(stage).to_csv(path, index=False)
+    return path
+
+def _first(stages: Sequence[str]) -> str:
+    for s in stages:
+        if stage_exists(s):
+            return s
+    raise FileNotFoundError(f"none of {', '.join(stages)} found in {DATA_DIR}")
+
+def stage_file(stages: Union[str, Sequence[str]]) -> str:
+    """The file read_stage(stages) would load: Parquet if present, else the legacy CSV."""
+    stage = _first([stages] if isinstance(stages, str) else stages)
+    path = stage_path(stage)
+    return path if os.path.exists(path) else stage_path(stage, "csv")
+
+def file_digest(path: str, memo: Dict[str, list]) -> Optional[str]:
+    """blake2b of a file's bytes (None if missing), reused from memo while size and mtime match."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    hit = memo.get(path)
+    if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+        return hit[2]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    memo[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+    return memo[path][2]
+
+def read_stage(stages: Union[str, Sequence[str]], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """The first stage in `stages` that exists, limited to `columns` (those missing from the file
+    are skipped, so callers can keep using df.get for optional columns)."""
+    path = stage_file(stages)
+    if path.endswith(".parquet"):
+        if columns is not None:
+            have = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in have]
+        df = pq.read_table(path, columns=columns).to_pandas()
+    else:
+        usecols = None if columns is None else (lambda c: c in columns)
+        df = coerce(pd.read_csv(path, usecols=usecols))
+    metrics.rows(os.path.basename(path).rsplit(".", 1)[0], read=len(df))
+    return df
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--export", nargs="*", metavar="STAGE", help="write CSV copies of these stages (default: all present)")
+    ap.add_argument("--convert", action="store_true", help="convert legacy stage CSVs to Parquet")
+    args = ap.parse_args()
+    if args.convert:
+        for s in STAGES:
+            if os.path.exists(stage_path(s, "csv")) and not os.path.exists(stage_path(s)):
+                print(f"{s}.csv -> {write_stage(read_stage(s), s, csv=False)}")
+    if args.export is not None:
+        for s in args.export or [s for s in STAGES if os.path.exists(stage_path(s))]:
+            print(f"{s} -> {export_csv(s)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,134 @@
 import streamlit as st
 import pandas as pd, numpy as np, os, altair as alt
-import folium
-from folium.plugins import HeatMap
 from streamlit.components.v1 import html
-from .config import DATA_DIR, OUT_DIR
+from .config import OUT_DIR
 from .embeddings_and_qna import search as qna_search
+from ml.recommend import recommend as keyword_search
+from .app_data import (MAP_PATH, MIXTURES_PATH, MOVERS_PATH, RAW_PATH, MentionData, file_stamp, mentions_stamp, ops_detail,
+                       ops_summary, read_text, topic_mixtures, weekly_timeline)
+from .metrics import METRICS_DIR, load_runs
+from .map_render import heat_map, map_html
 
 st.set_page_config(page_title="LA Food Scenes", layout="wide")
 st.title("🍴 LA Food Scenes — Reddit + Multi-source")
+MAX_TABLE_ROWS = 2000  # rendering, not filtering, dominates beyond this
 
-def load_df():
-    if os.path.exists(os.path.join(DATA_DIR,"mentions_clustered.csv")):
-        return pd.read_csv(os.path.join(DATA_DIR,"mentions_clustered.csv"))
-    if os.path.exists(os.path.join(DATA_DIR,"mentions_enhanced.csv")):
-        return pd.read_csv(os.path.join(DATA_DIR,"mentions_enhanced.csv"))
-    if os.path.exists(os.path.join(DATA_DIR,"mentions_clean.csv")):
-        return pd.read_csv(os.path.join(DATA_DIR,"mentions_clean.csv"))
-    st.stop()
+# Everything below is keyed on file stamps (mtime, size): reruns reuse the cached objects and
+# a rebuilt file is picked up on the next interaction. cache_resource hands back the same
+# object without copying, so treat these as read-only.
+@st.cache_resource(max_entries=1, show_spinner="Loading mentions...")
+def load_data(stamp) -> MentionData:
+    return MentionData.load()
+
+@st.cache_resource(max_entries=1)
+def load_timeline(stamp):
+    return weekly_timeline(RAW_PATH)
+
+@st.cache_resource(max_entries=4)
+def load_text(stamp):
+    return read_text(stamp[0][0])
+
+@st.cache_resource(max_entries=1)
+def load_movers(stamp):
+    return pd.read_csv(MOVERS_PATH) if os.path.exists(MOVERS_PATH) else None
+
+@st.cache_resource(max_entries=1)
+def load_mixtures(stamp):
+    return topic_mixtures(MIXTURES_PATH)
+
+@st.cache_resource(max_entries=1)
+def load_ops(stamp):
+    return load_runs(METRICS_DIR)
+
+@st.cache_resource(max_entries=1)
+def heatmap_html(stamp):
+    pts = load_data(stamp).points  # binned server-side: one weighted point per ~500m cell
+    return map_html(heat_map(pts[:, 0], pts[:, 1]))
 
-df = load_df()
-tabs = st.tabs(["Explore Map","Trends","Heatmap","Q&A Search","Digest"])
+stamp = mentions_stamp()
+if stamp is None:
+    st.stop()
+data = load_data(stamp)
+tabs = st.tabs(["Explore Map","Trends","Heatmap","Q&A Search","Digest","Ops"])
 
 with tabs[0]:
     with st.sidebar:
         st.header("Filters")
-        cuisines = sorted([c for c in df.get("cuisine", pd.Series()).dropna().unique().tolist() if c])
-        hoods = sorted([h for h in df.get("neighborhood", pd.Series()).dropna().unique().tolist() if h])
-        sel_cuisine = st.multiselect("Cuisine", cuisines)
-        sel_hood = st.multiselect("Neighborhood", hoods)
-        min_buzz = st.slider("Min Buzz", 0, int(df.get("score_buzz", pd.Series([0])).max()), 0)
+        sel_cuisine = st.multiselect("Cuisine", data.options.get("cuisine", []))
+        sel_hood = st.multiselect("Neighborhood", data.options.get("neighborhood", []))
+        min_buzz = st.slider("Min Buzz", 0, max(data.max_buzz, 1), 0)
         must_try_only = st.checkbox("Only 'Must-try'")
 
-    q = df.copy()
-    if sel_cuisine: q = q[q["cuisine"].isin(sel_cuisine)]
-    if sel_hood: q = q[q["neighborhood"].isin(sel_hood)]
-    if "score_buzz" in q.columns: q = q[q["score_buzz"] >= min_buzz]
-    if must_try_only and "sentiment_label" in q.columns: q = q[q["sentiment_label"]=="must-try"]
-
+    q = data.rows(data.select(sel_cuisine, sel_hood, min_buzz, must_try_only))
     st.subheader(f"Results ({len(q)})")
-    st.dataframe(q[["name","neighborhood","cuisine","why","score_buzz","score_trend","score_total","source_url"]].fillna(""))
+    if len(q) > MAX_TABLE_ROWS:
+        st.caption(f"Showing the first {MAX_TABLE_ROWS} rows; narrow the filters to see the rest.")
+    st.dataframe(q.head(MAX_TABLE_ROWS))
 
-    map_path = os.path.join(OUT_DIR, "la_food_map.html")
-    if os.path.exists(map_path):
-        with open(map_path, "r", encoding="utf-8") as f:
-            html_data = f.read()
+    html_data = load_text(file_stamp(MAP_PATH))
+    if html_data is not None:
         html(html_data, height=700)
     else:
         st.info("Map not found. Run geocode_and_map.py to generate a Folium map.")
 
 with tabs[1]:
     st.subheader("Buzz timeline (weekly)")
-    raw_path = os.path.join(DATA_DIR,"mentions_raw.jsonl")
-    if os.path.exists(raw_path):
-        raw = pd.read_json(raw_path, lines=True)
-        raw["week"] = pd.to_datetime(raw["created_iso"], errors="coerce").dt.to_period("W").astype(str)
-        ts = raw.groupby("week").size().reset_index(name="mentions")
+    ts = load_timeline(file_stamp(RAW_PATH))
+    if ts is not None:
         chart = alt.Chart(ts).mark_line().encode(x="week:T", y="mentions:Q", tooltip=["week","mentions"]).properties(height=300)
         st.altair_chart(chart, use_container_width=True)
     else:
         st.info("No raw mention timestamps found. Create mentions_raw.jsonl via LLM pipeline.")
 
-    movers_path = os.path.join(DATA_DIR,"movers.csv")
-    if os.path.exists(movers_path):
+    movers = load_movers(file_stamp(MOVERS_PATH))
+    if movers is not None:
         st.subheader("Top Movers (WoW)")
-        st.dataframe(pd.read_csv(movers_path))
+        st.dataframe(movers)
     else:
         st.caption("Run trends.py to generate movers.")
 
+    mix = load_mixtures(file_stamp(MIXTURES_PATH))
+    if mix is not None and not mix.empty:
+        st.subheader("Topics")
+        labels = mix.drop_duplicates("dominant_topic").set_index("dominant_topic")
+        labels = labels["topic_terms"] if "topic_terms" in labels else pd.Series(dtype=object)
+        topic = st.selectbox("Dominant topic", sorted(mix["dominant_topic"].unique()),
+                             format_func=lambda t: f"Topic {t}: {labels.get(t, '')}".rstrip(": "))
+        st.dataframe(mix[mix["dominant_topic"] == topic].head(MAX_TABLE_ROWS))
+    else:
+        st.caption("Run python -m ml.topic_modeling to see topics.")
+
 with tabs[2]:
     st.subheader("Neighborhood density heatmap")
-    if all(c in df.columns for c in ["lat","lng"]):
-        m = folium.Map(location=[34.0522, -118.2437], zoom_start=10)
-        pts = df[["lat","lng"]].dropna().values.tolist()
-        if pts:
-            HeatMap(pts, radius=18).add_to(m)
-        html(folium.Figure().add_child(m)._repr_html_(), height=700)
+    if data.points is not None:
+        html(heatmap_html(stamp), height=700)
     else:
         st.info("No coordinates found. Run geocode_and_map.py first.")
 
 with tabs[3]:
     st.subheader("Ask a question")
+    mode = st.radio("Mode", ["Semantic (embeddings)", "Keyword (TF-IDF)"], horizontal=True,
+                    help="Keyword search runs locally on a saved TF-IDF index, no API call")
     prompt = st.text_input("E.g., Where should I go for Thai in Hollywood under $30?")
     top_k = st.slider("Results", 3, 15, 6)
     if st.button("Search") and prompt:
-        try:
-            res = qna_search(prompt, top_k=top_k)
-            st.dataframe(res[["name","neighborhood","cuisine","why","similarity","source_url"]])
-        except Exception as e:
-            st.error(str(e))
-            st.caption("Build Q&A index via: python -m src.embeddings_and_qna --build")
+        if mode.startswith("Keyword"):
+            try:
+                res = keyword_search(prompt, top_k=top_k)
+                if res.empty:
+                    st.info("No restaurant matches those words.")
+                else:
+                    st.dataframe(res)
+            except Exception as e:
+                st.error(str(e))
+                st.caption("Rebuild the keyword index via: python -m ml.recommend --refit")
+        else:
+            try:
+                res = qna_search(prompt, top_k=top_k)
+                st.dataframe(res[["name","neighborhood","cuisine","why","similarity","source_url"]])
+            except Exception as e:
+                st.error(str(e))
+                st.caption("Build Q&A index via: python -m src.embeddings_and_qna --build")
 
 with tabs[4]:
     st.subheader("Weekly Buzz Digest")
@@ -102,3 +142,29 @@ with tabs[4]:
             st.info("No digests yet. Run weekly_digest.py.")
     else:
         st.info("No digests directory found.")
+
+with tabs[5]:
+    st.subheader("Pipeline runs")
+    runs = load_ops(file_stamp(METRICS_DIR))
+    if runs:
+        st.caption("Latest run per stage, from data/metrics (written by every src/ stage).")
+        st.dataframe(ops_summary(runs))
+        run = st.selectbox("Run", runs[::-1], format_func=lambda r: f"{r['stage']} — {r['started'][:19]}")
+        detail = ops_detail(run)
+        if run["error"]:
+            st.error(run["error"])
+        c1, c2 = st.columns(2)
+        c1.markdown("**Phases** (seconds)"); c1.dataframe(detail["phases"])
+        c2.markdown("**Rows**"); c2.dataframe(detail["rows"])
+        if not detail["calls"].empty:
+            st.markdown("**External calls**")
+            st.dataframe(detail["calls"])
+            chart = alt.Chart(detail["latency"]).mark_bar().encode(
+                x=alt.X("latency:N", sort=alt.SortField("order")), y="requests:Q", color="service:N",
+                tooltip=["service", "latency", "requests"]).properties(height=250)
+            st.altair_chart(chart, use_container_width=True)
+        for name in ("tokens", "cache", "counters"):
+            if not detail[name].empty:
+                st.markdown(f"**{name.capitalize()}**"); st.dataframe(detail[name])
+    else:
+        st.info("No metrics yet. Every stage writes data/metrics/<stage>_<time>.json when it runs.")
@@ -1,29 +1,146 @@
-import os, datetime as dt, pandas as pd
+import argparse, datetime as dt, hashlib, os, re
+from typing import List, Optional
+import numpy as np, pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from . import metrics
 from .config import DATA_DIR
+from .geocode_cache import normalize
+from .storage import read_stage
 
-def snapshot():
-    path = os.path.join(DATA_DIR,"mentions_enhanced.csv")
-    if not os.path.exists(path): path = os.path.join(DATA_DIR,"mentions_clean.csv")
-    df = pd.read_csv(path)
-    today = dt.date.today()
-    year, week, _ = today.isocalendar()
-    out = os.path.join(DATA_DIR,"history", f"mentions_{year}W{week:02d}.csv")
-    os.makedirs(os.path.join(DATA_DIR,"history"), exist_ok=True)
-    df.to_csv(out, index=False)
+# Week-partitioned score history. Each ISO week is one small Parquet file under data/history
+# (week=2025-W07.parquet) holding only what movers need, keyed by restaurant_id, a hash of the
+# normalised name that stays stable across re-runs of dedupe. Re-snapshotting a week replaces
+# that week's file, older weeks are never rewritten. trend_table() pivots any number of weeks
+# into a restaurants x weeks matrix and computes deltas, streaks and growth on it in one pass.
+
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+MOVERS_PATH = os.path.join(DATA_DIR, "movers.csv")
+HISTORY_SCHEMA = pa.schema([
+    ("week", pa.date32()),
+    ("restaurant_id", pa.int64()),
+    ("name", pa.string()),
+    ("mentions", pa.int32()),
+    ("score_buzz", pa.float64()),
+    ("score_trend", pa.float64()),
+    ("score_total", pa.float64()),
+])
+_PART = re.compile(r"^week=(\d{4})-W(\d{2})\.parquet$")
+_LEGACY = re.compile(r"^mentions_(\d{4})W(\d{2})\.csv$")
+
+def restaurant_id(names) -> np.ndarray:
+    """Stable signed 64-bit id per name: case, accents and punctuation don't matter."""
+    return np.array([int.from_bytes(hashlib.blake2b(normalize(n).encode(), digest_size=8).digest(), "little", signed=True)
+                     for n in names], dtype="int64")
+
+def week_start(year: int, week: int) -> dt.date:
+    return dt.date.fromisocalendar(year, week, 1)
+
+def partition_path(week: dt.date, root: str = HISTORY_DIR) -> str:
+    year, wk, _ = week.isocalendar()
+    return os.path.join(root, f"week={year}-W{wk:02d}.parquet")
+
+def history_weeks(root: str = HISTORY_DIR) -> List[dt.date]:
+    if not os.path.isdir(root):
+        return []
+    return sorted(week_start(int(m[1]), int(m[2])) for m in map(_PART.match, os.listdir(root)) if m)
+
+def week_frame(df: pd.DataFrame, week: dt.date) -> pd.DataFrame:
+    """The history rows for one snapshot: one per restaurant_id, keeping its best-scored row."""
+    num = lambda c: pd.to_numeric(df[c], errors="coerce") if c in df else pd.Series(np.nan, index=df.index)
+    out = pd.DataFrame({"week": week, "restaurant_id": restaurant_id(df["name"].astype(object).fillna("")),
+                        "name": df["name"].astype(object).fillna("").astype(str),
+                        "mentions": num("mentions").fillna(0).astype("int32"),
+                        "score_buzz": num("score_buzz"), "score_trend": num("score_trend"), "score_total": num("score_total")})
+    out = out[out["name"] != ""].sort_values("score_total", ascending=False, kind="stable")
+    return out.drop_duplicates("restaurant_id").sort_values("restaurant_id").reset_index(drop=True)
+
+def write_week(df: pd.DataFrame, week: dt.date, root: str = HISTORY_DIR) -> str:
+    os.makedirs(root, exist_ok=True)
+    path = partition_path(week, root)
+    table = pa.Table.from_pandas(week_frame(df, week), schema=HISTORY_SCHEMA, preserve_index=False)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return path
+
+def load_history(weeks: Optional[int] = None, columns: Optional[List[str]] = None, root: str = HISTORY_DIR) -> pd.DataFrame:
+    """Long-format history of the last `weeks` snapshots (all when None)."""
+    parts = history_weeks(root)[-weeks:] if weeks else history_weeks(root)
+    cols = None if columns is None else list(dict.fromkeys(["week", "restaurant_id", *columns]))
+    if not parts:
+        return pd.DataFrame(columns=cols or HISTORY_SCHEMA.names)
+    return pa.concat_tables([pq.read_table(partition_path(w, root), columns=cols) for w in parts]).to_pandas(date_as_object=False)
+
+def trend_table(hist: pd.DataFrame, value: str = "score_total", window: int = 4) -> pd.DataFrame:
+    """Per restaurant over the weeks in `hist`: latest value, week-over-week delta (a restaurant
+    absent last week counts as 0, as movers always did), consecutive weeks of growth up to the
+    latest, and growth of the last `window` weeks' mean over the `window` weeks before it."""
+    weeks, c = np.unique(hist["week"].to_numpy(), return_inverse=True)
+    rids, r = np.unique(hist["restaurant_id"].to_numpy(), return_inverse=True)
+    X = np.zeros((len(rids), len(weeks)))
+    X[r, c] = hist[value].fillna(0).to_numpy()
+    seen = np.zeros(X.shape, dtype=bool)
+    seen[r, c] = True
+
+    last = X[:, -1]
+    prev = X[:, -2] if X.shape[1] > 1 else np.zeros(len(rids))
+    up = np.diff(X, axis=1) > 0
+    streak = np.cumprod(up[:, ::-1], axis=1).sum(axis=1) if up.shape[1] else np.zeros(len(rids), dtype=int)
+    recent = X[:, -window:].mean(axis=1)
+    before = X[:, -2 * window:-window].mean(axis=1) if X.shape[1] > window else np.full(len(rids), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(before > 0, recent / before - 1, np.nan)
+    out = pd.DataFrame({"restaurant_id": rids})
+    if "name" in hist:
+        order = np.argsort(c, kind="stable")
+        out["name"] = hist["name"].to_numpy()[order[len(order) - 1 - np.unique(r[order][::-1], return_index=True)[1]]]
+    return out.assign(**{
+        f"{value}_new": last, f"{value}_old": prev, "delta": last - prev,
+        "streak": streak, f"growth_{window}w": growth,
+        "weeks_seen": seen.sum(axis=1), "in_latest": seen[:, -1],
+    })
+
+def snapshot(today: Optional[dt.date] = None, root: str = HISTORY_DIR) -> str:
+    df = read_stage(["mentions_enhanced", "mentions_clean"], ["name", "mentions", "score_buzz", "score_trend", "score_total"])
+    today = today or dt.date.today()
+    out = write_week(df, week_start(*today.isocalendar()[:2]), root)
     print(f"Snapshot -> {out}")
+    return out
+
+def import_legacy(root: str = HISTORY_DIR):
+    """Convert the old full-copy mentions_YYYYWww.csv snapshots into week partitions."""
+    for f in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        m = _LEGACY.match(f)
+        if m:
+            week = week_start(int(m[1]), int(m[2]))
+            if not os.path.exists(partition_path(week, root)):
+                print(f"{f} -> {write_week(pd.read_csv(os.path.join(root, f)), week, root)}")
 
-def movers():
-    hist = os.path.join(DATA_DIR,"history")
-    files = sorted([f for f in os.listdir(hist) if f.endswith(".csv")])
-    if len(files) < 2:
+def movers(weeks: int = 8, window: int = 4, top: int = 20, root: str = HISTORY_DIR, out: str = MOVERS_PATH):
+    hist = load_history(weeks, ["name", "score_total"], root)
+    if hist["week"].nunique() < 2:
         print("Not enough snapshots."); return
-    last, prev = files[-1], files[-2]
-    df_last = pd.read_csv(os.path.join(hist,last))
-    df_prev = pd.read_csv(os.path.join(hist,prev))
-    m = df_last[["name","score_total"]].merge(df_prev[["name","score_total"]], on="name", how="left", suffixes=("_new","_old"))
-    m["delta"] = m["score_total_new"] - m["score_total_old"].fillna(0)
-    m.sort_values("delta", ascending=False).head(20).to_csv(os.path.join(DATA_DIR,"movers.csv"), index=False)
-    print("Wrote data/movers.csv")
+    t = trend_table(hist, "score_total", window)
+    t = t[t["in_latest"]].drop(columns=["in_latest", "restaurant_id"])
+    t.sort_values("delta", ascending=False, kind="stable").head(top).to_csv(out, index=False)
+    print(f"Wrote {out}")
+
+@metrics.instrument("trends")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weeks", type=int, default=8, help="snapshots read for movers")
+    ap.add_argument("--window", type=int, default=4, help="weeks per side of the rolling growth ratio")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--no_snapshot", dest="snapshot", action="store_false", help="only recompute movers")
+    ap.add_argument("--import_legacy", action="store_true", help="convert old history/*.csv snapshots")
+    args = ap.parse_args()
+    if args.import_legacy:
+        import_legacy()
+    if args.snapshot:
+        with metrics.phase("snapshot"):
+            snapshot()
+    with metrics.phase("movers"):
+        movers(args.weeks, args.window, args.top)
 
 if __name__ == "__main__":
-    snapshot(); movers()
+    main()
@@ -1,15 +1,23 @@
-import os, pandas as pd, datetime as dt
+import argparse, os, pandas as pd, datetime as dt
 from .config import DATA_DIR, OUT_DIR, OPENAI_API_KEY
+from . import metrics
+from .llm_async import record_usage
+from .llm_cache import LLMCache, add_cache_args
+from .storage import read_stage, stage_exists
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 SYSTEM = "Write a crisp, upbeat weekly newsletter summarizing LA dining buzz. Use bullet points. 200-300 words."
 
+@metrics.instrument("weekly_digest")
 def main():
+    ap = argparse.ArgumentParser()
+    add_cache_args(ap)
+    args = ap.parse_args()
+
     df_mov = os.path.join(DATA_DIR,"movers.csv")
-    df_ext = os.path.join(DATA_DIR,"external_merged.csv")
     movers = pd.read_csv(df_mov) if os.path.exists(df_mov) else pd.DataFrame()
-    external = pd.read_csv(df_ext) if os.path.exists(df_ext) else pd.DataFrame()
+    external = read_stage("external_merged", ["name", "why"]) if stage_exists("external_merged") else pd.DataFrame()
 
     context = []
     if not movers.empty:
@@ -19,11 +27,25 @@ def main():
 
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.4)
     tmpl = ChatPromptTemplate.from_messages([("system", SYSTEM), ("user","Context:\n{ctx}\nWrite the digest.")])
-    res = llm.invoke(tmpl.format_messages(ctx="\n".join(context)))
-    fname = os.path.join(OUT_DIR,"digests", f"buzz_digest_{dt.date.today().isoformat()}.md")
-    with open(fname,"w",encoding="utf-8") as f:
-        f.write(res.content)
-    print(f"Saved digest -> {fname}")
+    msg = tmpl.format_messages(ctx="\n".join(context))
+    cache = LLMCache.from_args(args)
+
+    def invoke():
+        with metrics.timed("openai.chat"):
+            res = llm.invoke(msg)
+        record_usage(llm.model_name, res)
+        return res.content
+
+    try:
+        content = cache.fetch(llm, msg, invoke)
+        fname = os.path.join(OUT_DIR,"digests", f"buzz_digest_{dt.date.today().isoformat()}.md")
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with open(fname,"w",encoding="utf-8") as f:
+            f.write(content)
+        print(f"Saved digest -> {fname}")
+        print(cache.summary())
+    finally:
+        cache.close()
 
 if __name__ == "__main__":
     main()
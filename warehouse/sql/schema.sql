@@ -21,20 +21,29 @@ CREATE TABLE IF NOT EXISTS mentions_fact (
   why TEXT,
   url TEXT,
   score_buzz NUMERIC,
-  score_trend NUMERIC
+  score_trend NUMERIC,
+  mention_key TEXT
 );
+-- natural keys the loader (src/load_warehouse.py) upserts on
+ALTER TABLE mentions_fact ADD COLUMN IF NOT EXISTS mention_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS restaurants_dim_name_norm ON restaurants_dim (name_norm);
+CREATE UNIQUE INDEX IF NOT EXISTS sources_dim_source_name ON sources_dim (source_name);
+CREATE UNIQUE INDEX IF NOT EXISTS mentions_fact_mention_key ON mentions_fact (mention_key);
+CREATE INDEX IF NOT EXISTS mentions_fact_restaurant_id ON mentions_fact (restaurant_id);
+-- recent_trend: 30-day half-life decay of the latest mention, as of the last refresh
 CREATE MATERIALIZED VIEW IF NOT EXISTS vw_trending_restaurants AS
 SELECT r.name, r.neighborhood, r.cuisine,
        SUM(COALESCE(m.score_buzz,1)) AS buzz,
-       MAX(m.score_trend) AS recent_trend,
+       POWER(0.5, EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - MAX(m.created_at)) / 86400.0 / 30) AS recent_trend,
        MAX(m.created_at) AS last_mention
 FROM mentions_fact m
 JOIN restaurants_dim r ON r.restaurant_id = m.restaurant_id
 GROUP BY r.name, r.neighborhood, r.cuisine
 ORDER BY buzz DESC;
 CREATE MATERIALIZED VIEW IF NOT EXISTS vw_new_openings AS
-SELECT DISTINCT r.name, r.neighborhood, r.cuisine, MIN(m.created_at) as first_mention
+SELECT r.name, r.neighborhood, r.cuisine, MIN(m.created_at) as first_mention
 FROM mentions_fact m
 JOIN restaurants_dim r ON r.restaurant_id = m.restaurant_id
 WHERE m.created_at >= NOW() - INTERVAL '60 days'
+GROUP BY r.name, r.neighborhood, r.cuisine
 ORDER BY first_mention DESC;